@@ -4,13 +4,14 @@ import json
 import yaml
 import pandas as pd
 
+import sqlalchemy
 from sqlalchemy.orm.exc import NoResultFound
 from sqlalchemy_utils import database_exists, create_database, drop_database
 
 from featurehub.admin.sqlalchemy_declarative import (
     Base, Feature, Problem, User, Metric, EvaluationAttempt
 )
-from featurehub.admin.sqlalchemy_main import ORMManager
+from featurehub.admin.sqlalchemy_main import ORMManager, get_feature_metrics
 from featurehub.admin.postprocessing import (
     build_and_save_all_features,
     extract_and_save_all_tables,
@@ -20,6 +21,7 @@ from featurehub.admin.postprocessing import (
 )
 from featurehub.evaluation.client import EvaluatorServer
 from featurehub.modeling.automl import AutoModel
+from featurehub.modeling import Model, EvaluationConfig
 from featurehub.util import possibly_talking_action
 
 class Commands(object):
@@ -49,8 +51,8 @@ class Commands(object):
         """Create a new DB and create the initial scheme.
 
         If the database exists and drop=True, the existing database is dropped
-        and recreated. Regardless, any tables defined by the schema that do not
-        exist are created.
+        and recreated. Regardless, any tables and indexes defined by the schema
+        that do not exist are created.
 
         Parameters
         ----------
@@ -74,8 +76,23 @@ class Commands(object):
         with possibly_talking_action("Creating tables..."):
             Base.metadata.create_all(engine)
 
+        # tables that already existed may lack indexes added to the schema
+        # since they were created
+        with possibly_talking_action("Creating indexes..."):
+            Commands._create_missing_indexes(engine)
+
         print("Database {} created successfully".format(engine.url))
 
+    @staticmethod
+    def _create_missing_indexes(engine):
+        inspector = sqlalchemy.inspect(engine)
+        for table in Base.metadata.sorted_tables:
+            existing = set(index["name"] for index in
+                    inspector.get_indexes(table.name))
+            for index in table.indexes:
+                if index.name not in existing:
+                    index.create(engine)
+
     def bulk_create_problem_yml(self, path):
         """Create new problem entries in database from yml document stream.
 
@@ -119,6 +136,10 @@ class Commands(object):
         problem_type_details : dict
             Dict with additional details about problem.
             For example, the dict may be {"classification_type" : "multiclass"}.
+            The "learner", "scorings", "cv_folds" and "time_budget" entries
+            configure the evaluation of features; see EvaluationConfig. For
+            example, {"learner" : "binned_tree", "scorings" : ["roc_auc"],
+            "time_budget" : 60} evaluates features faster.
         data_dir_train : str
             Absolute path of containing directory of data files for training.
         data_dir_test : str
@@ -140,6 +161,11 @@ class Commands(object):
             values only.
         """
 
+        # fail early on bad evaluation configuration
+        config = EvaluationConfig.from_problem_type_details(problem_type_details)
+        if problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+            config.create_model(problem_type)
+
         with self.__orm.session_scope() as session:
             try:
                 problem = session.query(Problem).filter(Problem.name == name).one()
@@ -163,6 +189,34 @@ class Commands(object):
             session.add(problem)
             print("Problem {} successfully created".format(name))
 
+    def invalidate_evaluation_cache(self, problem_name=None):
+        """Make the evaluation server reload the dataset of a problem.
+
+        The evaluation server caches problem datasets and reloads them when
+        the data files change. Call this after changing a problem in any
+        other way, e.g. directly in the database.
+
+        Parameters
+        ----------
+        problem_name : str, optional
+            If no problem name provided, invalidates all problems.
+        """
+        from featurehub.user.session import Session
+
+        data = { "database" : self.__orm.database }
+        if problem_name:
+            with self.__orm.session_scope() as session:
+                problem_id = session.query(Problem.id)\
+                        .filter(Problem.name == problem_name).scalar()
+            if problem_id is None:
+                raise ValueError("Invalid problem name: {}".format(problem_name))
+            data["problem_id"] = problem_id
+
+        response = Session._eval_server_post("invalidate-dataset-cache", data)
+        if not response.ok:
+            raise ValueError("Couldn't invalidate evaluation cache (status "
+                             "code {})".format(response.status_code))
+
     def get_problems(self):
         """Return a list of problems in the database."""
 
@@ -177,6 +231,8 @@ class Commands(object):
         """Get a DataFrame with the details about all registered features."""
         with self.__orm.session_scope() as session:
             results = self._get_features(session, problem_name, user_name).all()
+            metrics = get_feature_metrics(session,
+                    [feature.id for feature, _ in results])
             feature_dicts = []
             for feature, user_name in results:
                 d = {
@@ -185,12 +241,8 @@ class Commands(object):
                     "md5"         : feature.md5,
                     "created_at"  : feature.created_at,
                 }
-                feature_metrics = session.query(Metric.name,
-                        Metric.value).filter(Metric.feature_id ==
-                                feature.id).all()
-                # feature_metrics = feature.metrics
-                for metric in feature_metrics:
-                    d[metric.name] = metric.value
+                for metric_name, metric_value in metrics[feature.id]:
+                    d[metric_name] = metric_value
 
                 feature_dicts.append(d)
 
@@ -210,15 +262,14 @@ class Commands(object):
             If no user name provided, returns features for all users.
         """
 
-        #TODO pivot metrics tables
-        query = session.query(Feature, User.name)
-        #query = session.query(Feature, User.name, Metric)
+        query = session.query(Feature, User.name).join(Feature.user)
 
         if user_name:
             query = query.filter(User.name == user_name)
 
         if problem_name:
-            query = query.filter(Feature.problem.name == problem_name)
+            query = query.join(Feature.problem)\
+                         .filter(Problem.name == problem_name)
 
         return query
 
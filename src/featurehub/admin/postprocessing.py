@@ -5,14 +5,30 @@ import pandas as pd
 import dill
 import urllib.parse
 import signal
+import shutil
 import json
 import traceback
 import numpy as np
 from contextlib import contextmanager
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
 from featurehub.admin.sqlalchemy_declarative import *
+from featurehub.util import (
+    read_csv_cached, get_cpu_count, IsolatedPool, SharedDataset, FeatureStore,
+    save_columnar, load_columnar
+)
 
 FEATURE_EXTRACTION_TIME_LIMIT = 40
 
+# formats of tables saved by save_table, which are also their file extensions:
+# pickle, compressed with bzip2 or not, directory of memory-mappable columns
+# (see save_columnar), and, if pyarrow is installed, Feather compressed with
+# lz4 and Parquet compressed with zstd
+TABLE_FORMATS = ["pkl.bz2", "pkl", "columnar", "feather", "parquet"]
+
+# format of tables saved by save_table by default
+TABLE_FORMAT = "pkl.bz2"
+
 def load_features_df(session, problem_name):
 
     """Get all features for a specific problem as a DataFrame."""
@@ -53,51 +69,117 @@ def time_limit(seconds):
         signal.alarm(0)
 
 def build_feature_matrix(features_df, dataset, group_id, group_feature_indices,
-        feature_extraction_time_limit=FEATURE_EXTRACTION_TIME_LIMIT):
-    """Build feature matrix from human-generated features."""
-    feature_functions = features_df["feature_function"]
+        feature_extraction_time_limit=FEATURE_EXTRACTION_TIME_LIMIT,
+        processes=None, store=None):
+    """Build feature matrix from human-generated features.
+
+    Feature functions are run in parallel by a pool of isolated worker
+    processes, which share one read-only copy of the dataset (see
+    SharedDataset). Each feature is given a time limit on execution, enforced
+    by the pool rather than by SIGALRM, so this also works outside of the main
+    thread. Features that time out or raise an exception are replaced by null
+    features.
+
+    Parameters
+    ----------
+    features_df : pd.DataFrame
+        Features, with compiled functions in the "feature_function" column
+        (see append_feature_functions)
+    dataset : dict mapping str to pd.DataFrame
+    group_id : str
+        Prefix of the feature names
+    group_feature_indices : list of int
+        Index of each feature, used in its name
+    feature_extraction_time_limit : float, optional
+        Time limit in seconds for extracting each feature
+    processes : int, optional (default=None)
+        Number of worker processes. By default, uses as many as there are CPUs
+        available to this process.
+    store : FeatureStore, optional (default=None)
+        If given, the values of features already in the store for this
+        dataset are read from it instead of being extracted, and newly
+        extracted values are added to it. Features are identified by the
+        "md5" column of features_df.
+    """
+    feature_functions = list(features_df["feature_function"])
     num_features = len(feature_functions)
+    feature_names = ["{}_{:04d}".format(group_id, f_id)
+            for f_id in group_feature_indices]
+
+    results = [None] * num_features
+    errors = [None] * num_features
+
+    # read stored feature values
+    if store is not None:
+        md5s = list(features_df["md5"])
+        dataset_fingerprint = FeatureStore.compute_dataset_fingerprint(dataset)
+        for index, md5 in enumerate(md5s):
+            results[index] = store.get(md5, dataset_fingerprint)
+    indices = [index for index in range(num_features) if results[index] is None]
+    if store is not None:
+        print("Found {} of {} features in store".format(
+            num_features - len(indices), num_features))
+
+    if indices:
+        _extract_features(feature_functions, dataset, indices, feature_names,
+                results, errors, feature_extraction_time_limit, processes)
+        if store is not None:
+            for index in indices:
+                if errors[index] is None:
+                    store.put(md5s[index], dataset_fingerprint, results[index])
+
+    for index, error in enumerate(errors):
+        if error is None:
+            continue
+        print("Feature extraction (index {index}, name {name}) {error}"
+              .format(index=index, name=feature_names[index], error=error),
+              file=sys.stderr)
+        # TODO needs entities table
+        if index > 0 and errors[0] is None:
+            results[index] = null_feature(results[0], name=feature_names[index])
+        else:
+            raise ValueError("Couldn't create null feature from empty"
+                             " features list.")
+
+    feature_matrix = pd.concat([pd.DataFrame(feature) for feature in results], axis=1)
+    feature_matrix.columns = feature_names
+    return feature_matrix
 
-    # extract feature values and names, giving a time limit on execution.
-    features = []
-    for index, (f, f_id) in enumerate(zip(feature_functions, group_feature_indices)):
-        feature_name = "{}_{:04d}".format(group_id, f_id)
-        frac = "{n}/{N}".format(n=index, N=num_features-1)
-        print("Extracting feature {name:40.40} ({frac:>10.10})".format(
-            name=feature_name, frac=frac), end='\r')
+def _extract_features(feature_functions, dataset, indices, feature_names,
+        results, errors, feature_extraction_time_limit, processes):
+    """Extract features at indices in parallel, filling results and errors."""
+    if processes is None:
+        processes = get_cpu_count()
+    processes = max(1, min(processes, len(indices)))
+
+    # extract feature values, giving a time limit on execution.
+    shared_dataset = SharedDataset(dataset)
+    pool = IsolatedPool(processes=processes,
+            timeout=feature_extraction_time_limit)
+
+    def extract(index):
         try:
-            with time_limit(feature_extraction_time_limit):
-                feature = f(dataset)
-        except TimeoutException as exc:
-            print("Feature extraction (index {index}, name {name}) timed "
-                  "out.".format(index=index, name=feature_name),
-                  file=sys.stderr)
-            # TODO needs entities table
-            if features:
-                feature = null_feature(features[0][0], name=feature_name)
-            else:
-                raise ValueError("Couldn't create null feature from empty"
-                                 " features list.")
-        except Exception as exc:
-            print("Feature extraction (index {index}, name {name}) raised "
-                  "Exception".format(index=index, name=feature_name),
-                  file=sys.stderr)
-            print(traceback.format_exc(), file=sys.stderr)
-            # TODO needs entities table
-            if features:
-                feature = null_feature(features[0][0], name=feature_name)
-            else:
-                raise ValueError("Couldn't create null feature from empty"
-                                 " features list.")
+            values = pool.apply(feature_functions[index], shared_dataset)
+            return index, values, None
+        except TimeoutError:
+            return index, None, "timed out."
+        except Exception:
+            return index, None, "raised Exception\n" + traceback.format_exc()
 
-        features.append((feature, feature_name,))
+    try:
+        with ThreadPool(processes) as threads:
+            for n, (index, values, error) in enumerate(
+                    threads.imap_unordered(extract, indices)):
+                frac = "{n}/{N}".format(n=n, N=len(indices)-1)
+                print("Extracted feature {name:40.40} ({frac:>10.10})".format(
+                    name=feature_names[index], frac=frac), end='\r')
+                results[index] = values
+                errors[index] = error
+    finally:
+        pool.close()
+        shared_dataset.close()
     print("\ndone")
 
-    feature_matrix = pd.concat([pd.DataFrame(feature[0]) for feature in features], axis=1)
-    feature_names = [features[1] for feature in features]
-    feature_matrix.columns = feature_names
-    return feature_matrix
-
 def null_feature(entities, name='null_feature', fill=0.0):
     """Create null feature of an appropriate length."""
     index = entities.index
@@ -105,18 +187,94 @@ def null_feature(entities, name='null_feature', fill=0.0):
     df[name] = fill
     return df
 
-def save_feature_matrix(feature_matrix, problem_name, split, suffix):
-    name = "output/features/{}_{}_{}.pkl.bz2".format(problem_name, split, suffix)
-    save_table(feature_matrix, name) 
+def save_feature_matrix(feature_matrix, problem_name, split, suffix,
+        format=None):
+    name = "output/features/{}_{}_{}".format(problem_name, split, suffix)
+    save_table(feature_matrix, name, format=format)
+
+def load_feature_matrix(problem_name, split, suffix, session=None,
+        database=None, store=None):
+    """Load feature matrix.
 
-def load_feature_matrix(problem_name, split, suffix):
-    name = "output/features/{}_{}_{}.pkl.bz2".format(problem_name, split, suffix)
+    By default, loads the feature matrix saved by build_and_save_all_features.
+    If store is given, the feature matrix is instead assembled from the
+    feature values stored by the evaluation server; see
+    assemble_feature_matrix, including for how these values can differ from
+    those of build_feature_matrix.
+    """
+    if store is not None:
+        return assemble_feature_matrix(session, database, problem_name, split,
+                suffix, store)
+    name = "output/features/{}_{}_{}".format(problem_name, split, suffix)
     return load_table(name)
 
+def assemble_feature_matrix(session, database, problem_name, split, suffix,
+        store):
+    """Assemble feature matrix from feature values stored at submission.
+
+    No feature code is executed: the values of each feature are read from the
+    store, where the evaluation server put them when the feature was
+    registered (see EVAL_FEATURE_VALUES_DIR). Features are ordered and named
+    as by build_and_save_all_features. Raises ValueError if the values of any
+    feature of the problem are not stored, for example because it was
+    submitted before the server stored feature values; such features can be
+    extracted with build_and_save_all_features.
+
+    The evaluation server extracts the values of a feature from the
+    concatenated train and test entities and then splits them, so features
+    that aggregate over entities, such as normalizations or group statistics,
+    can have different values than when they are extracted from the dataset
+    of each split by build_feature_matrix.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.session.Session
+    database : str
+        Name of the database of the problem
+    problem_name : str
+    split : str
+        "train" or "test"
+    suffix : str
+        Prefix of the feature names
+    store : FeatureStore
+        Store of the evaluation server
+    """
+    problem_id = session.query(Problem.id).filter(Problem.name ==
+            problem_name).scalar()
+    if problem_id is None:
+        raise ValueError("Invalid problem name: {}".format(problem_name))
+
+    tmp = extract_table(session, Feature, columns=["problem_id", "md5"])
+    if tmp.empty or not (tmp["problem_id"] == problem_id).any():
+        raise ValueError("No features registered for problem {}"
+                .format(problem_name))
+    group_feature_indices = list(np.flatnonzero(tmp["problem_id"] == problem_id))
+    md5s = list(tmp["md5"].iloc[group_feature_indices])
+    feature_names = ["{}_{:04d}".format(suffix, f_id)
+            for f_id in group_feature_indices]
+
+    key = FeatureStore.get_submission_key(database, problem_id, split)
+    results = [store.get(md5, key) for md5 in md5s]
+    missing = [name for name, values in zip(feature_names, results)
+            if values is None]
+    if missing:
+        raise ValueError("Values of {} of {} features not stored: {}".format(
+            len(missing), len(md5s), ", ".join(missing)))
+
+    feature_matrix = pd.concat(results, axis=1)
+    feature_matrix.columns = feature_names
+    return feature_matrix
+
 def build_and_save_all_features(commands, session, suffix, splits=[],
-        problem_names=[], features_on_disk=False):
+        problem_names=[], features_on_disk=False, processes=None,
+        use_store=True, format=None):
     """Build and save feature matrices.
 
+    Features are extracted in parallel by `processes` worker processes; see
+    build_feature_matrix. If use_store is True, extracted feature values are
+    kept in the default FeatureStore, so that later builds only extract new
+    features. Feature matrices are saved in the given format; see save_table.
+
     Examples
     --------
     >>> with orm.session_scope() as session:
@@ -134,6 +292,8 @@ def build_and_save_all_features(commands, session, suffix, splits=[],
     if not splits:
         splits = ["train", "test"]
 
+    store = FeatureStore() if use_store else None
+
     for problem_name, problem_id in zip(problem_names, problem_ids):
         for split in splits:
             print("Processing features for problem {}, split {}"
@@ -147,49 +307,270 @@ def build_and_save_all_features(commands, session, suffix, splits=[],
             if features_on_disk:
                 tmp = load_table1("output/tables/features", suffix)
             else:
-                tmp = extract_table(session, Feature)
+                tmp = extract_table(session, Feature, columns=["id",
+                    "problem_id", "md5", "feature_dill_quoted"])
             group_feature_indices = list(np.flatnonzero(tmp["problem_id"] == problem_id))
             features_df = tmp.loc[group_feature_indices, :]
     
             # compute feature functions
             append_feature_functions(features_df, inplace=True)
             feature_matrix = build_feature_matrix(features_df, dataset,
-                    suffix, group_feature_indices)
+                    suffix, group_feature_indices, processes=processes,
+                    store=store)
 
             # save results
-            save_feature_matrix(feature_matrix, problem_name, split, suffix)
+            save_feature_matrix(feature_matrix, problem_name, split, suffix,
+                    format=format)
 
-def extract_and_save_all_tables(session, suffix):
-    for mapper in [Feature, Problem, User, EvaluationAttempt, Metric]:
-        df = extract_table(session, mapper)
-        save_table1(df, mapper.__tablename__, suffix)
-
-def extract_table(session, mapper):
-    result = session.query(mapper).all()
-    result_records = [r.__dict__ for r in result]
-    result_df = pd.DataFrame.from_records(result_records)
-    tablename = mapper.__tablename__
-    if "_sa_instance_state" in result_df.columns:
-        del result_df["_sa_instance_state"]
-    return result_df
-
-def save_table1(df, name, suffix):
+def extract_and_save_all_tables(session, suffix, format=None,
+        chunksize=None):
+    """Extract all tables of the database and save them.
+
+    See extract_and_save_table.
+    """
     underscore = "_" if suffix else ""
-    name1 = name + underscore + suffix + ".pkl.bz2"
-    save_table(df, name1)
+    for mapper in [Feature, Problem, User, EvaluationAttempt, Metric]:
+        name = mapper.__tablename__ + underscore + suffix
+        extract_and_save_table(session, mapper, name, format=format,
+                chunksize=chunksize)
+
+def extract_and_save_table(session, mapper, name, columns=None, filters=None,
+        format=None, chunksize=None):
+    """Extract table of the database and save it with save_table.
+
+    If chunksize is given and the format is parquet, rows are written to the
+    file as they are fetched from the database, one chunk at a time, so that
+    memory stays bounded by the size of a chunk. Otherwise, the whole table
+    is extracted first. See extract_table for the other parameters.
+    """
+    fullname, format = _get_table_path(name, format)
+    if chunksize is None or format != "parquet":
+        df = extract_table(session, mapper, columns=columns, filters=filters)
+        save_table(df, name, format=format)
+        return
+
+    # the types of the columns are given by the database, as chunks may
+    # have no values to infer them from
+    pyarrow = _import_pyarrow(format)
+    selected = _select_columns(mapper, columns)
+    schema = pyarrow.schema([(column.name, _get_arrow_type(pyarrow, column))
+            for column in selected])
+    chunks = extract_table(session, mapper, columns=columns, filters=filters,
+            chunksize=chunksize)
+    try:
+        with pyarrow.parquet.ParquetWriter(fullname, schema,
+                compression="zstd") as writer:
+            for chunk in chunks:
+                writer.write_table(pyarrow.Table.from_pandas(chunk,
+                    schema=schema, preserve_index=False))
+    except Exception:
+        if os.path.exists(fullname):
+            os.remove(fullname)
+        raise
+
+def extract_table(session, mapper, columns=None, filters=None,
+        chunksize=None):
+    """Extract table of the database as a DataFrame.
+
+    Rows are selected with a plain SELECT ordered by primary key, without
+    creating ORM objects.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.session.Session
+    mapper : declarative class
+        Mapper of the table, such as Feature
+    columns : list of str, optional (default=None)
+        Names of the columns to select. By default, all columns.
+    filters : list, optional (default=None)
+        SQL expressions that the selected rows satisfy, such as
+        [Feature.problem_id == 1]
+    chunksize : int, optional (default=None)
+        If given, returns an iterator over DataFrames of at most chunksize
+        consecutive rows each, whose index continues across chunks. Each
+        chunk is read with its own SELECT, starting after the primary key of
+        the last row of the previous chunk, as the database driver may read
+        all rows of a query into memory at once. The session must stay open
+        until the chunks are iterated over. There is always at least one,
+        possibly empty, chunk.
+    """
+    selected = _select_columns(mapper, columns)
+    primary_key = list(mapper.__table__.primary_key.columns)
+    names = [column.name for column in selected]
+
+    if chunksize is None:
+        query = session.query(*selected)
+        if filters:
+            query = query.filter(*filters)
+        query = query.order_by(*primary_key)
+        rows = session.connection().execute(query.statement).fetchall()
+        return pd.DataFrame.from_records(rows, columns=names)
+
+    if len(primary_key) != 1:
+        raise ValueError("Can't extract table {} in chunks, as its primary "
+                         "key has several columns"
+                         .format(mapper.__tablename__))
+    return _extract_table_chunks(session, selected, primary_key[0], filters,
+            names, chunksize)
+
+def _extract_table_chunks(session, selected, primary_key, filters, names,
+        chunksize):
+    # the primary key is selected last, to find where the next chunk starts,
+    # and labeled so that it is selected even if it is in selected already
+    query = session.query(*(selected + [primary_key.label("chunk_key")]))
+    if filters:
+        query = query.filter(*filters)
+    query = query.order_by(primary_key)
+
+    start = 0
+    last_key = None
+    while True:
+        chunk_query = query
+        if last_key is not None:
+            chunk_query = chunk_query.filter(primary_key > last_key)
+        rows = session.connection().execute(
+                chunk_query.limit(chunksize).statement).fetchall()
+        if not rows and start > 0:
+            break
+
+        df = pd.DataFrame.from_records([row[:-1] for row in rows],
+                columns=names)
+        df.index = pd.RangeIndex(start, start + len(df))
+        start += len(df)
+        yield df
+
+        if len(rows) < chunksize:
+            break
+        last_key = rows[-1][-1]
+
+def _select_columns(mapper, columns):
+    """Return the columns of the table of mapper with the given names."""
+    table = mapper.__table__
+    if columns is None:
+        return list(table.columns)
+    for name in columns:
+        if name not in table.columns.keys():
+            raise ValueError("Bad column: {}".format(name))
+    return [table.columns[name] for name in columns]
+
+def _get_arrow_type(pyarrow, column):
+    """Return type of the values of column in pyarrow."""
+    python_type = column.type.python_type
+    if python_type is int:
+        return pyarrow.int64()
+    elif python_type is float:
+        return pyarrow.float64()
+    elif python_type is str:
+        return pyarrow.string()
+    elif python_type is datetime:
+        return pyarrow.timestamp("us")
+    else:
+        raise ValueError("Unsupported type of column {}: {}"
+                .format(column.name, column.type))
 
-def save_table(df, name):
-    fullname = os.path.join(os.path.expanduser("~"), "notebooks", name)
-    df.to_pickle(fullname)
+def save_table1(df, name, suffix, format=None):
+    underscore = "_" if suffix else ""
+    name1 = name + underscore + suffix
+    save_table(df, name1, format=format)
+
+def save_table(df, name, format=None):
+    """Save DataFrame in the notebooks directory.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    name : str
+        Path relative to the notebooks directory. If it ends with the
+        extension of a format, the table is saved in that format. Otherwise,
+        the extension of the format is appended.
+    format : str, optional (default=None)
+        One of TABLE_FORMATS. By default, TABLE_FORMAT.
+    """
+    fullname, format = _get_table_path(name, format)
+    if format in ["pkl.bz2", "pkl"]:
+        df.to_pickle(fullname)
+    elif format == "columnar":
+        if os.path.exists(fullname):
+            shutil.rmtree(fullname)
+        save_columnar(df, fullname)
+    elif format == "feather":
+        pyarrow = _import_pyarrow(format)
+        pyarrow.feather.write_feather(pyarrow.Table.from_pandas(df), fullname,
+                compression="lz4")
+    elif format == "parquet":
+        pyarrow = _import_pyarrow(format)
+        pyarrow.parquet.write_table(pyarrow.Table.from_pandas(df), fullname,
+                compression="zstd")
+    else:
+        raise ValueError("Bad format: {}".format(format))
 
 def load_table1(name, suffix):
     underscore = "_" if suffix else ""
-    name1 = name + underscore + suffix + ".pkl.bz2"
+    name1 = name + underscore + suffix
     return load_table(name1)
 
 def load_table(name):
+    """Load DataFrame saved by save_table in the notebooks directory.
+
+    If name does not end with the extension of a format, loads the table
+    saved as name in any format, the most recently saved one if there are
+    several.
+
+    Tables saved in the columnar format are memory-mapped; see
+    load_columnar.
+    """
     fullname = os.path.join(os.path.expanduser("~"), "notebooks", name)
-    return pd.read_pickle(fullname)
+    format = _get_table_format(fullname)
+    if format is None:
+        candidates = [fullname + "." + f for f in TABLE_FORMATS
+                if os.path.exists(fullname + "." + f)]
+        if not candidates:
+            raise FileNotFoundError("No table saved as {}".format(fullname))
+        fullname = max(candidates, key=os.path.getmtime)
+        format = _get_table_format(fullname)
+
+    if format in ["pkl.bz2", "pkl"]:
+        return pd.read_pickle(fullname)
+    elif format == "columnar":
+        return load_columnar(fullname)
+    elif format == "feather":
+        pyarrow = _import_pyarrow(format)
+        return pyarrow.feather.read_table(fullname).to_pandas()
+    else:
+        pyarrow = _import_pyarrow(format)
+        return pyarrow.parquet.read_table(fullname).to_pandas()
+
+def _get_table_path(name, format):
+    """Return path and format of table saved by save_table."""
+    fullname = os.path.join(os.path.expanduser("~"), "notebooks", name)
+    name_format = _get_table_format(fullname)
+    if name_format is None:
+        format = format or TABLE_FORMAT
+        if format not in TABLE_FORMATS:
+            raise ValueError("Bad format: {}".format(format))
+        fullname = fullname + "." + format
+    elif format is None:
+        format = name_format
+    elif format != name_format:
+        raise ValueError("Name {} does not match format {}"
+                .format(name, format))
+    return fullname, format
+
+def _get_table_format(fullname):
+    """Return format of table given by its extension, or None."""
+    for format in TABLE_FORMATS:
+        if fullname.endswith("." + format):
+            return format
+    return None
+
+def _import_pyarrow(format):
+    try:
+        import pyarrow
+        import pyarrow.feather
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("Format {} requires pyarrow".format(format))
+    return pyarrow
 
 def prepare_automl_file_name(problem_name, split, suffix):
     name = "automl_{}_{}_{}.pkl".format(problem_name, split, suffix)
@@ -221,8 +602,7 @@ def load_dataset_from_dir(session, data_dir, problem_name):
            table_name == problem_target_table_name:
             continue
         abs_filename = os.path.join(problem_data_dir, filename)
-        dataset[table_name] = pd.read_csv(abs_filename,
-                low_memory=False, header=0)
+        dataset[table_name] = read_csv_cached(abs_filename)
 
     # if empty string, we simply don't have any features to add
     if problem_entities_featurized_table_name:
@@ -230,8 +610,7 @@ def load_dataset_from_dir(session, data_dir, problem_name):
         ind_features = cols.index(problem_entities_featurized_table_name)
         abs_filename = os.path.join(problem_data_dir,
                 problem_files[ind_features])
-        entities_featurized = pd.read_csv(abs_filename,
-                low_memory=False, header=0)
+        entities_featurized = read_csv_cached(abs_filename)
 
     # load target
     cols = list(problem_table_names)
@@ -242,7 +621,7 @@ def load_dataset_from_dir(session, data_dir, problem_name):
     # target might not exist if we are making predictions on unseen
     # test data
     if os.path.exists(abs_filename):
-        target = pd.read_csv(abs_filename, low_memory=False, header=0)
+        target = read_csv_cached(abs_filename)
     else:
         target = None
 
@@ -1,6 +1,8 @@
 from datetime import datetime
 
-from sqlalchemy import Column, ForeignKey, Integer, String, DateTime, Float, Text
+from sqlalchemy import (
+    Column, ForeignKey, Integer, String, DateTime, Float, Text, Index
+)
 from sqlalchemy.orm import relationship
 from sqlalchemy.ext.declarative import declarative_base
 
@@ -31,6 +33,10 @@ class Problem(Base):
 
 class Feature(Base):
     __tablename__ = "features"
+    __table_args__ = (
+        # full-text index for searching feature code (MySQL only)
+        Index("ix_features_code_fulltext", "code", mysql_prefix="FULLTEXT"),
+    )
 
     id                  = Column(Integer, primary_key=True, autoincrement=True)
     user_id             = Column(Integer, ForeignKey("users.id"))
@@ -1,13 +1,139 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
-from featurehub.admin.sqlalchemy_declarative import Base
+from featurehub.admin.sqlalchemy_declarative import Base, Feature, Metric
 from configparser import ConfigParser, NoSectionError
 import os
+import re
+import threading
 from contextlib import contextmanager
+from featurehub.util import is_positive_env
+
+# process-wide engines, keyed by process id and connection url, so that
+# ORMManager instances share pooled connections. Engines inherited by a forked
+# process are not reused, because their connections belong to the parent.
+_engines = {}
+_engines_lock = threading.Lock()
+
+def _get_pool_options():
+    """Read connection pool configuration from environment variables."""
+    pre_ping = os.environ.get("MYSQL_POOL_PRE_PING")
+    return {
+        "pool_size"     : int(os.environ.get("MYSQL_POOL_SIZE") or 5),
+        "max_overflow"  : int(os.environ.get("MYSQL_POOL_MAX_OVERFLOW") or 10),
+        "pool_recycle"  : int(os.environ.get("MYSQL_POOL_RECYCLE") or 3600),
+        "pool_pre_ping" : is_positive_env(pre_ping) if pre_ping else True,
+    }
+
+def get_engine(url):
+    """Return the engine for the given connection url, creating it if needed.
+
+    The engine's connection pool is configured by the environment variables
+    `MYSQL_POOL_SIZE`, `MYSQL_POOL_MAX_OVERFLOW`, `MYSQL_POOL_RECYCLE` and
+    `MYSQL_POOL_PRE_PING`.
+    """
+    key = (os.getpid(), url)
+    with _engines_lock:
+        if key not in _engines:
+            _engines[key] = create_engine(url, **_get_pool_options())
+        return _engines[key]
+
+def get_feature_metrics(session, feature_ids, batch_size=1000):
+    """Fetch the metrics of many features with a few batched queries.
+
+    Parameters
+    ----------
+    session : sqlalchemy.orm.Session
+    feature_ids : list of int
+    batch_size : int, optional (default=1000)
+        Maximum number of feature ids per query.
+
+    Returns
+    -------
+    metrics : dict (int => list of (str, float))
+        Maps each feature id to a list of (metric name, metric value), in the
+        order in which the metrics were inserted. Features without metrics map
+        to an empty list.
+    """
+    feature_ids = list(feature_ids)
+    metrics = {feature_id : [] for feature_id in feature_ids}
+    for i in range(0, len(feature_ids), batch_size):
+        batch = feature_ids[i:i+batch_size]
+        query = session.query(Metric.feature_id, Metric.name, Metric.value)\
+                       .filter(Metric.feature_id.in_(batch))\
+                       .order_by(Metric.feature_id, Metric.id)
+        for feature_id, name, value in query:
+            metrics[feature_id].append((name, value))
+
+    return metrics
+
+# InnoDB's full-text parser ignores words shorter than this (the default of
+# innodb_ft_min_token_size), as well as the following stopwords
+FULLTEXT_MIN_TOKEN_SIZE = 3
+FULLTEXT_STOPWORDS = frozenset([
+    "a", "about", "an", "are", "as", "at", "be", "by", "com", "de", "en",
+    "for", "from", "how", "i", "in", "is", "it", "la", "of", "on", "or",
+    "that", "the", "this", "to", "was", "what", "when", "where", "who",
+    "will", "with", "und", "www",
+])
+
+def code_search_filters(dialect, code_fragment):
+    """Return filters for features whose code contains code_fragment.
+
+    On MySQL, the words of the fragment are first looked up in the full-text
+    index of the feature code, so that only features containing all of them
+    (as whole words or word prefixes) are scanned for the fragment itself.
+    The index only finds words from their start, so only words that start
+    within the fragment are looked up: the first word of "counts()" may be
+    the end of "value_counts" in the code, which the full-text search would
+    miss. Words that are not indexed, because they are too short or
+    stopwords, are also left to the scan.
+
+    Parameters
+    ----------
+    dialect : sqlalchemy.engine.interfaces.Dialect
+        Dialect of the database to search, such as
+        session.get_bind().dialect
+    code_fragment : str
+
+    Returns
+    -------
+    filters : tuple
+    """
+    filters = (Feature.code.contains(code_fragment),)
+
+    if dialect.name == "mysql":
+        tokens = [
+            match.group() for match in re.finditer(r"\w+", code_fragment)
+            if _starts_word(code_fragment, match.start()) and
+                len(match.group()) >= FULLTEXT_MIN_TOKEN_SIZE and
+                match.group().lower() not in FULLTEXT_STOPWORDS
+        ]
+        if tokens:
+            against = " ".join("+{}*".format(token) for token in tokens)
+            filters = (Feature.code.match(against),) + filters
+
+    return filters
+
+def _starts_word(code_fragment, start):
+    """Return whether the word at start of code_fragment starts a word of any
+    code containing the fragment, for InnoDB's full-text parser.
+
+    The parser splits words at characters other than letters, digits and
+    underscores, except that an apostrophe between two word characters is
+    part of the word.
+    """
+    if start == 0:
+        return False
+    if code_fragment[start - 1] == "'":
+        return start == 1 or not re.match(r"\w", code_fragment[start - 2])
+    return True
 
 class ORMManager(object):
     """Initialize the sqlalchemy ORM engine and starts a database session.
 
+    The engine, and its pool of connections, is shared with all other
+    ORMManagers for the same database and credentials in this process.
+
     Parameters
     ----------
     database : string
@@ -42,14 +168,15 @@ class ORMManager(object):
 
         conn_string = "mysql+mysqlconnector://{}:{}@{}/{}".format(user,
                 '{}', host, self.database)
-        self.engine = create_engine(conn_string.format(password))
+        self.engine = get_engine(conn_string.format(password))
 
         # Validate cxn
         try:
-            create_engine(conn_string.format(password)).connect()
+            connection = self.engine.connect()
         except Exception:
             # couldn't connect
             raise ValueError("Couldn't connect to database.")
+        connection.close()
 
         Base.metadata.bind = self.engine
         Session = sessionmaker(bind=self.engine)
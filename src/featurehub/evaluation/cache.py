@@ -0,0 +1,183 @@
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+from collections import OrderedDict
+
+import pandas as pd
+
+class ProblemDatasetCache(object):
+    """Process-wide LRU cache of prepared evaluation datasets.
+
+    Entries are keyed by database and problem id. Each entry remembers the
+    fingerprint of the problem definition and data files it was built from;
+    if the fingerprint has changed by the time the entry is requested, it is
+    rebuilt. The total size of all entries is bounded by `max_bytes`, evicting
+    the least recently used problems first. The most recently used entry is
+    always kept, even if it alone exceeds the bound.
+
+    Cached objects are shared by all requests in the process and must not be
+    modified.
+
+    Each process has its own cache. If `path` is given, invalidations are
+    shared through it with the caches of other processes using the same path:
+    invalidating writes a new token to a file in `path`, and every cache
+    checks the tokens of an entry before returning it, rebuilding the entry if
+    they changed since it was built.
+
+    Parameters
+    ----------
+    max_bytes : int, optional (default=2GB)
+        Approximate bound on the memory used by cached datasets.
+    path : str, optional (default=None)
+        Directory of invalidation tokens shared by several processes. It is
+        created if it does not exist. By default, invalidations only apply to
+        this cache.
+
+    Examples
+    --------
+    >>> cache = ProblemDatasetCache()
+    >>> entry = cache.get(("featurehub", 1), fingerprint, build)
+    >>> cache.invalidate(("featurehub", 1))
+    """
+
+    def __init__(self, max_bytes=2 * 1024 ** 3, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        if path is not None:
+            os.makedirs(path, exist_ok=True)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def get(self, key, fingerprint, build):
+        """Return cached entry for key, building it if missing or outdated.
+
+        Parameters
+        ----------
+        key : hashable
+        fingerprint : str
+            Fingerprint of the data the entry should be built from.
+        build : callable
+            Called without arguments to build the entry. The entry should be
+            a dict; its size is estimated from the DataFrames it contains,
+            and from the other objects with an `nbytes` attribute, such as
+            numpy arrays.
+        """
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+
+        # only one thread builds a given entry at a time; the others wait for
+        # it and then find it in the cache
+        with build_lock:
+            # read before building, so that an invalidation during the build
+            # makes the next request rebuild the entry
+            generation = self._get_generation(key)
+            with self._lock:
+                cached = self._entries.get(key)
+                if (cached is not None and cached[0] == fingerprint and
+                        cached[1] == generation):
+                    self._entries.move_to_end(key)
+                    return cached[2]
+
+            entry = build()
+            nbytes = _estimate_nbytes(entry)
+
+            with self._lock:
+                self._entries[key] = (fingerprint, generation, entry, nbytes)
+                self._entries.move_to_end(key)
+                self._evict()
+
+        return entry
+
+    def invalidate(self, key=None):
+        """Drop the entry for key, or all entries if key is None.
+
+        If the cache has a path, the entries are also rebuilt by the caches of
+        other processes the next time they are requested.
+        """
+        if self.path is not None:
+            self._write_token(self._get_token_name(key))
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def nbytes(self):
+        """Return the estimated size of all cached entries."""
+        with self._lock:
+            return sum(v[3] for v in self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def _evict(self):
+        total = sum(v[3] for v in self._entries.values())
+        while total > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, _, nbytes) = self._entries.popitem(last=False)
+            total -= nbytes
+
+    def _get_generation(self, key):
+        """Return the invalidation tokens that apply to key, if any."""
+        if self.path is None:
+            return None
+        return (self._read_token(self._get_token_name(None)),
+                self._read_token(self._get_token_name(key)))
+
+    @staticmethod
+    def _get_token_name(key):
+        if key is None:
+            return "all"
+        return hashlib.md5(repr(key).encode("utf-8")).hexdigest()
+
+    def _read_token(self, name):
+        try:
+            with open(os.path.join(self.path, name), "r") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write_token(self, name):
+        """Replace token atomically, so that readers never see it partial."""
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(uuid.uuid4().hex)
+            os.replace(tmp, os.path.join(self.path, name))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+def _estimate_nbytes(entry):
+    """Estimate memory used by the DataFrames in (nested dicts of) entry.
+
+    Other objects with an `nbytes` attribute are counted by it. Objects
+    referenced more than once are counted once.
+    """
+    frames = {}
+    others = {}
+    def collect(obj):
+        if isinstance(obj, (pd.DataFrame, pd.Series)):
+            frames[id(obj)] = obj
+        elif isinstance(obj, dict):
+            for value in obj.values():
+                collect(value)
+        elif hasattr(obj, "nbytes"):
+            others[id(obj)] = obj
+    collect(entry)
+
+    nbytes = 0
+    for frame in frames.values():
+        usage = frame.memory_usage(index=True, deep=True)
+        if isinstance(frame, pd.DataFrame):
+            usage = usage.sum()
+        nbytes += int(usage)
+    for obj in others.values():
+        nbytes += int(obj.nbytes)
+    return nbytes
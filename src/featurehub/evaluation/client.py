@@ -6,28 +6,79 @@ import requests
 import collections
 import dill
 import traceback
+import time
+import numpy as np
 from urllib.parse import quote_from_bytes
+from sklearn.externals import joblib
 
 from featurehub.util import (
-    compute_dataset_hash, run_isolated, get_source, possibly_talking_action,
-    myhash
+    compute_dataset_hash, DatasetHasher, get_isolated_pool, get_source,
+    possibly_talking_action, myhash, read_csv_cached, SharedDataset,
+    compute_files_fingerprint, get_cpu_count, FeatureStore,
+    ISOLATED_MAX_TASKS_PER_CHILD
 )
 from featurehub.admin.sqlalchemy_declarative import Problem, Feature
 from featurehub.evaluation                   import EvaluationResponse
-from featurehub.modeling                     import Model
+from featurehub.modeling                     import Model, Baseline, EvaluationConfig
 
 class EvaluatorClient(object):
+    # Features are extracted by a long-lived isolated worker process, which is
+    # recycled after this many evaluations.
+    ISOLATED_MAX_TASKS_PER_CHILD = ISOLATED_MAX_TASKS_PER_CHILD
+
+    # number of isolated worker processes that may extract features at once
+    isolated_processes = 1
+
+    # number of rows of test sets predicted and scored at once, or None to
+    # predict whole test sets at once (see Model)
+    batch_size = None
+
+    # seconds that each request for the status of a submission waits for the
+    # evaluation server to finish evaluating it
+    SUBMIT_STATUS_WAIT = 30
+
+    # seconds after which to stop waiting for a submission to be evaluated
+    SUBMIT_MAX_WAIT = 900
+
+    # number of consecutive failed requests for the status of a submission
+    # after which to stop waiting for it
+    SUBMIT_STATUS_MAX_ERRORS = 5
+
     def __init__(self, problem_id, username, orm, dataset={}, target=None,
-            entities_featurized=None):
+            entities_featurized=None, time_limit=None, share_dataset=False,
+            integrity_check="incremental"):
         self.problem_id          = problem_id
         self.username            = username
         self.orm                 = orm
         self.dataset             = dataset
         self.target              = target
         self.entities_featurized = entities_featurized
+        self.time_limit          = time_limit
+        self.share_dataset       = share_dataset
+        self.integrity_check     = integrity_check
+
+        # dataset published for isolated workers, and the dict it was
+        # published from
+        self._shared_dataset        = None
+        self._shared_dataset_source = None
+
+        # problem type and evaluation configuration, read from the problem
+        self._config = None
+
+        # baseline shared by all evaluations of the problem, and the
+        # entities_featurized and target it was built from
+        self._baseline        = None
+        self._baseline_source = None
+
+        if integrity_check == "incremental":
+            self._dataset_hasher = DatasetHasher()
+        elif integrity_check == "full":
+            self._dataset_hasher = None
+        else:
+            raise ValueError("Bad integrity_check: {}".format(integrity_check))
 
         if self.dataset:
-            self.__dataset_hash = compute_dataset_hash(self.dataset)
+            self.__dataset_hash = self._compute_dataset_hash(self.dataset)
         else:
             self.__dataset_hash = None
 
@@ -93,6 +144,11 @@ class EvaluatorClient(object):
             "description"  : description,
         }
         response = Session._eval_server_post("submit", data)
+        with possibly_talking_action("Waiting for evaluation server...",
+                verbose=True):
+            response = self._wait_for_submission(response)
+        if response is None:
+            return
 
         if response.ok:
             try:
@@ -116,7 +172,62 @@ class EvaluatorClient(object):
             except Exception:
                 pass
 
-    def evaluate(self, feature):
+    def _wait_for_submission(self, response):
+        """Poll the evaluation server until a pending submission is evaluated.
+
+        Returns the last response received from the evaluation server, or
+        None if it stopped waiting, after SUBMIT_MAX_WAIT seconds or
+        SUBMIT_STATUS_MAX_ERRORS consecutive failed requests, in which case
+        the id of the submission job is printed.
+        """
+        from featurehub.user.session import Session
+        deadline = time.time() + EvaluatorClient.SUBMIT_MAX_WAIT
+        errors = 0
+        while response.ok:
+            try:
+                eval_response = EvaluationResponse.from_string(response.text)
+            except Exception:
+                # reported by the caller
+                break
+            if (eval_response.status_code1 !=
+                    EvaluationResponse.STATUS_CODE_PENDING
+                    or not eval_response.job_id):
+                break
+
+            if time.time() > deadline:
+                EvaluatorClient._print_stopped_waiting(eval_response.job_id,
+                        "still pending after {} seconds".format(
+                            EvaluatorClient.SUBMIT_MAX_WAIT))
+                return None
+
+            route = "submit-status/{}".format(eval_response.job_id)
+            params = { "wait" : EvaluatorClient.SUBMIT_STATUS_WAIT }
+            try:
+                response = Session._eval_server_get(route, params=params,
+                        timeout=EvaluatorClient.SUBMIT_STATUS_WAIT + 30)
+                errors = 0
+            except requests.exceptions.RequestException as e:
+                # e.g. the evaluation server is slow or restarting; retry
+                # with the last pending response
+                errors += 1
+                if errors >= EvaluatorClient.SUBMIT_STATUS_MAX_ERRORS:
+                    EvaluatorClient._print_stopped_waiting(
+                            eval_response.job_id,
+                            "{}: {}".format(type(e).__name__, e))
+                    return None
+                time.sleep(min(2 ** errors,
+                    EvaluatorClient.SUBMIT_STATUS_WAIT))
+
+        return response
+
+    @staticmethod
+    def _print_stopped_waiting(job_id, reason):
+        print("Stopped waiting for the evaluation server ({}). The feature "
+              "is still registered if it is accepted; submit it again later "
+              "to check (job id '{}').".format(reason, job_id),
+              file=sys.stderr)
+
+    def evaluate(self, feature, lift=False):
         """Evaluate feature on training dataset and return key performance metrics.
 
         Runs the feature in an isolated environment to extract the feature
@@ -129,10 +240,15 @@ class EvaluatorClient(object):
         ----------
         feature : function
             Feature to evaluate
+        lift : bool, optional (default=False)
+            Whether to report the improvement of each metric over the model
+            built on the problem's preprocessed features alone, instead of
+            the metric itself.
         """
         try:
-            metrics = self._evaluate(feature, verbose=True)
-            metrics_str = metrics.to_string(kind="user")
+            metrics = self._evaluate(feature, verbose=True, lift=lift)
+            metrics_str = metrics.to_string(kind="user",
+                    title=EvaluatorClient._get_metrics_title(lift))
             metrics_user = metrics.convert(kind="user")
             print(metrics_str)
         except ValueError as e:
@@ -148,6 +264,111 @@ class EvaluatorClient(object):
 
         return metrics_user
 
+    def evaluate_many(self, features, lift=False):
+        """Evaluate several features on training dataset.
+
+        Extracts the values of each feature in the isolated worker process,
+        with the time limit of a single feature, validates them, and then
+        computes key cross-validated metrics of a model built on each feature,
+        fitting the models in parallel. All features are evaluated on the same
+        cross validation folds.
+
+        Parameters
+        ----------
+        features : list of function
+            Features to evaluate
+        lift : bool, optional (default=False)
+            Whether to report the improvement of each metric over the
+            baseline instead of the metric itself; see evaluate.
+
+        Returns
+        -------
+        metrics : pd.DataFrame
+            One row per feature, indexed by the position of the feature in
+            features, as names need not be unique, with a "feature" column
+            holding the name of the feature, one column per metric, and an
+            "error" column. For invalid features, the metrics are missing and
+            the error column holds the reason.
+        """
+        features = list(features)
+        results = self._evaluate_many(features, verbose=True, lift=lift)
+
+        rows = []
+        columns = []
+        for feature, result in zip(features, results):
+            if isinstance(result, str):
+                row = { "error" : result }
+            else:
+                row = result.convert(kind="user")
+                row["error"] = None
+                columns = [metric.name for metric in result]
+            row["feature"] = feature.__name__
+            rows.append(row)
+
+        # metric columns in their usual order
+        metrics = pd.DataFrame(rows, index=range(len(features)))
+        metrics = metrics.reindex(columns=["feature"] + columns + ["error"])
+
+        for feature in features:
+            try:
+                self._log_evaluation_attempt(feature)
+            except Exception:
+                pass
+
+        return metrics
+
+    def _evaluate_many(self, features, verbose=False, lift=False):
+        """Evaluate features, returning a MetricList or error message each."""
+
+        with possibly_talking_action("Obtaining dataset...", verbose):
+            self._load_dataset()
+
+        with possibly_talking_action("Extracting features...", verbose):
+            extracted = self._extract_features_many(features)
+
+        # confirm dataset has not been changed
+        with possibly_talking_action("Verifying dataset integrity...", verbose):
+            self._verify_dataset_integrity()
+
+        # validate
+        results = [None] * len(features)
+        feature_values = {}
+        with possibly_talking_action("Validating feature values...", verbose):
+            for i, (ok, value) in enumerate(extracted):
+                if not ok:
+                    results[i] = value
+                    continue
+                try:
+                    self._validate_feature_values(value)
+                    feature_values[i] = value
+                except ValueError as e:
+                    results[i] = str(e)
+
+        # compute metrics, for all features on the same folds
+        with possibly_talking_action("Fitting models and computing metrics...",
+                verbose):
+            baseline = self._get_baseline()
+
+            def compute_metrics(values):
+                try:
+                    X = self._format_feature_values(values)
+                    metrics = baseline.compute_metrics(X, n_jobs=1)
+                    if lift:
+                        metrics = baseline.lift(metrics)
+                    return metrics
+                except ValueError as e:
+                    return str(e)
+
+            indices = sorted(feature_values)
+            n_jobs = min(get_cpu_count(), max(len(indices), 1))
+            metrics = joblib.Parallel(n_jobs=n_jobs, backend="threading")(
+                joblib.delayed(compute_metrics)(feature_values[i])
+                for i in indices)
+            for i, metric_list in zip(indices, metrics):
+                results[i] = metric_list
+
+        return results
+
     def _log_evaluation_attempt(self, feature):
         from featurehub.user.session import Session
         code = get_source(feature)
@@ -158,7 +379,7 @@ class EvaluatorClient(object):
         }
         Session._eval_server_post("log-evaluation-attempt", data)
 
-    def _evaluate(self, feature, verbose=False):
+    def _evaluate(self, feature, verbose=False, lift=False):
 
         with possibly_talking_action("Obtaining dataset...", verbose):
             self._load_dataset()
@@ -174,18 +395,20 @@ class EvaluatorClient(object):
         with possibly_talking_action("Validating feature values...", verbose):
             result = self._validate_feature_values(feature_values)
 
-        # full feature matrix
+        # the preprocessed features and folds are shared by all evaluations
+        with possibly_talking_action("Building baseline...", verbose):
+            baseline = self._get_baseline()
+
+        # feature matrix, aligned with the preprocessed features
         with possibly_talking_action("Building full feature matrix...",
                 verbose):
-            X = self._build_feature_matrix(feature_values)
-
-        # target values
-        # with possibly_talking_action("Extracting target values...", verbose):
-        Y = self._extract_label()
+            X = self._format_feature_values(feature_values)
 
         # compute metrics
         with possibly_talking_action("Fitting model and computing metrics...", verbose):
-            metrics = self._compute_metrics(X, Y)
+            metrics = baseline.compute_metrics(X)
+            if lift:
+                metrics = baseline.lift(metrics)
 
         return metrics
 
@@ -194,24 +417,128 @@ class EvaluatorClient(object):
     # functions of those subroutines.
     #
 
+    def _get_config(self):
+        """Return the problem type and evaluation configuration of the problem.
+
+        Both are read from the database once.
+        """
+        if self._config is None:
+            with self.orm.session_scope() as session:
+                problem = session.query(Problem)\
+                        .filter(Problem.id == self.problem_id).one()
+                problem_type = problem.problem_type
+                problem_type_details = problem.problem_type_details
+            self._config = (problem_type,
+                EvaluationConfig.from_problem_type_details(problem_type_details))
+
+        return self._config
+
+    def _get_time_limit(self):
+        """Return the time limit for extracting the values of a feature."""
+        _, config = self._get_config()
+        return config.get_time_limit(self.time_limit)
+
     def _create_model(self):
-        with self.orm.session_scope() as session:
-            problem = session.query(Problem)\
-                    .filter(Problem.id == self.problem_id).one()
-            problem_type = problem.problem_type
-        return Model(problem_type)
+        problem_type, config = self._get_config()
+        return config.create_model(problem_type, batch_size=self.batch_size)
 
-    def _compute_metrics(self, X, Y):
+    def _get_baseline(self):
+        """Return the baseline of the problem, building it if needed.
+
+        The baseline is built once and rebuilt only if the dataset has been
+        reloaded since.
+        """
+        source = (self.entities_featurized, self.target)
+        if (self._baseline_source is None or
+                any(a is not b for a, b in zip(self._baseline_source, source))):
+            self._baseline        = self._create_baseline()
+            self._baseline_source = source
+
+        return self._baseline
+
+    def _create_baseline(self):
         model = self._create_model()
-        metrics = model.compute_metrics_cv(X, Y)
+        if not pd.DataFrame(self.entities_featurized).empty:
+            X = self.entities_featurized
+        else:
+            X = None
+        Y = self._extract_label()
+        _, config = self._get_config()
+        return Baseline(model.problem_type, X, Y, folds=self._get_folds(Y),
+                learner=model.learner, batch_size=model.batch_size,
+                scorings=config.scorings, cv_folds=model.cv_folds)
 
-        return metrics
+    def _get_folds(self, Y):
+        """Return folds on which to evaluate features.
+
+        Returns None, to use cross validation folds.
+        """
+        return None
 
     def _extract_features(self, feature):
         assert isinstance(feature, collections.Callable), \
                 "feature must be a function!"
 
-        return run_isolated(feature, self.dataset)
+        if self.share_dataset:
+            dataset = self._get_shared_dataset()
+        else:
+            dataset = self.dataset
+
+        time_limit = self._get_time_limit()
+        pool = get_isolated_pool(self.ISOLATED_MAX_TASKS_PER_CHILD,
+                processes=self.isolated_processes)
+        try:
+            return pool.apply(feature, dataset, timeout=time_limit)
+        except TimeoutError:
+            raise ValueError("feature extraction timed out after {} seconds"
+                    .format(time_limit))
+
+    def _extract_features_many(self, features):
+        """Extract values of several features in the isolated worker.
+
+        Each feature is extracted by a task of its own, with its own time
+        limit, so that a feature that fails or times out only fails itself.
+        Returns a list with a (True, feature values) or (False, error message)
+        tuple for each feature.
+        """
+        for feature in features:
+            assert isinstance(feature, collections.Callable), \
+                    "feature must be a function!"
+
+        if self.share_dataset:
+            dataset = self._get_shared_dataset()
+        else:
+            dataset = self.dataset
+
+        time_limit = self._get_time_limit()
+        pool = get_isolated_pool(self.ISOLATED_MAX_TASKS_PER_CHILD,
+                processes=self.isolated_processes)
+        results = []
+        for feature in features:
+            try:
+                results.append((True,
+                    pool.apply(feature, dataset, timeout=time_limit)))
+            except TimeoutError:
+                results.append((False, "feature extraction timed out after "
+                                       "{} seconds".format(time_limit)))
+            except Exception as e:
+                results.append((False,
+                    "raises {}: {}".format(type(e).__name__, e)))
+        return results
+
+    def _get_shared_dataset(self):
+        """Return the dataset published for isolated workers.
+
+        The dataset is published once and re-published only if it has been
+        reloaded since.
+        """
+        if self._shared_dataset_source is not self.dataset:
+            if self._shared_dataset is not None:
+                self._shared_dataset.close()
+            self._shared_dataset = SharedDataset(self.dataset)
+            self._shared_dataset_source = self.dataset
+
+        return self._shared_dataset
 
     def _extract_label(self):
         if pd.DataFrame(self.target).empty:
@@ -254,21 +581,18 @@ class EvaluatorClient(object):
                    table_name == problem_target_table_name:
                     continue
                 abs_filename = os.path.join(problem_data_dir, filename)
-                dataset[table_name] = pd.read_csv(abs_filename,
-                        low_memory=False, header=0)
-
-                # compute/recompute hash
-                if compute_hash:
-                    dataset_hash = compute_dataset_hash(dataset)
-                else:
-                    dataset_hash = None
-
-        # recompute dataset hash. condition only met if we dataset has already
-        # loaded, but dataset hash had not been computed. (because we just
-        # computed hash several lines above!)
+                dataset[table_name] = read_csv_cached(abs_filename)
+
+            # any hash we were given is stale now
+            dataset_hash = None
+
+        # compute dataset hash if it has not been computed yet (or the dataset
+        # was just loaded).
         if compute_hash:
             if not dataset_hash:
-                dataset_hash = compute_dataset_hash(dataset)
+                dataset_hash = self._compute_dataset_hash(dataset)
+        else:
+            dataset_hash = None
 
         # load entities featurized
         if not is_present_entities_featurized:
@@ -278,8 +602,7 @@ class EvaluatorClient(object):
                 ind_features = cols.index(problem_entities_featurized_table_name)
                 abs_filename = os.path.join(problem_data_dir,
                         problem_files[ind_features])
-                entities_featurized = pd.read_csv(abs_filename,
-                        low_memory=False, header=0)
+                entities_featurized = read_csv_cached(abs_filename)
 
         # load target
         if not is_present_target:
@@ -291,7 +614,7 @@ class EvaluatorClient(object):
             # target might not exist if we are making predictions on unseen
             # test data
             if os.path.exists(abs_filename):
-                target = pd.read_csv(abs_filename, low_memory=False, header=0)
+                target = read_csv_cached(abs_filename)
             else:
                 target = None
 
@@ -300,11 +623,10 @@ class EvaluatorClient(object):
     def _load_dataset(self):
         """Load dataset if not present.
 
-        Also computes/re-computes dataset hash.
+        Also computes/re-computes dataset hash. Tables are read through the
+        columnar cache (see read_csv_cached), which honours dtypes files.
         """
 
-        # TODO check for dtypes file, facilitating lower memory usage
-
         self.dataset, self.entities_featurized, self.target, \
             self.__dataset_hash = self._load_dataset_split(
                     split="train", dataset=self.dataset,
@@ -372,8 +694,20 @@ class EvaluatorClient(object):
         # problems must be an empty string
         return problems
 
+    def _compute_dataset_hash(self, dataset):
+        """Hash dataset according to the integrity check mode.
+
+        In "incremental" mode, only columns that could have changed since the
+        last call are rehashed (see DatasetHasher). In "full" mode, the entire
+        dataset is serialized and hashed every time.
+        """
+        if self._dataset_hasher is not None:
+            return self._dataset_hasher.hash(dataset)
+        else:
+            return compute_dataset_hash(dataset)
+
     def _verify_dataset_integrity(self):
-        new_hash = compute_dataset_hash(self.dataset)
+        new_hash = self._compute_dataset_hash(self.dataset)
         if self.__dataset_hash != new_hash:
             print("Old hash: {}".format(self.__dataset_hash), file=sys.stderr)
             print("New hash: {}".format(new_hash), file=sys.stderr)
@@ -388,9 +722,51 @@ class EvaluatorClient(object):
             X = values_df
         return X
 
+    def _format_feature_values(self, feature_values):
+        """Return feature values as a matrix aligned with entities_featurized.
+
+        Equivalent to taking the new columns of _build_feature_matrix.
+        """
+        values_df = pd.DataFrame(feature_values)
+        if (not pd.DataFrame(self.entities_featurized).empty and
+                not values_df.index.equals(self.entities_featurized.index)):
+            # feature values need to be aligned with the entities
+            X = self._build_feature_matrix(feature_values)
+            values_df = X.iloc[:, self.entities_featurized.shape[1]:]
+
+        return Model._formatX(values_df)
+
+    @staticmethod
+    def _get_metrics_title(lift):
+        if lift:
+            return "Feature evaluation metrics (lift over baseline)"
+        else:
+            return "Feature evaluation metrics"
+
 class EvaluatorServer(EvaluatorClient):
-    def __init__(self, problem_id, username, orm):
-        super().__init__(problem_id, username, orm)
+    # Replace the isolated worker after every evaluation so that one user's
+    # feature cannot leave state behind for the next. The replacement worker
+    # is started as soon as the previous evaluation finishes.
+    ISOLATED_MAX_TASKS_PER_CHILD = 1
+
+    # attributes set by _load_dataset
+    PREPARED_ATTRIBUTES = [
+        "dataset_train", "target_train", "entities_featurized_train",
+        "dataset_test", "target_test", "entities_featurized_test",
+        "dataset", "target", "entities_featurized",
+    ]
+
+    def __init__(self, problem_id, username, orm, time_limit=None,
+            share_dataset=True, dataset_cache=None, isolated_processes=1,
+            batch_size=None):
+        super().__init__(problem_id, username, orm, time_limit=time_limit,
+                share_dataset=share_dataset)
+        self.dataset_cache      = dataset_cache
+        self.isolated_processes = isolated_processes
+        self.batch_size         = batch_size
+
+        # values of the last evaluated feature, see save_feature_values
+        self.feature_values = None
 
         # separate training and testing datasets
         self.dataset_train             = {}
@@ -400,6 +776,8 @@ class EvaluatorServer(EvaluatorClient):
         self.target_test               = None
         self.entities_featurized_test  = None
 
+        self._prepared = None
+
     def check_if_registered(self, code, verbose=False):
         """Check if feature is registered.
 
@@ -432,6 +810,31 @@ class EvaluatorServer(EvaluatorClient):
         except ValueError as e:
             raise
 
+    def save_feature_values(self, store, md5):
+        """Store the values of the last evaluated feature.
+
+        The values, extracted from the concatenated train and test dataset,
+        are stored separately for each split, so that feature matrices can be
+        assembled without executing the feature again (see
+        assemble_feature_matrix).
+
+        Parameters
+        ----------
+        store : FeatureStore
+        md5 : str
+            Hash of the feature code, as in Feature.md5
+        """
+        if self.feature_values is None:
+            raise ValueError("No feature evaluated")
+
+        values = pd.DataFrame(self.feature_values)
+        n = len(self.target_train)
+        for split, split_values in [("train", values.iloc[:n]),
+                                    ("test", values.iloc[n:])]:
+            key = FeatureStore.get_submission_key(self.orm.database,
+                    self.problem_id, split)
+            store.put(md5, key, split_values.reset_index(drop=True))
+
     def submit(self, feature, description):
         """Does nothing.
 
@@ -440,14 +843,20 @@ class EvaluatorServer(EvaluatorClient):
         """
         pass
 
-    def _compute_metrics(self, X, Y):
-        model = self._create_model()
-
-        # split X and Y into train and test
+    def _get_folds(self, Y):
+        """Return the split of Y into the training and testing splits."""
         n = len(self.target_train)
-        metrics = model.compute_metrics_train_test(X, Y, n)
+        return [(np.arange(n), np.arange(n, len(Y)))]
 
-        return metrics
+    def _get_baseline(self):
+        """Return the baseline of the problem.
+
+        The baseline is built with the prepared dataset, so if a dataset cache
+        was provided, it is shared with all other evaluations of this problem
+        in this process.
+        """
+        self._load_dataset()
+        return self._prepared["baseline"]
 
     def _verify_dataset_integrity(self):
         """Does nothing.
@@ -458,56 +867,131 @@ class EvaluatorServer(EvaluatorClient):
         pass
 
     def _load_dataset(self):
+        """Load the concatenated train and test dataset, if not loaded yet.
+
+        If a dataset cache was provided, the prepared dataset is shared with
+        all other evaluations of this problem in this process, as long as the
+        problem definition and data files are unchanged.
+        """
+        if self._prepared is not None:
+            return
+
+        if self.dataset_cache is not None:
+            key = (self.orm.database, str(self.problem_id))
+            prepared = self.dataset_cache.get(key,
+                    self._compute_data_fingerprint(), self._prepare_dataset)
+        else:
+            prepared = self._prepare_dataset()
+
+        for name in EvaluatorServer.PREPARED_ATTRIBUTES:
+            setattr(self, name, prepared[name])
+        if "shared_dataset" in prepared:
+            self._shared_dataset        = prepared["shared_dataset"]
+            self._shared_dataset_source = self.dataset
+        self._prepared = prepared
+
+    def _compute_data_fingerprint(self):
+        """Return fingerprint of the problem definition and data files.
+
+        The definition includes the evaluation configuration of the problem,
+        so that the baseline kept with the prepared dataset is rebuilt if it
+        changes.
+        """
+        with self.orm.session_scope() as session:
+            problem = session.query(Problem)\
+                    .filter(Problem.id == self.problem_id).one()
+            definition = [
+                problem.data_dir_train,
+                problem.data_dir_test,
+                problem.files,
+                problem.table_names,
+                problem.entities_table_name,
+                problem.entities_featurized_table_name,
+                problem.target_table_name,
+                problem.problem_type,
+                problem.problem_type_details,
+            ]
+
+        filenames = []
+        for data_dir in [definition[0], definition[1]]:
+            for filename in json.loads(definition[2]):
+                filenames.append(os.path.join(data_dir, filename))
+
+        return myhash(json.dumps(definition) +
+                compute_files_fingerprint(filenames))
+
+    def _prepare_dataset(self):
+        """Load train and test splits and concatenate them for evaluation.
+
+        Returns a dict mapping the names in PREPARED_ATTRIBUTES, "baseline"
+        (see Baseline) and, if the dataset is shared with isolated workers,
+        "shared_dataset" to their values. The tables of the training split are
+        not copied, so none of the values may be modified.
+
+        The baseline is built here rather than on first use, so that it is
+        only built once even by concurrent evaluations, and is counted in the
+        size of the entry of the dataset cache.
+        """
+        prepared = {}
+
         # load dataset for train data
-        self.dataset_train, self.entities_featurized_train, \
-                self.target_train, _ = self._load_dataset_split(
-                        split="train", dataset=self.dataset_train,
-                        entities_featurized=self.entities_featurized_train,
-                        target=self.target_train, compute_hash=False)
+        prepared["dataset_train"], prepared["entities_featurized_train"], \
+                prepared["target_train"], _ = self._load_dataset_split(
+                        split="train", dataset={}, compute_hash=False)
 
         # load dataset for test data
-        self.dataset_test, self.entities_featurized_test, \
-                self.target_test, _ = self._load_dataset_split(
-                        split="test", dataset=self.dataset_test,
-                        entities_featurized=self.entities_featurized_test,
-                        target=self.target_test, compute_hash=False)
-
-        # make a copy of the dataset
-        self.dataset = {}
-        for key in self.dataset_train:
-            self.dataset[key] = self.dataset_train[key].copy()
+        prepared["dataset_test"], prepared["entities_featurized_test"], \
+                prepared["target_test"], _ = self._load_dataset_split(
+                        split="test", dataset={}, compute_hash=False)
 
         # concatenate as applicable
         with self.orm.session_scope() as session:
             problem = session.query(Problem)\
                     .filter(Problem.id == self.problem_id).one()
             problem_entities_table_name = problem.entities_table_name
-        self.dataset[problem_entities_table_name] = \
-            pd.concat([self.dataset_train[problem_entities_table_name],
-            self.dataset_test[problem_entities_table_name]], axis=0)
+
+        # Reset indices. Otherwise, since we did a vertical concatenation, we
+        # have duplicate values in our indices.
+        dataset = dict(prepared["dataset_train"])
+        dataset[problem_entities_table_name] = pd.concat(
+                [prepared["dataset_train"][problem_entities_table_name],
+                 prepared["dataset_test"][problem_entities_table_name]],
+                axis=0).reset_index(drop=True)
+        prepared["dataset"] = dataset
 
         try:
-            self.target = pd.concat([self.target_train, self.target_test],
-                    axis=0)
+            target = pd.concat([prepared["target_train"],
+                prepared["target_test"]], axis=0)
         except Exception:
             # todo
-            self.target = self.target_train
+            target = prepared["target_train"]
+        prepared["target"] = target.reset_index(drop=True)
 
         try:
-            self.entities_featurized = pd.concat([self.entities_featurized_train,
-                self.entities_featurized_test], axis=0)
+            entities_featurized = pd.concat(
+                    [prepared["entities_featurized_train"],
+                     prepared["entities_featurized_test"]], axis=0)
+            entities_featurized = entities_featurized.reset_index(drop=True)
         except ValueError:
             # if there are no preprocessed features in the first place, all
             # will be None, and pd.concat fails
-            self.entities_featurized = None
+            entities_featurized = None
+        prepared["entities_featurized"] = entities_featurized
 
-        # Reset indices. Otherwise, since we did a vertical concatenation, we
-        # have duplicate values in our indices.
-        self.dataset[problem_entities_table_name].reset_index(drop=True, inplace=True)
-        self.target.reset_index(drop=True, inplace=True)
-        if self.entities_featurized is not None:
-            self.entities_featurized.reset_index(drop=True, inplace=True)
+        for name in EvaluatorServer.PREPARED_ATTRIBUTES:
+            setattr(self, name, prepared[name])
+        prepared["baseline"] = self._create_baseline()
+
+        if self.share_dataset:
+            prepared["shared_dataset"] = SharedDataset(dataset)
+
+        return prepared
+
+    def _extract_features(self, feature):
+        self.feature_values = super()._extract_features(feature)
+        return self.feature_values
 
-    def _evaluate(self, feature, verbose=False):
-        metrics = super()._evaluate(feature, verbose)
+    def _evaluate(self, feature, verbose=False, lift=False):
+        self.feature_values = None
+        metrics = super()._evaluate(feature, verbose, lift)
         return metrics
@@ -0,0 +1,342 @@
+import json
+import os
+import queue
+import re
+import tempfile
+import threading
+import time
+import traceback
+import uuid
+from collections import OrderedDict
+
+class Job(object):
+    """A unit of work submitted to a SubmissionQueue.
+
+    Attributes
+    ----------
+    id : str
+    owner : str
+        Name of the user that submitted the job.
+    key : hashable or None
+        Jobs with the same key are not run concurrently; see
+        `SubmissionQueue.submit`.
+    status : str
+        One of Job.PENDING, Job.RUNNING, Job.DONE, Job.FAILED.
+    result : object
+        Return value of the job function, once the job is done.
+    finished : float or None
+        Time at which the job finished.
+    pid : int or None
+        Id of the process that runs the job.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE    = "done"
+    FAILED  = "failed"
+
+    def __init__(self, f, args, owner, key=None):
+        self.id       = uuid.uuid4().hex
+        self.f        = f
+        self.args     = args
+        self.owner    = owner
+        self.key      = key
+        self.status   = Job.PENDING
+        self.result   = None
+        self.finished = None
+        self.pid      = os.getpid()
+
+    def is_finished(self):
+        return self.status in (Job.DONE, Job.FAILED)
+
+    def to_record(self):
+        return {
+            "id"       : self.id,
+            "owner"    : self.owner,
+            "status"   : self.status,
+            "result"   : self.result,
+            "finished" : self.finished,
+            "pid"      : self.pid,
+        }
+
+    @classmethod
+    def from_record(cls, record):
+        job = cls(None, None, record["owner"])
+        job.id       = record["id"]
+        job.status   = record["status"]
+        job.result   = record["result"]
+        job.finished = record["finished"]
+        job.pid      = record.get("pid")
+        return job
+
+class JobStore(object):
+    """Directory of job records shared by several server processes.
+
+    Each job is stored as a json file named after its id, so that a process
+    can look up the status and result of jobs run by other processes. Job
+    results must be json-serializable.
+
+    The process running a job periodically touches its record (see touch),
+    so that the modification time of the record is a heartbeat. A job that
+    is not finished and whose record has not been touched for `stale_after`
+    seconds, for example because the process running it was killed, is
+    loaded as failed.
+
+    Parameters
+    ----------
+    path : str
+        Directory in which to store job records. It is created if it does not
+        exist.
+    stale_after : float, optional (default=60)
+        Seconds without heartbeat after which unfinished jobs are failed.
+    """
+
+    _ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+    def __init__(self, path, stale_after=60):
+        self.path = path
+        self.stale_after = stale_after
+        os.makedirs(path, exist_ok=True)
+
+    def save(self, job):
+        """Write job record, replacing any previous record atomically."""
+        fd, tmp = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(job.to_record(), f)
+            os.replace(tmp, self._filename(job.id))
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def load(self, job_id):
+        """Return job by id, or None if there is no record for it."""
+        if not JobStore._ID_PATTERN.match(job_id):
+            return None
+        filename = self._filename(job_id)
+        try:
+            with open(filename, "r") as f:
+                job = Job.from_record(json.load(f))
+            heartbeat = os.path.getmtime(filename)
+        except (OSError, ValueError):
+            return None
+
+        if not job.is_finished() and \
+                time.time() - heartbeat > self.stale_after:
+            job.status = Job.FAILED
+        return job
+
+    def touch(self, job_id):
+        """Record a heartbeat of an unfinished job."""
+        try:
+            os.utime(self._filename(job_id))
+        except OSError:
+            pass
+
+    def prune(self, ttl):
+        """Remove records that have not been updated for ttl seconds."""
+        now = time.time()
+        for name in os.listdir(self.path):
+            filename = os.path.join(self.path, name)
+            try:
+                if now - os.path.getmtime(filename) > ttl:
+                    os.remove(filename)
+            except OSError:
+                pass
+
+    def _filename(self, job_id):
+        return os.path.join(self.path, job_id + ".json")
+
+class SubmissionQueue(object):
+    """Queue of jobs drained by a pool of worker threads.
+
+    Jobs are identified by a random id, which can be used to look up their
+    status and result until `result_ttl` seconds after they have finished.
+
+    Parameters
+    ----------
+    workers : int, optional (default=1)
+        Number of worker threads.
+    result_ttl : float, optional (default=3600)
+        Seconds for which results of finished jobs are kept.
+    on_error : callable, optional
+        Called with the job and the formatted traceback if a job raises an
+        exception.
+    store : JobStore, optional
+        If given, jobs are also recorded in the store, so that other
+        processes sharing the store can look them up. The records of
+        unfinished jobs are touched every STORE_HEARTBEAT_INTERVAL seconds.
+
+    Examples
+    --------
+    >>> q = SubmissionQueue(workers=2)
+    >>> job_id = q.submit(evaluate, args, owner="alice")
+    >>> job = q.wait(job_id, timeout=30)
+    """
+
+    # seconds between checks of the store while waiting for a job run by
+    # another process
+    STORE_POLL_INTERVAL = 0.1
+
+    # seconds between removals of expired records from the store
+    STORE_PRUNE_INTERVAL = 60
+
+    # seconds between heartbeats of unfinished jobs in the store, which must
+    # be well below the stale_after of the store
+    STORE_HEARTBEAT_INTERVAL = 10
+
+    def __init__(self, workers=1, result_ttl=3600, on_error=None, store=None):
+        self.workers    = workers
+        self.result_ttl = result_ttl
+        self.on_error   = on_error
+        self.store      = store
+
+        self._jobs      = OrderedDict()
+        self._active    = {}
+        self._queue     = queue.Queue()
+        self._condition = threading.Condition()
+        self._threads   = []
+        self._pruned    = 0
+
+    def start(self):
+        """Start worker threads, if not started yet."""
+        with self._condition:
+            if self._threads:
+                return
+            for _ in range(self.workers):
+                thread = threading.Thread(target=self._worker_loop, daemon=True)
+                thread.start()
+                self._threads.append(thread)
+            if self.store is not None:
+                thread = threading.Thread(target=self._heartbeat_loop,
+                        daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, f, args, owner, key=None):
+        """Enqueue `f(*args)` and return the job id.
+
+        If an unfinished job with the same key and owner exists, no new job
+        is created and the id of the existing job is returned instead.
+        """
+        self.start()
+        with self._condition:
+            self._prune()
+            if key is not None and key in self._active:
+                job = self._jobs[self._active[key]]
+                if job.owner == owner:
+                    return job.id
+
+            job = Job(f, args, owner, key=key)
+            self._jobs[job.id] = job
+            if key is not None:
+                self._active[key] = job.id
+        if self.store is not None:
+            self.store.save(job)
+        self._queue.put(job)
+        return job.id
+
+    def get(self, job_id):
+        """Return job by id, or None if unknown or expired."""
+        with self._condition:
+            self._prune()
+            job = self._jobs.get(job_id)
+        if job is None and self.store is not None:
+            job = self.store.load(job_id)
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Return job by id once it is finished or timeout seconds passed.
+
+        Returns None if the job is unknown or expired.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        with self._condition:
+            self._prune()
+            job = self._jobs.get(job_id)
+            if job is not None:
+                while not job.is_finished():
+                    if deadline is None:
+                        self._condition.wait()
+                    else:
+                        remaining = deadline - time.time()
+                        if remaining <= 0:
+                            break
+                        self._condition.wait(remaining)
+                return job
+
+        # job run by another process
+        if self.store is None:
+            return None
+        job = self.store.load(job_id)
+        while job is not None and not job.is_finished():
+            if deadline is None:
+                interval = SubmissionQueue.STORE_POLL_INTERVAL
+            else:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                interval = min(remaining, SubmissionQueue.STORE_POLL_INTERVAL)
+            time.sleep(interval)
+            job = self.store.load(job_id)
+        return job
+
+    def pending(self):
+        """Return number of jobs that are not finished yet."""
+        with self._condition:
+            return sum(1 for job in self._jobs.values()
+                       if not job.is_finished())
+
+    def _worker_loop(self):
+        while True:
+            job = self._queue.get()
+            with self._condition:
+                job.status = Job.RUNNING
+            try:
+                result = job.f(*job.args)
+                status = Job.DONE
+            except Exception:
+                result = None
+                status = Job.FAILED
+                if self.on_error is not None:
+                    self.on_error(job, traceback.format_exc())
+            with self._condition:
+                job.result   = result
+                job.status   = status
+                job.finished = time.time()
+                job.f = job.args = None
+                if job.key is not None and self._active.get(job.key) == job.id:
+                    del self._active[job.key]
+            if self.store is not None:
+                try:
+                    self.store.save(job)
+                except Exception:
+                    if self.on_error is not None:
+                        self.on_error(job, traceback.format_exc())
+            with self._condition:
+                self._condition.notify_all()
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(SubmissionQueue.STORE_HEARTBEAT_INTERVAL)
+            with self._condition:
+                job_ids = [job.id for job in self._jobs.values()
+                           if not job.is_finished()]
+            for job_id in job_ids:
+                self.store.touch(job_id)
+
+    def _prune(self):
+        # jobs are ordered by submission, which is roughly the order in which
+        # they finish, so we only need to look at the oldest ones
+        now = time.time()
+        while self._jobs:
+            job = next(iter(self._jobs.values()))
+            if job.finished is None or now - job.finished < self.result_ttl:
+                break
+            self._jobs.popitem(last=False)
+
+        if (self.store is not None and
+                now - self._pruned > SubmissionQueue.STORE_PRUNE_INTERVAL):
+            self._pruned = now
+            self.store.prune(self.result_ttl)
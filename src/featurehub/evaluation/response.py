@@ -14,6 +14,9 @@ class EvaluationResponse(Response):
         List of Metric objects, which each encode metric name, metric scoring
         method, and value.
     topic_url : str
+    job_id : str, optional (default=None)
+        Id of the submission job, used to poll for the result of a pending
+        submission.
 
     Examples
     --------
@@ -21,6 +24,7 @@ class EvaluationResponse(Response):
     """
 
     STATUS_CODE_OKAY              = "okay"
+    STATUS_CODE_PENDING           = "pending"
     STATUS_CODE_BAD_REQUEST       = "bad_request"
     STATUS_CODE_BAD_AUTH          = "bad_auth"
     STATUS_CODE_BAD_FEATURE       = "bad_feature"
@@ -29,7 +33,7 @@ class EvaluationResponse(Response):
     STATUS_CODE_DB_ERROR          = "db_error"
 
     def __init__(self, status_code=STATUS_CODE_OKAY, metrics=None,
-            topic_url=""):
+            topic_url="", job_id=None):
         if metrics is not None:
             metrics = MetricList.from_object(metrics).convert(kind="user")
 
@@ -37,6 +41,7 @@ class EvaluationResponse(Response):
             "status_code" : status_code,
             "metrics"     : metrics,
             "topic_url"   : topic_url,
+            "job_id"      : job_id,
         }
         response = json.dumps(d, indent=1, sort_keys=True)
         mimetype = "application/json"
@@ -46,6 +51,7 @@ class EvaluationResponse(Response):
         self.status_code1 = status_code
         self.metrics = metrics
         self.topic_url = topic_url
+        self.job_id = job_id
 
 
     @classmethod
@@ -66,14 +72,18 @@ class EvaluationResponse(Response):
         status_code = d["status_code"]
         metrics     = d["metrics"]
         topic_url   = d["topic_url"]
+        job_id      = d.get("job_id")
 
-        return cls(status_code=status_code, metrics=metrics, topic_url=topic_url)
+        return cls(status_code=status_code, metrics=metrics, topic_url=topic_url,
+                job_id=job_id)
 
     def _get_explanation(self):
         """Return an explanation of the response status code."""
 
         if self.status_code1 == self.STATUS_CODE_OKAY:
             return "Feature registered successfully."
+        elif self.status_code1 == self.STATUS_CODE_PENDING:
+            return "Feature submitted and waiting to be evaluated."
         elif self.status_code1 == self.STATUS_CODE_BAD_REQUEST:
             return "Oops -- failed to communicate with server. " \
                 + TRY_AGAIN_LATER
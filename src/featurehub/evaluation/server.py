@@ -21,9 +21,12 @@ from featurehub.evaluation                   import EvaluationResponse, Evaluato
 from featurehub.admin.sqlalchemy_main        import ORMManager
 from featurehub.admin.sqlalchemy_declarative import (
     Feature, Problem, User, Metric, EvaluationAttempt)
+from featurehub.evaluation.cache             import ProblemDatasetCache
 from featurehub.evaluation.discourse         import DiscourseFeatureTopic
+from featurehub.evaluation.jobs              import (
+    Job, JobStore, SubmissionQueue)
 from featurehub.util                         import (
-    get_function, myhash, is_positive_env)
+    get_function, myhash, is_positive_env, FeatureStore)
 
 # setup
 prefix = "/services/eval-server"
@@ -40,9 +43,60 @@ auth = HubAuth(
 
 DEMO_PROBLEM_NAME = "demo"
 
+# time limit in seconds for extracting feature values, or None for no limit
+_time_limit = os.environ.get("EVAL_FEATURE_TIME_LIMIT")
+FEATURE_TIME_LIMIT = float(_time_limit) if _time_limit else None
+
+# prepared evaluation datasets, shared by all requests of this process. Each
+# worker process has its own cache; invalidations are shared with the other
+# processes through FF_DATA_DIR.
+if os.environ.get("FF_DATA_DIR"):
+    dataset_cache_path = os.path.join(os.environ.get("FF_DATA_DIR"),
+            "eval-server", "dataset-cache")
+else:
+    dataset_cache_path = None
+dataset_cache = ProblemDatasetCache(
+    max_bytes = int(os.environ.get("EVAL_DATASET_CACHE_MB") or 2048) * 1024 ** 2,
+    path      = dataset_cache_path,
+)
+
+# number of submissions evaluated concurrently
+SUBMIT_WORKERS = int(os.environ.get("EVAL_SUBMIT_WORKERS") or 1)
+
+# number of rows of the test split predicted and scored at once, to bound the
+# memory used for scoring, or None to predict the whole test split at once
+SCORING_BATCH_SIZE = int(os.environ.get("EVAL_SCORING_BATCH_SIZE") or 0) or None
+
+# directory in which the values of registered features are stored, so that
+# postprocessing does not extract them again, or None not to store them
+FEATURE_VALUES_DIR = os.environ.get("EVAL_FEATURE_VALUES_DIR") or None
+if FEATURE_VALUES_DIR:
+    feature_values_store = FeatureStore(FEATURE_VALUES_DIR)
+else:
+    feature_values_store = None
+
+# maximum time in seconds that a request for the status of a submission waits
+# for the submission to be evaluated
+MAX_STATUS_WAIT = 60
+
 # app
 app = Flask("eval-server")
 
+def log_submission_error(job, tb):
+    app.logger.error("Unexpected error processing submission (job id '{}'):\n"
+                     "{}".format(job.id, tb))
+
+# submission jobs are recorded on disk, so that any worker process of the
+# server can report their status
+if os.environ.get("FF_DATA_DIR"):
+    job_store = JobStore(os.path.join(os.environ.get("FF_DATA_DIR"), "eval-server",
+        "jobs"))
+else:
+    job_store = None
+
+submission_queue = SubmissionQueue(workers=SUBMIT_WORKERS,
+        on_error=log_submission_error, store=job_store)
+
 def authenticated(f):
     """Decorator for authenticating with the Hub"""
     @wraps(f)
@@ -137,13 +191,45 @@ def log_evaluation_attempt(user):
     finally:
         return Response()
 
+@app.route(prefix + "/invalidate-dataset-cache", methods=["POST"])
+@authenticated
+def invalidate_dataset_cache(user):
+    """Drop cached evaluation datasets.
+
+    Extracts 'database' and, optionally, 'problem_id' from POST body. If no
+    problem id is given, drops the datasets of all problems. Only available to
+    admin users.
+    """
+
+    if not user.get("admin"):
+        app.logger.info("User '{}' is not allowed to invalidate the dataset "
+                        "cache.".format(user["name"]))
+        return Response(status=403)
+
+    try:
+        database   = request.form["database"]
+        problem_id = request.form.get("problem_id")
+    except Exception:
+        app.logger.exception("Couldn't read parameters from form.")
+        return Response(status=400)
+
+    if problem_id:
+        dataset_cache.invalidate((database, str(problem_id)))
+    else:
+        dataset_cache.invalidate()
+    app.logger.debug("Invalidated dataset cache (database '{}', problem id "
+            "'{}')".format(database, problem_id))
+    return Response()
+
 @app.route(prefix + "/submit", methods=["POST"])
 @authenticated
 def submit(user):
-    """Process user request to submit feature.
+    """Enqueue user request to submit feature.
 
     Extracts 'database', 'problem_id', 'code', and 'description' from POST
-    body.
+    body. Responds immediately with a pending status and the id of the
+    submission job, which can be used to request the result from
+    /submit-status/<job_id>.
     """
 
     try:
@@ -159,6 +245,81 @@ def submit(user):
         )
     app.logger.debug("Read parameters from form.")
 
+    # a feature that is submitted again while its first submission is still
+    # pending is not evaluated twice
+    user_name = user["name"]
+    key = (database, str(problem_id), myhash(code))
+    job_id = submission_queue.submit(run_submission,
+            (user_name, database, problem_id, feature_dill, code, description),
+            owner=user_name, key=key)
+    app.logger.debug("Enqueued submission (job id '{}').".format(job_id))
+
+    return EvaluationResponse(
+        status_code = EvaluationResponse.STATUS_CODE_PENDING,
+        job_id      = job_id,
+    )
+
+@app.route(prefix + "/submit-status/<job_id>", methods=["GET"])
+@authenticated
+def submit_status(user, job_id):
+    """Return result of a submission job.
+
+    If the optional 'wait' query parameter is given, waits up to that many
+    seconds (at most MAX_STATUS_WAIT) for the submission to be evaluated
+    before responding. Responds with a pending status if the submission is not
+    evaluated yet.
+    """
+
+    try:
+        wait = min(float(request.args.get("wait", 0)), MAX_STATUS_WAIT)
+    except ValueError:
+        app.logger.exception("Couldn't read parameters from query string.")
+        return EvaluationResponse(
+            status_code = EvaluationResponse.STATUS_CODE_BAD_REQUEST
+        )
+
+    job = submission_queue.get(job_id)
+    if job is None or job.owner != user["name"]:
+        app.logger.info("Unknown submission (job id '{}') for user '{}'"
+                .format(job_id, user["name"]))
+        return EvaluationResponse(
+            status_code = EvaluationResponse.STATUS_CODE_BAD_REQUEST
+        )
+
+    if wait > 0:
+        job = submission_queue.wait(job_id, timeout=wait)
+
+    if job.status == Job.DONE:
+        result = EvaluationResponse.from_string(job.result)
+        return EvaluationResponse(
+            status_code = result.status_code1,
+            metrics     = result.metrics,
+            topic_url   = result.topic_url,
+            job_id      = job_id,
+        )
+    elif job.status == Job.FAILED:
+        return EvaluationResponse(
+            status_code = EvaluationResponse.STATUS_CODE_SERVER_ERROR,
+            job_id      = job_id,
+        )
+    else:
+        return EvaluationResponse(
+            status_code = EvaluationResponse.STATUS_CODE_PENDING,
+            job_id      = job_id,
+        )
+
+def run_submission(*args):
+    """Evaluate submission and return the json-dumped EvaluationResponse."""
+    return process_submission(*args).get_data(as_text=True)
+
+def process_submission(user_name, database, problem_id, feature_dill, code,
+        description):
+    """Evaluate and register submitted feature.
+
+    Runs on a worker thread of the submission queue. Returns an
+    EvaluationResponse.
+    """
+
     # preprocessing
     # - look up the problem in the databasse
     # - look up the user in the database
@@ -186,7 +347,6 @@ def submit(user):
         app.logger.debug("Accessed problem (id '{}') from db"
                 .format(problem_id))
 
-        user_name = user["name"]
         try:
             user_obj = session.query(User).filter(User.name == user_name).one()
         except (NoResultFound, MultipleResultsFound) as e:
@@ -200,7 +360,10 @@ def submit(user):
         md5 = myhash(code)
         app.logger.debug("Computed feature hash.")
 
-        evaluator = EvaluatorServer(problem_id, user_name, orm)
+        evaluator = EvaluatorServer(problem_id, user_name, orm,
+                time_limit=FEATURE_TIME_LIMIT, dataset_cache=dataset_cache,
+                isolated_processes=SUBMIT_WORKERS,
+                batch_size=SCORING_BATCH_SIZE)
         try:
             is_registered = evaluator.check_if_registered(code)
             if is_registered:
@@ -275,6 +438,14 @@ def submit(user):
             )
         app.logger.debug("Inserted into db.")
 
+        # store feature values for postprocessing
+        if feature_values_store is not None:
+            try:
+                evaluator.save_feature_values(feature_values_store, md5)
+                app.logger.debug("Stored feature values.")
+            except Exception:
+                app.logger.exception("Unexpected error storing feature values")
+
         # post to forum
         problem_name = problem_obj.name
         if is_positive_env(os.environ.get("USE_DISCOURSE")) and \
@@ -298,6 +469,33 @@ def submit(user):
         topic_url=topic_url,
     )
 
+def serve(host, port, workers, threads):
+    """Serve app with gunicorn, using worker processes with several threads.
+
+    Status requests wait for submissions on their own threads, so the number
+    of threads bounds the number of users that can wait at once. Submissions
+    are evaluated on the submission queue of the process that received them.
+    """
+    from gunicorn.app.base import BaseApplication
+
+    options = {
+        "bind"         : "{}:{}".format(host, port),
+        "workers"      : workers,
+        "threads"      : threads,
+        "worker_class" : "gthread",
+        "timeout"      : MAX_STATUS_WAIT + 60,
+    }
+
+    class EvalServerApplication(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    EvalServerApplication().run()
+
 if __name__ == "__main__":
     # set up logging
     log_filename = os.path.join(os.environ.get("FF_DATA_DIR"), "log", "eval-server",
@@ -306,7 +504,8 @@ if __name__ == "__main__":
         os.makedirs(os.path.dirname(log_filename))
     handler = RotatingFileHandler(log_filename, maxBytes=1024 * 1024 * 5,
             backupCount=5)
-    formatter = logging.Formatter("[%(asctime)s] {%(pathname)s:%(lineno)d} "
+    formatter = logging.Formatter("[%(asctime)s] {%(process)d} "
+                                  "{%(pathname)s:%(lineno)d} "
                                   "%(levelname)s - %(message)s")
     handler.setFormatter(formatter)
     handler.setLevel(logging.DEBUG)
@@ -314,11 +513,23 @@ if __name__ == "__main__":
     app.logger.setLevel(logging.DEBUG)
 
     # run app
-    host  = "0.0.0.0"
-    port  = int(os.environ.get("EVAL_CONTAINER_PORT", 5000))
-    debug = is_positive_env(os.environ.get("EVAL_FLASK_DEBUG", False))
-    app.run(
-        host  = host,
-        port  = port,
-        debug = debug
-    )
+    host    = "0.0.0.0"
+    port    = int(os.environ.get("EVAL_CONTAINER_PORT", 5000))
+    debug   = is_positive_env(os.environ.get("EVAL_FLASK_DEBUG", False))
+    workers = int(os.environ.get("EVAL_SERVER_WORKERS") or 1)
+    threads = int(os.environ.get("EVAL_SERVER_THREADS") or 16)
+    try:
+        import gunicorn
+    except ImportError:
+        gunicorn = None
+
+    if gunicorn is not None and not debug:
+        serve(host, port, workers, threads)
+    else:
+        # development server, with one thread per request
+        app.run(
+            host     = host,
+            port     = port,
+            debug    = debug,
+            threaded = True,
+        )
@@ -1,2 +1,4 @@
 from .model import *
 from .metrics import *
+from .baseline import *
+from .config import *
@@ -0,0 +1,215 @@
+import threading
+
+import numpy as np
+from sklearn.dummy import DummyClassifier, DummyRegressor
+
+from featurehub.modeling.metrics import Metric, MetricList
+from featurehub.modeling.model import Model
+
+class Baseline(object):
+    """Cross validation state shared by all evaluations of a problem.
+
+    A feature is evaluated by fitting a model on the baseline features of the
+    problem (the entities_featurized table) together with the new feature. The
+    folds and the baseline features, formatted and prepared for the learner,
+    are the same for every feature, so they are computed once here, and
+    evaluating a feature only appends its columns. The baseline features are
+    kept in a buffer with SPARE_COLUMNS more columns, in which the columns of
+    a feature are written in place, so that the baseline features are not
+    copied for each evaluation. Evaluations that run while the buffer is in
+    use by another one, or of features with more columns, copy the baseline
+    features instead.
+
+    The models fit on the baseline features alone, and their metrics, are
+    computed when first needed, to report the lift of features over the
+    baseline. If there are no baseline features, the baseline model predicts
+    the class priors (classification) or the mean (regression).
+
+    Parameters
+    ----------
+    problem_type : str
+        One of "classification" or "regression"
+    X : numpy array-like or pd.DataFrame or None
+        baseline features, or None if the problem has none
+    Y : numpy array-like or pd.DataFrame or pd.DataSeries
+        labels
+    folds : list of (train indices, test indices), optional
+        Folds on which to evaluate features. By default, the cross validation
+        folds computed by Model.get_folds, with cv_folds folds.
+    learner : str, optional (default="tree")
+        Learner of the models; see Model. For binned trees, the baseline
+        features are binned once here.
+    batch_size : int, optional (default=None)
+        Number of rows of test sets predicted and scored at once; see Model.
+    scorings : list of str, optional (default=None)
+        Scorings to compute; see Model.
+    cv_folds : int, optional (default=None)
+        Number of cross validation folds; see Model.
+
+    Examples
+    --------
+    >>> baseline = Baseline("classification", entities_featurized, target)
+    >>> metrics = baseline.compute_metrics(feature_values)
+    >>> lift = baseline.lift(metrics)
+    """
+
+    # number of columns of new features that can be evaluated without copying
+    # the baseline features
+    SPARE_COLUMNS = 8
+
+    def __init__(self, problem_type, X, Y, folds=None, learner=Model.TREE,
+            batch_size=None, scorings=None, cv_folds=None):
+        self.problem_type = problem_type
+        self.learner      = learner
+        self.batch_size   = batch_size
+        self.scorings     = scorings
+        self.cv_folds     = cv_folds
+
+        Y = Model._formatY(Y)
+        if X is None:
+            X = np.empty((len(Y), 0))
+        else:
+            X = Model._formatX(X)
+        Baseline._check_n_rows(X.shape[0], len(Y))
+
+        model = self._create_model()
+        if folds is None:
+            folds = model.get_folds(X, Y)
+        X = model._prepare_X(X)
+
+        # columns are contiguous in the buffer, as binned trees read them one
+        # at a time
+        n_features = X.shape[1]
+        buffer = np.empty((len(Y), n_features + Baseline.SPARE_COLUMNS),
+                dtype=X.dtype, order="F")
+        buffer[:, :n_features] = X
+
+        self.n_rows     = len(Y)
+        self.n_features = n_features
+        self.folds      = folds
+        self.X          = buffer[:, :n_features]
+        self.Y          = Y
+
+        self._models      = None
+        self._metrics     = None
+        self._lock        = threading.Lock()
+        self._buffer      = buffer
+        self._buffer_lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory used by the baseline features, labels and folds.
+
+        The models fit on the baseline features alone are not counted.
+        """
+        nbytes = self._buffer.nbytes + self.Y.nbytes
+        for train_inds, test_inds in self.folds:
+            nbytes += np.asarray(train_inds).nbytes
+            nbytes += np.asarray(test_inds).nbytes
+        return nbytes
+
+    @property
+    def models(self):
+        """Models fit on the baseline features alone, one per fold."""
+        self._fit()
+        return self._models
+
+    @property
+    def metrics(self):
+        """MetricList of the models fit on the baseline features alone."""
+        self._fit()
+        return self._metrics
+
+    def compute_metrics(self, X, n_jobs=None):
+        """Compute metrics of a model fit on the baseline and new features.
+
+        Returns the same metrics as Model.compute_metrics_cv on the baseline
+        features concatenated with X, on the folds of this baseline.
+
+        Parameters
+        ----------
+        X : numpy array-like or pd.DataFrame
+            new features, with rows aligned with the baseline features
+        n_jobs : int, optional (default=None)
+            Number of folds to fit in parallel; see Model.
+        """
+        X = Model._formatX(X)
+        Baseline._check_n_rows(X.shape[0], self.n_rows)
+
+        model = self._create_model(n_jobs=n_jobs)
+        X = model._prepare_X(X)
+        n_columns = self.n_features + X.shape[1]
+        if (n_columns <= self._buffer.shape[1] and
+                X.dtype == self._buffer.dtype and
+                self._buffer_lock.acquire(blocking=False)):
+            try:
+                self._buffer[:, self.n_features:n_columns] = X
+                _, metrics = self._score(model, self._buffer[:, :n_columns])
+            finally:
+                self._buffer_lock.release()
+        else:
+            _, metrics = self._score(model, np.hstack([self.X, X]))
+        return metrics
+
+    def lift(self, metrics):
+        """Return the improvement of metrics over the baseline metrics.
+
+        Positive values are improvements. For metrics for which lower is
+        better, such as errors, the lift is the baseline value minus the
+        value.
+
+        Parameters
+        ----------
+        metrics : MetricList
+        """
+        baseline_values = { m.name : m.value for m in self.metrics }
+
+        lift = MetricList()
+        for metric in metrics:
+            baseline_value = baseline_values.get(metric.name)
+            if metric.value is None or baseline_value is None:
+                value = None
+            elif Metric.greater_is_better(metric.name):
+                value = metric.value - baseline_value
+            else:
+                value = baseline_value - metric.value
+            lift.append(Metric(metric.name, metric.scoring, value))
+
+        return lift
+
+    def _fit(self):
+        with self._lock:
+            if self._metrics is not None:
+                return
+
+            model = self._create_model()
+            X = self.X
+            if self.n_features == 0:
+                # the prior model ignores the data, but scikit-learn rejects
+                # data without columns
+                model.model = self._get_prior_model()
+                X = np.zeros((self.n_rows, 1))
+            self._models, self._metrics = self._score(model, X)
+
+    def _score(self, model, X):
+        scorings, scorings_ = model._get_scorings()
+        models, scores = model.fit_and_score_folds(X, self.Y, self.folds,
+                scorings_)
+        return models, model.scores_to_metriclist(scorings, scores)
+
+    def _create_model(self, n_jobs=None):
+        return Model(self.problem_type, n_jobs=n_jobs, learner=self.learner,
+                batch_size=self.batch_size, scorings=self.scorings,
+                cv_folds=self.cv_folds)
+
+    def _get_prior_model(self):
+        if self.problem_type == Model.CLASSIFICATION:
+            return DummyClassifier(strategy="prior")
+        else:
+            return DummyRegressor(strategy="mean")
+
+    @staticmethod
+    def _check_n_rows(n_rows_X, n_rows_Y):
+        if n_rows_X != n_rows_Y:
+            raise ValueError("Found input variables with inconsistent numbers "
+                             "of samples: [{}, {}]".format(n_rows_X, n_rows_Y))
@@ -0,0 +1,440 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
+from sklearn.preprocessing import LabelEncoder
+
+class Binner(object):
+    """Map the values of each column of a matrix to uint8 bin codes.
+
+    Bin edges are the midpoints between distinct values if a column has at
+    most `max_bins` distinct values, and quantiles of the values otherwise.
+    Missing values are put in a bin of their own, with code `max_bins`.
+
+    Parameters
+    ----------
+    max_bins : int, optional (default=255)
+        Maximum number of bins of non-missing values, between 2 and 255.
+    subsample : int, optional (default=200000)
+        Bin edges are computed from a random sample of this many rows, if
+        there are more.
+    random_state : int, optional (default=0)
+        Seed of the random sample.
+
+    Examples
+    --------
+    >>> binner = Binner().fit(X)
+    >>> codes = binner.transform(X)
+    """
+
+    def __init__(self, max_bins=255, subsample=200000, random_state=0):
+        if not 2 <= max_bins <= 255:
+            raise ValueError("Bad max_bins: {}".format(max_bins))
+        self.max_bins     = max_bins
+        self.subsample    = subsample
+        self.random_state = random_state
+
+    def fit(self, X):
+        X = _as_matrix(X)
+        if self.subsample is not None and X.shape[0] > self.subsample:
+            rng = np.random.RandomState(self.random_state)
+            rows = rng.choice(X.shape[0], self.subsample, replace=False)
+            X = X[rows]
+
+        self.edges_ = [self._find_edges(X[:, j]) for j in range(X.shape[1])]
+        return self
+
+    def transform(self, X):
+        X = _as_matrix(X)
+        if X.shape[1] != len(self.edges_):
+            raise ValueError("X has {} columns, expected {}"
+                    .format(X.shape[1], len(self.edges_)))
+
+        # column-major, as trees access the codes one column at a time
+        codes = np.empty(X.shape, dtype=np.uint8, order="F")
+        for j, edges in enumerate(self.edges_):
+            x = X[:, j]
+            codes[:, j] = np.searchsorted(edges, x, side="left")
+            codes[np.isnan(x), j] = self.max_bins
+
+        return codes
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    def _find_edges(self, x):
+        x = x[~np.isnan(x)]
+        if len(x) == 0:
+            return np.empty(0)
+
+        distinct = np.unique(x)
+        if len(distinct) <= self.max_bins:
+            return (distinct[:-1] + distinct[1:]) / 2
+
+        percentiles = np.linspace(0, 100, self.max_bins + 1)[1:-1]
+        return np.unique(np.percentile(x, percentiles))
+
+class _BinnedTree(BaseEstimator):
+    """Decision tree fit on binned features.
+
+    Splits are chosen from histograms of the binned feature values of all the
+    nodes at a given depth at once, so fitting costs a pass over the rows per
+    level of the tree and feature, instead of sorting feature values at each
+    node.
+
+    X may be passed to fit and predict either as floats, which are then binned
+    by a Binner fit on the training data, or as bin codes (uint8) from a
+    Binner with the same `max_bins`, so that data can be binned once and used
+    for several fits. The tree may also be fit on a subset of the rows of X
+    and y, given by `sample_indices`, without copying them.
+    """
+
+    # maximum number of histogram cells computed at once
+    MAX_HISTOGRAM_SIZE = 2 ** 22
+
+    def __init__(self, max_depth=None, min_samples_split=2, min_samples_leaf=1,
+            max_bins=255):
+        self.max_depth         = max_depth
+        self.min_samples_split = min_samples_split
+        self.min_samples_leaf  = min_samples_leaf
+        self.max_bins          = max_bins
+
+    def fit(self, X, y, sample_indices=None):
+        y = np.asarray(y).ravel()
+        if len(y) != len(X):
+            raise ValueError("Found input variables with inconsistent numbers "
+                             "of samples: [{}, {}]".format(len(X), len(y)))
+        if sample_indices is None:
+            rows = np.arange(len(y))
+        else:
+            rows = np.asarray(sample_indices, dtype=np.intp)
+
+        if _is_binned(X):
+            self.binner_ = None
+            codes = _as_matrix(X)
+        else:
+            self.binner_ = Binner(max_bins=self.max_bins)
+            codes = self.binner_.fit(_as_matrix(X)[rows]).transform(X)
+
+        targets, n_channels = self._encode_targets(y, rows)
+        self._grow(codes, targets, n_channels, rows)
+        return self
+
+    def _bin(self, X):
+        if self.binner_ is not None:
+            return self.binner_.transform(X)
+        if not _is_binned(X):
+            raise ValueError("Model was fit on binned data, but X is not "
+                             "binned")
+        return _as_matrix(X)
+
+    def _predict_values(self, X):
+        codes = self._bin(X)
+
+        node = np.zeros(codes.shape[0], dtype=np.intp)
+        active = np.flatnonzero(self.children_left_[node] != -1)
+        while len(active):
+            active_node = node[active]
+            go_left = (codes[active, self.feature_[active_node]] <=
+                       self.threshold_[active_node])
+            node[active] = np.where(go_left, self.children_left_[active_node],
+                    self.children_right_[active_node])
+            active = active[self.children_left_[node[active]] != -1]
+
+        return self.value_[node]
+
+    def _grow(self, codes, targets, n_channels, rows):
+        n_rows, n_features = codes.shape
+        n_bins = self.max_bins + 1
+        min_split = max(self.min_samples_split, 2 * self.min_samples_leaf)
+
+        # the root
+        counts, sums = self._histogram(np.zeros(len(rows), dtype=np.intp),
+                targets[rows], 1, n_channels)
+        feature   = np.zeros(1, dtype=np.intp)
+        threshold = np.zeros(1, dtype=np.intp)
+        left      = np.full(1, -1, dtype=np.intp)
+        right     = np.full(1, -1, dtype=np.intp)
+        values    = [sums / counts[:, None]]
+
+        # rows in nodes that may still be split, the node of each row, and
+        # the nodes that may be split with their row counts and target sums
+        node_of_row = np.zeros(n_rows, dtype=np.intp)
+        frontier = np.zeros(1, dtype=np.intp)
+        frontier_counts, frontier_sums = counts, sums
+
+        depth = 0
+        while len(frontier) and (self.max_depth is None or
+                                 depth < self.max_depth):
+            splittable = frontier_counts >= min_split
+            frontier = frontier[splittable]
+            frontier_counts = frontier_counts[splittable]
+            frontier_sums = frontier_sums[splittable]
+            if not len(frontier):
+                break
+
+            local_of_node = np.full(len(feature), -1, dtype=np.intp)
+            local_of_node[frontier] = np.arange(len(frontier))
+            local = local_of_node[node_of_row[rows]]
+            keep = local >= 0
+            rows, local = rows[keep], local[keep]
+
+            is_split, split_feature, split_threshold, left_counts, left_sums \
+                    = self._find_splits(codes, targets, n_channels, n_bins,
+                            rows, local, frontier_counts, frontier_sums)
+            split = np.flatnonzero(is_split)
+            if not len(split):
+                break
+
+            # create the children of split nodes, left and right interleaved
+            n_nodes = len(feature)
+            n_children = 2 * len(split)
+            left_id = np.full(len(frontier), -1, dtype=np.intp)
+            left_id[split] = n_nodes + np.arange(0, n_children, 2)
+            right_id = left_id + 1
+
+            parents = frontier[split]
+            feature[parents] = split_feature[split]
+            threshold[parents] = split_threshold[split]
+            left[parents] = left_id[split]
+            right[parents] = right_id[split]
+
+            children_counts = np.empty(n_children)
+            children_counts[0::2] = left_counts[split]
+            children_counts[1::2] = frontier_counts[split] - left_counts[split]
+            children_sums = np.empty((n_children, n_channels))
+            children_sums[0::2] = left_sums[split]
+            children_sums[1::2] = frontier_sums[split] - left_sums[split]
+
+            feature = np.concatenate([feature,
+                np.zeros(n_children, dtype=np.intp)])
+            threshold = np.concatenate([threshold,
+                np.zeros(n_children, dtype=np.intp)])
+            left = np.concatenate([left, np.full(n_children, -1, dtype=np.intp)])
+            right = np.concatenate([right,
+                np.full(n_children, -1, dtype=np.intp)])
+            values.append(children_sums / children_counts[:, None])
+
+            # move rows of split nodes to the children
+            keep = is_split[local]
+            rows, local = rows[keep], local[keep]
+            go_left = (codes[rows, split_feature[local]] <=
+                       split_threshold[local])
+            node_of_row[rows] = np.where(go_left, left_id[local],
+                    right_id[local])
+
+            frontier = np.arange(n_nodes, n_nodes + n_children)
+            frontier_counts = children_counts
+            frontier_sums = children_sums
+            depth += 1
+
+        self.feature_        = feature
+        self.threshold_      = threshold
+        self.children_left_  = left
+        self.children_right_ = right
+        self.value_          = np.concatenate(values)
+        self.node_count      = len(feature)
+
+    def _find_splits(self, codes, targets, n_channels, n_bins, rows, local,
+            counts, sums):
+        """Find the best split of each node, over all features and bins.
+
+        The quality of a split is the sum over both children of the squared
+        target sums divided by the counts; maximizing it minimizes the gini
+        impurity (for class indicator targets) or the squared error.
+        """
+        n_nodes = len(counts)
+        parent_score = (sums ** 2).sum(axis=1) / counts
+        best_score = parent_score.copy()
+        best_feature = np.zeros(n_nodes, dtype=np.intp)
+        best_threshold = np.zeros(n_nodes, dtype=np.intp)
+        best_left_counts = np.zeros(n_nodes)
+        best_left_sums = np.zeros((n_nodes, n_channels))
+
+        # Histograms have a cell per node and bin. Near the root, where there
+        # are few nodes with many rows each, all cells are computed, for
+        # chunks of nodes to bound memory use. Deeper, where most cells are
+        # empty, only the non-empty cells are computed.
+        row_targets = targets[rows]
+        sparse = len(rows) < n_nodes * n_bins
+        if not sparse:
+            chunk = max(1, _BinnedTree.MAX_HISTOGRAM_SIZE //
+                           (n_bins * n_channels))
+            chunks = []
+            for start in range(0, n_nodes, chunk):
+                stop = min(start + chunk, n_nodes)
+                in_chunk = np.flatnonzero((local >= start) & (local < stop))
+                chunks.append((start, stop, in_chunk))
+
+        for j in range(codes.shape[1]):
+            bins = codes[rows, j]
+            if sparse:
+                splits = [self._best_splits_sparse(local, bins, row_targets,
+                    n_bins, n_channels, counts, sums)]
+            else:
+                splits = [self._best_splits_dense(start, stop,
+                    local[in_chunk], bins[in_chunk], row_targets[in_chunk],
+                    n_bins, n_channels, counts, sums)
+                    for start, stop, in_chunk in chunks]
+
+            for nodes, score, threshold, left_counts, left_sums in splits:
+                better = score > best_score[nodes]
+                better_nodes = nodes[better]
+                best_score[better_nodes] = score[better]
+                best_feature[better_nodes] = j
+                best_threshold[better_nodes] = threshold[better]
+                best_left_counts[better_nodes] = left_counts[better]
+                best_left_sums[better_nodes] = left_sums[better]
+
+        # only split if the impurity decreases by more than rounding errors
+        gain = best_score - parent_score
+        is_split = gain > 1e-10 * np.abs(parent_score)
+        return (is_split, best_feature, best_threshold, best_left_counts,
+                best_left_sums)
+
+    def _best_splits_dense(self, start, stop, local, bins, targets, n_bins,
+            n_channels, counts, sums):
+        """Best split of nodes start to stop, from their full histograms."""
+        n_nodes = stop - start
+        nodes = np.arange(start, stop)
+        key = (local - start) * n_bins + bins
+        hist_counts, hist_sums = self._histogram(key, targets,
+                n_nodes * n_bins, n_channels)
+        hist_counts = hist_counts.reshape(n_nodes, n_bins)
+        hist_sums = hist_sums.reshape(n_nodes, n_bins, n_channels)
+
+        # children of splitting at each threshold, where rows with codes up to
+        # the threshold go left
+        left_counts = np.cumsum(hist_counts, axis=1)[:, :-1]
+        left_sums = np.cumsum(hist_sums, axis=1)[:, :-1]
+        right_counts = counts[nodes, None] - left_counts
+        right_sums = sums[nodes, None] - left_sums
+        score = self._split_score(left_counts, left_sums, right_counts,
+                right_sums)
+
+        threshold = np.argmax(score, axis=1)
+        index = np.arange(n_nodes)
+        return (nodes, score[index, threshold], threshold,
+                left_counts[index, threshold], left_sums[index, threshold])
+
+    def _best_splits_sparse(self, local, bins, targets, n_bins, n_channels,
+            counts, sums):
+        """Best split of nodes, from the non-empty cells of their histograms.
+
+        Splitting at an empty bin is the same as splitting at the previous
+        non-empty bin, so only the non-empty cells need to be considered.
+        """
+        cells, inverse = np.unique(local * n_bins + bins, return_inverse=True)
+        cell_counts, cell_sums = self._histogram(inverse, targets, len(cells),
+                n_channels)
+
+        # cells are sorted by node and bin; cumulate them within each node
+        cell_node = cells // n_bins
+        starts = np.flatnonzero(np.r_[True, cell_node[1:] != cell_node[:-1]])
+        group = np.repeat(np.arange(len(starts)),
+                np.diff(np.r_[starts, len(cells)]))
+        cum_counts = np.cumsum(cell_counts)
+        cum_sums = np.cumsum(cell_sums, axis=0)
+        left_counts = cum_counts - (cum_counts - cell_counts)[starts][group]
+        left_sums = cum_sums - (cum_sums - cell_sums)[starts][group]
+        right_counts = counts[cell_node] - left_counts
+        right_sums = sums[cell_node] - left_sums
+        score = self._split_score(left_counts, left_sums, right_counts,
+                right_sums)
+
+        # first cell with the best score of each node
+        best = np.flatnonzero(score == np.maximum.reduceat(score, starts)[group])
+        best = best[np.r_[True, group[best][1:] != group[best][:-1]]]
+        return (cell_node[best], score[best], cells[best] % n_bins,
+                left_counts[best], left_sums[best])
+
+    def _split_score(self, left_counts, left_sums, right_counts, right_sums):
+        valid = ((left_counts >= self.min_samples_leaf) &
+                 (right_counts >= self.min_samples_leaf))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            score = ((left_sums ** 2).sum(axis=-1) / left_counts +
+                     (right_sums ** 2).sum(axis=-1) / right_counts)
+        score[~valid] = -np.inf
+        return score
+
+    def _encode_targets(self, y, rows):
+        raise NotImplementedError
+
+    def _histogram(self, key, targets, size, n_channels):
+        raise NotImplementedError
+
+class BinnedTreeClassifier(_BinnedTree, ClassifierMixin):
+    """Decision tree classifier fit on binned features.
+
+    Splits minimize the gini impurity, as in DecisionTreeClassifier.
+
+    Parameters
+    ----------
+    max_depth : int, optional (default=None)
+        Maximum depth of the tree. By default, nodes are split until they are
+        pure or contain less than min_samples_split samples.
+    min_samples_split : int, optional (default=2)
+        Minimum number of samples required to split a node.
+    min_samples_leaf : int, optional (default=1)
+        Minimum number of samples in each leaf.
+    max_bins : int, optional (default=255)
+        Maximum number of bins of each feature.
+    """
+
+    def predict_proba(self, X):
+        return self._predict_values(X)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+    def _encode_targets(self, y, rows):
+        # classes are those of the training rows; other rows are not used
+        encoder = LabelEncoder()
+        targets = np.zeros(len(y), dtype=np.intp)
+        targets[rows] = encoder.fit_transform(y[rows])
+        self.classes_ = encoder.classes_
+        self.n_classes_ = len(self.classes_)
+        return targets, self.n_classes_
+
+    def _histogram(self, key, targets, size, n_channels):
+        # number of rows of each class, per cell
+        sums = np.bincount(key * n_channels + targets,
+                minlength=size * n_channels).reshape(size, n_channels)
+        counts = sums.sum(axis=1)
+        return counts.astype(np.float64), sums.astype(np.float64)
+
+class BinnedTreeRegressor(_BinnedTree, RegressorMixin):
+    """Decision tree regressor fit on binned features.
+
+    Splits minimize the squared error, as in DecisionTreeRegressor.
+
+    Parameters
+    ----------
+    max_depth : int, optional (default=None)
+        Maximum depth of the tree. By default, nodes are split until they are
+        pure or contain less than min_samples_split samples.
+    min_samples_split : int, optional (default=2)
+        Minimum number of samples required to split a node.
+    min_samples_leaf : int, optional (default=1)
+        Minimum number of samples in each leaf.
+    max_bins : int, optional (default=255)
+        Maximum number of bins of each feature.
+    """
+
+    def predict(self, X):
+        return self._predict_values(X)[:, 0]
+
+    def _encode_targets(self, y, rows):
+        return np.asarray(y, dtype=np.float64), 1
+
+    def _histogram(self, key, targets, size, n_channels):
+        counts = np.bincount(key, minlength=size).astype(np.float64)
+        sums = np.bincount(key, weights=targets, minlength=size)
+        return counts, sums.reshape(size, 1)
+
+def _is_binned(X):
+    return getattr(X, "dtype", None) == np.uint8
+
+def _as_matrix(X):
+    X = np.asarray(X)
+    if X.ndim == 1:
+        X = X.reshape(-1, 1)
+    return X
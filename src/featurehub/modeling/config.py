@@ -0,0 +1,98 @@
+import json
+import numbers
+
+from featurehub.modeling.model import Model
+
+class EvaluationConfig(object):
+    """Configuration of the evaluation of features for one problem.
+
+    The configuration is stored in the problem_type_details of the problem
+    (see Commands.create_problem), so that each problem can trade the accuracy
+    of feature evaluation for throughput.
+
+    Parameters
+    ----------
+    learner : str, optional (default="tree")
+        Learner of the models used to evaluate features; see Model.
+    scorings : list of str, optional (default=None)
+        Scorings reported for each feature; see Model. By default, the default
+        scorings of the problem type.
+    cv_folds : int, optional (default=None)
+        Number of cross validation folds used to evaluate features in
+        notebooks; see Model. The evaluation server always evaluates features
+        on the train/test split of the problem.
+    time_budget : float, optional (default=None)
+        Time limit in seconds for extracting the values of a feature. If the
+        evaluator has a time limit of its own, the lower of both applies.
+
+    Examples
+    --------
+    >>> config = EvaluationConfig.from_problem_type_details(
+    ...     '{"learner" : "binned_tree", "scorings" : ["roc_auc"]}')
+    >>> model = config.create_model("classification")
+    """
+
+    # entries of problem_type_details read by from_problem_type_details
+    KEYS = ["learner", "scorings", "cv_folds", "time_budget"]
+
+    def __init__(self, learner=Model.TREE, scorings=None, cv_folds=None,
+            time_budget=None):
+        if learner not in Model.LEARNERS:
+            raise ValueError("Bad learner: {}".format(learner))
+        if scorings is not None and (isinstance(scorings, str) or
+                not all(isinstance(s, str) for s in scorings)):
+            raise ValueError("Bad scorings: {}".format(scorings))
+        if cv_folds is not None and (not isinstance(cv_folds, numbers.Integral)
+                or cv_folds < 2):
+            raise ValueError("Bad cv_folds: {}".format(cv_folds))
+        if time_budget is not None and (
+                not isinstance(time_budget, numbers.Real) or time_budget <= 0):
+            raise ValueError("Bad time_budget: {}".format(time_budget))
+
+        self.learner     = learner
+        self.scorings    = list(scorings) if scorings is not None else None
+        self.cv_folds    = cv_folds
+        self.time_budget = time_budget
+
+    @classmethod
+    def from_problem_type_details(cls, problem_type_details):
+        """Instantiate EvaluationConfig from the details of a problem.
+
+        Other entries of the details, such as "classification_type", are
+        ignored.
+
+        Parameters
+        ----------
+        problem_type_details : str or dict or None
+            Details of the problem, as a dict or as stored in the database
+            (JSON)
+        """
+        if isinstance(problem_type_details, str):
+            problem_type_details = json.loads(problem_type_details or "{}")
+        details = problem_type_details or {}
+
+        kwargs = {key : details[key] for key in EvaluationConfig.KEYS
+                if details.get(key) is not None}
+        return cls(**kwargs)
+
+    def create_model(self, problem_type, batch_size=None):
+        """Create a Model with this configuration.
+
+        Raises ValueError if a scoring is not available for the problem type.
+        """
+        return Model(problem_type, learner=self.learner, batch_size=batch_size,
+                scorings=self.scorings, cv_folds=self.cv_folds)
+
+    def get_time_limit(self, time_limit=None):
+        """Return the time limit for extracting the values of a feature.
+
+        Parameters
+        ----------
+        time_limit : float, optional (default=None)
+            Time limit of the evaluator, or None for no limit.
+        """
+        if time_limit is None:
+            return self.time_budget
+        if self.time_budget is None:
+            return time_limit
+        return min(time_limit, self.time_budget)
@@ -90,18 +90,38 @@ class Metric(object):
     @staticmethod
     def name_to_scoring(name):
         """Find the scoring type associated with the metric name."""
+        d = Metric._find_scoring(name)
+        if d is not None:
+            return d["scoring"]
+
+        return None
+
+    @staticmethod
+    def greater_is_better(name):
+        """Whether greater values of the metric with this name are better.
+
+        Unknown metrics are assumed to be scores, for which greater is better.
+        """
+        d = Metric._find_scoring(name)
+        if d is not None:
+            return d["greater_is_better"]
+
+        return True
+
+    @staticmethod
+    def _find_scoring(name):
+        """Find the scoring info associated with the metric name."""
         def find_in_list(list_):
             for d in list_:
                 if d["name"] == name:
-                    return d["scoring"]
+                    return d
             return None
 
-        result = find_in_list(featurehub.modeling.model.Model.CLASSIFICATION_SCORING)
-        if result is not None:
-            return result
-        result = find_in_list(featurehub.modeling.model.Model.REGRESSION_SCORING)
-        if result is not None:
-            return result
+        available_scoring = featurehub.modeling.model.Model.AVAILABLE_SCORING
+        for problem_type in sorted(available_scoring):
+            result = find_in_list(available_scoring[problem_type])
+            if result is not None:
+                return result
 
         return None
 
@@ -153,9 +173,9 @@ class MetricList(MutableSequence):
     def append(self, val):
         self._list.append(val)
 
-    def to_string(self, kind="user"):
+    def to_string(self, kind="user", title="Feature evaluation metrics"):
         """Get user-readable output."""
-        metrics_str = "Feature evaluation metrics: \n"
+        metrics_str = title + ": \n"
         line_prefix = "    "
         line_suffix = "\n"
         if self._list:
@@ -1,17 +1,26 @@
 from collections import defaultdict
 import os
 import traceback
+import itertools
 import sys
 import sklearn.metrics
 
 import numpy as np
+from sklearn.base import clone
 from sklearn.externals import joblib
 from sklearn.model_selection import KFold, StratifiedKFold
 from sklearn.preprocessing import label_binarize, LabelEncoder
 from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
 
+from featurehub.modeling.binned import (
+    Binner, BinnedTreeClassifier, BinnedTreeRegressor
+)
 from featurehub.modeling.metrics import Metric, MetricList
-from featurehub.util import RANDOM_STATE
+from featurehub.modeling.scorers import ndcg_score, rmsle_score
+from featurehub.modeling.streaming import (
+    CorrectCounts, SquaredErrors, RankCounts, Predictions
+)
+from featurehub.util import RANDOM_STATE, get_cpu_count
 
 class Model(object):
     """Versatile modeling object.
@@ -23,35 +32,191 @@ class Model(object):
     ----------
     problem_type : str
         One of "classification" or "regression"
+    n_jobs : int, optional (default=None)
+        Number of cross validation folds to fit in parallel. By default, uses
+        as many as there are CPUs available to this process.
+    learner : str, optional (default="tree")
+        Name of a registered learner (see register_learner). The built-in
+        learners are "tree", for exact decision trees, and "binned_tree", for
+        decision trees fit on features binned into at most 255 values. Binned
+        trees are much faster to fit on large datasets, and the data is binned
+        just once for all cross validation folds.
+    batch_size : int, optional (default=None)
+        If given, test sets are predicted and scored in batches of at most
+        this many rows, accumulating sufficient statistics of each score (see
+        featurehub.modeling.streaming), so that the memory used for scoring
+        does not grow with the size of the test set. Scores are the same, up
+        to floating point rounding. By default, the whole test set is
+        predicted at once.
+    scorings : list of str, optional (default=None)
+        Scorings to compute, among those available for the problem type (see
+        AVAILABLE_SCORING and register_scoring). By default,
+        CLASSIFICATION_SCORING or REGRESSION_SCORING.
+    cv_folds : int, optional (default=None)
+        Number of cross validation folds. By default, the default number of
+        folds of sklearn.model_selection.KFold.
     """
 
     CLASSIFICATION = "classification"
     REGRESSION     = "regression"
 
+    TREE        = "tree"
+    BINNED_TREE = "binned_tree"
+
+    # names of registered learners, see register_learner
+    LEARNERS    = []
+
     CLASSIFICATION_SCORING = [
-        { "name" : "Accuracy"  , "scoring" : "accuracy" },
-        { "name" : "Precision" , "scoring" : "precision" },
-        { "name" : "Recall"    , "scoring" : "recall" },
-        { "name" : "ROC AUC"   , "scoring" : "roc_auc" },
+        { "name" : "Accuracy"  , "scoring" : "accuracy"  , "greater_is_better" : True },
+        { "name" : "Precision" , "scoring" : "precision" , "greater_is_better" : True },
+        { "name" : "Recall"    , "scoring" : "recall"    , "greater_is_better" : True },
+        { "name" : "ROC AUC"   , "scoring" : "roc_auc"   , "greater_is_better" : True },
     ]
     REGRESSION_SCORING = [
-        { "name" : "Root Mean Squared Error" , "scoring" : "root_mean_squared_error" },
-        { "name" : "R-squared"          , "scoring" : "r2" },
+        { "name" : "Root Mean Squared Error" , "scoring" : "root_mean_squared_error" , "greater_is_better" : False },
+        { "name" : "R-squared"               , "scoring" : "r2"                      , "greater_is_better" : True },
     ]
 
+    # scorings that can be selected for each problem type, including
+    # registered ones, see register_scoring
+    AVAILABLE_SCORING = {
+        CLASSIFICATION : list(CLASSIFICATION_SCORING),
+        REGRESSION     : list(REGRESSION_SCORING),
+    }
+
     BINARY_METRIC_AGGREGATION = "micro"
     MULTICLASS_METRIC_AGGREGATION = "micro"
 
-    def __init__(self, problem_type):
+    # registered learners, by name, and scorings, by problem type and scoring
+    _learners = {}
+    _scorings = {}
+
+    def __init__(self, problem_type, n_jobs=None, learner=TREE,
+            batch_size=None, scorings=None, cv_folds=None):
         self.problem_type = problem_type
+        self.n_jobs = n_jobs if n_jobs is not None else get_cpu_count()
+        self.learner = learner
+        self.batch_size = batch_size
+        self.cv_folds = cv_folds
+
+        if learner not in Model.LEARNERS:
+            raise ValueError("Bad learner: {}".format(learner))
+        if batch_size is not None and batch_size < 1:
+            raise ValueError("Bad batch_size: {}".format(batch_size))
+        if cv_folds is not None and cv_folds < 2:
+            raise ValueError("Bad cv_folds: {}".format(cv_folds))
 
         if self._is_classification():
-            self.model = Model._get_default_classifier()
+            self.model = Model._learners[learner]["classifier"]()
         elif self._is_regression():
-            self.model = Model._get_default_regressor()
+            self.model = Model._learners[learner]["regressor"]()
         else:
             raise NotImplementedError
 
+        if scorings is not None:
+            available = {s["scoring"] : s
+                    for s in Model.AVAILABLE_SCORING[problem_type]}
+            for scoring in scorings:
+                if scoring not in available:
+                    raise ValueError("Bad scoring: {}".format(scoring))
+            self.scorings = [available[scoring] for scoring in scorings]
+        else:
+            self.scorings = None
+
+    @staticmethod
+    def register_learner(name, classifier, regressor, prepare_X=None):
+        """Register a learner with which to evaluate features.
+
+        Once registered, the learner can be selected by name, by Model or in
+        the configuration of a problem (see EvaluationConfig).
+
+        Parameters
+        ----------
+        name : str
+        classifier : callable
+            Function returning a new, unfit, sklearn classifier.
+        regressor : callable
+            Function returning a new, unfit, sklearn regressor.
+        prepare_X : callable, optional (default=None)
+            Function transforming formatted data once for all fits of the
+            learner, such as binning it. By default, the data is unchanged.
+        """
+        if name in Model._learners:
+            raise ValueError("Learner already registered: {}".format(name))
+
+        Model._learners[name] = {
+            "classifier" : classifier,
+            "regressor"  : regressor,
+            "prepare_X"  : prepare_X,
+        }
+        Model.LEARNERS.append(name)
+
+    @staticmethod
+    def register_scoring(problem_type, name, scoring, scorer,
+            greater_is_better=True, needs_proba=False, accumulator=None,
+            accumulator_scorer=None):
+        """Register a scoring with which to evaluate features.
+
+        Once registered, the scoring can be selected by Model or in the
+        configuration of a problem (see EvaluationConfig). The same scoring
+        can be registered for both problem types. Scorings can't shadow the
+        built-in ones, and, as metrics are identified by name (see Metric), a
+        name can only be used by one scoring.
+
+        Parameters
+        ----------
+        problem_type : str
+            One of "classification" or "regression"
+        name : str
+            Name of the metric, as reported to users.
+        scoring : str
+            Identifier of the scoring.
+        scorer : callable
+            Function scorer(y_true, y_pred) returning the score of predictions
+            y_pred, which are class probabilities if needs_proba is True.
+        greater_is_better : bool, optional (default=True)
+        needs_proba : bool, optional (default=False)
+        accumulator : callable, optional (default=None)
+            Function returning a new accumulator of the sufficient statistics
+            of the score, for scoring in batches (see
+            featurehub.modeling.streaming). By default, scoring in batches
+            keeps all predictions.
+        accumulator_scorer : callable, optional (default=None)
+            Function returning the score from an accumulator. Required with
+            accumulator.
+        """
+        if problem_type not in Model.AVAILABLE_SCORING:
+            raise ValueError("Bad problem_type: {}".format(problem_type))
+        if any(s["scoring"] == scoring for s in
+                Model.CLASSIFICATION_SCORING + Model.REGRESSION_SCORING):
+            raise ValueError("Scoring is built in: {}".format(scoring))
+        if (problem_type, scoring) in Model._scorings:
+            raise ValueError("Scoring already registered: {}".format(scoring))
+        for s in itertools.chain(*Model.AVAILABLE_SCORING.values()):
+            if s["name"] == name and (s["scoring"] != scoring or
+                    s["greater_is_better"] != greater_is_better):
+                raise ValueError("Metric name already used by scoring {}: {}"
+                        .format(s["scoring"], name))
+        if (accumulator is None) != (accumulator_scorer is None):
+            raise ValueError("accumulator and accumulator_scorer must be "
+                             "given together")
+
+        if accumulator is None:
+            accumulator = Predictions
+            accumulator_scorer = lambda predictions: predictions.score(scorer)
+
+        Model.AVAILABLE_SCORING[problem_type].append({
+            "name"              : name,
+            "scoring"           : scoring,
+            "greater_is_better" : greater_is_better,
+        })
+        Model._scorings[(problem_type, scoring)] = {
+            "needs_proba"        : needs_proba,
+            "scorer"             : scorer,
+            "accumulator"        : accumulator,
+            "accumulator_scorer" : accumulator_scorer,
+        }
+
     def compute_metrics(self, X, Y, kind="cv", **kwargs):
         if kind=="cv":
             return self.compute_metrics_cv(X, Y, **kwargs)
@@ -60,7 +225,7 @@ class Model(object):
         else:
             raise ValueError("Bad kind: {}".format(kind))
 
-    def compute_metrics_cv(self, X, Y):
+    def compute_metrics_cv(self, X, Y, folds=None):
         """Compute cross-validated metrics.
 
         Trains this model on data X with labels Y.
@@ -75,12 +240,15 @@ class Model(object):
             data
         Y : numpy array-like or pd.DataFrame or pd.DataSeries
             labels
+        folds : list of (train indices, test indices), optional
+            Cross validation folds, as returned by get_folds. By default, the
+            folds are computed from X and Y.
         """
 
         scorings, scorings_ = self._get_scorings()
 
         # compute scores
-        scores = self.cv_score_mean(X, Y, scorings_)
+        scores = self.cv_score_mean(X, Y, scorings_, folds=folds)
 
         # unpack into MetricList
         metric_list = self.scores_to_metriclist(scorings, scores)
@@ -91,6 +259,7 @@ class Model(object):
         """
 
         X, Y = Model._format_matrices(X, Y)
+        X = self._prepare_X(X)
 
         X_train, Y_train = X[:n], Y[:n]
         X_test, Y_test = X[n:], Y[n:]
@@ -104,21 +273,39 @@ class Model(object):
         # fit model on entire training set
         self.model.fit(X_train, Y_train)
 
-        scores = {}
-        for scoring in scorings_:
-            scores[scoring] = self._do_scoring(scoring, params, self.model,
-                    X_test, Y_test)
+        if self.batch_size is not None:
+            scores = self._do_scoring_batches(scorings_, params, self.model,
+                    X, Y, np.arange(n, len(Y)))
+        else:
+            scores = {}
+            cache = {}
+            for scoring in scorings_:
+                scores[scoring] = self._do_scoring(scoring, params, self.model,
+                        X_test, Y_test, cache=cache)
 
         metric_list = self.scores_to_metriclist(scorings, scores)
         return metric_list
 
     def _do_scoring(self, scoring, params, model, X_test, Y_test,
-            failure_value=None):
+            failure_value=None, cache=None):
         # Make and evaluate predictions. Note that ROC AUC may raise
         # exception if somehow we only have examples from one class in
         # a given fold.
-        Y_test_transformed = params[scoring]["pred_transformer"](Y_test)
-        Y_test_pred = params[scoring]["predictor"](model, X_test)
+        #
+        # Scorings share predictors and transformers, so if a cache dict is
+        # given, each distinct predictor and transformer is only applied once
+        # per model and test set. The cache must not be reused for a different
+        # model or test set.
+        if cache is None:
+            cache = {}
+        transformer = params[scoring]["pred_transformer"]
+        predictor = params[scoring]["predictor"]
+        if transformer not in cache:
+            cache[transformer] = transformer(Y_test)
+        if predictor not in cache:
+            cache[predictor] = predictor(model, X_test)
+        Y_test_transformed = cache[transformer]
+        Y_test_pred = cache[predictor]
 
         try:
             score = params[scoring]["scorer"](Y_test_transformed, Y_test_pred)
@@ -129,7 +316,74 @@ class Model(object):
 
         return score
 
-    def cv_score_mean(self, X, Y, scorings):
+    def _do_scoring_batches(self, scorings, params, model, X, Y, test_inds,
+            failure_value=None):
+        # Like _do_scoring for each scoring, but the rows test_inds of X and Y
+        # are predicted in batches of at most batch_size rows. Each batch
+        # updates accumulators of the sufficient statistics of the scores, so
+        # only one batch of predictions is in memory at once. Scorings with
+        # the same accumulator, predictor and transformer share an
+        # accumulator.
+        accumulators = {}
+        for scoring in scorings:
+            key = Model._get_accumulator_key(params[scoring])
+            if key not in accumulators:
+                accumulators[key] = params[scoring]["accumulator"]()
+
+        for start in range(0, len(test_inds), self.batch_size):
+            batch_inds = test_inds[start:start + self.batch_size]
+            X_batch, Y_batch = X[batch_inds], Y[batch_inds]
+            cache = {}
+            for (_, predictor, transformer), accumulator in accumulators.items():
+                if transformer not in cache:
+                    cache[transformer] = transformer(Y_batch)
+                if predictor not in cache:
+                    cache[predictor] = predictor(model, X_batch)
+                accumulator.update(cache[transformer], cache[predictor])
+
+        scores = {}
+        for scoring in scorings:
+            accumulator = accumulators[
+                    Model._get_accumulator_key(params[scoring])]
+            try:
+                scores[scoring] = params[scoring]["accumulator_scorer"](
+                        accumulator)
+            except ValueError as e:
+                scores[scoring] = failure_value
+                print(traceback.format_exc(), file=sys.stderr)
+                raise RuntimeError
+
+        return scores
+
+    @staticmethod
+    def _get_accumulator_key(scoring_params):
+        return (scoring_params["accumulator"], scoring_params["predictor"],
+                scoring_params["pred_transformer"])
+
+    def get_folds(self, X, Y):
+        """Split data and labels into cross validation folds.
+
+        The folds only depend on the number of rows of X and, for
+        classification problems, on the labels Y. They can therefore be reused
+        for different data with the same labels.
+
+        Returns a list of (train indices, test indices).
+        """
+        X, Y = Model._format_matrices(X, Y)
+
+        kwargs = {}
+        if self.cv_folds is not None:
+            kwargs["n_splits"] = self.cv_folds
+
+        if self._is_classification():
+            kf = StratifiedKFold(shuffle=True, random_state=RANDOM_STATE+3,
+                    **kwargs)
+        else:
+            kf = KFold(shuffle=True, random_state=RANDOM_STATE+4, **kwargs)
+
+        return list(kf.split(X, Y))
+
+    def cv_score_mean(self, X, Y, scorings, folds=None):
         """Compute mean score across cross validation folds.
 
         Split data and labels into cross validation folds and fit the model for
@@ -145,34 +399,71 @@ class Model(object):
             labels
         scorings : list of str
             scoring types
+        folds : list of (train indices, test indices), optional
+            Cross validation folds, as returned by get_folds. By default, the
+            folds are computed from X and Y.
         """
 
         X, Y = Model._format_matrices(X, Y)
 
+        if folds is None:
+            folds = self.get_folds(X, Y)
+
+        X = self._prepare_X(X)
+        _, scores = self.fit_and_score_folds(X, Y, folds, scorings)
+
+        return scores
+
+    def fit_and_score_folds(self, X, Y, folds, scorings):
+        """Fit model on each fold and compute mean scores across folds.
+
+        Returns the models fit on each fold, and a dictionary mapping scoring
+        to score averaged across folds. This model is left fit on the last
+        fold.
+
+        Parameters
+        ----------
+        X : numpy array-like
+            data, formatted and prepared for the learner (see _prepare_X)
+        Y : numpy array-like
+            labels, formatted
+        folds : list of (train indices, test indices)
+        scorings : list of str
+            scoring types
+        """
+
         scorings = list(scorings)
 
         # Determine binary/multiclass classification
         classes = np.unique(Y)
         params = self._get_params(classes)
 
-        if self._is_classification():
-            kf = StratifiedKFold(shuffle=True, random_state=RANDOM_STATE+3)
+        # Train model and evaluate metric. We fit the model just once per
+        # fold. Folds are fit in parallel threads (the estimators release the
+        # GIL while fitting), each on its own clone of the model, so that
+        # results do not depend on n_jobs. The rows of each fold are only
+        # selected once it is fit.
+        n_jobs = min(self.n_jobs, len(folds))
+        if n_jobs > 1:
+            fold_outputs = joblib.Parallel(n_jobs=n_jobs, backend="threading")(
+                joblib.delayed(self._fit_and_score_fold)(clone(self.model), X,
+                    Y, train_inds, test_inds, scorings, params)
+                for train_inds, test_inds in folds)
         else:
-            kf = KFold(shuffle=True, random_state=RANDOM_STATE+4)
-
-        # Split data, train model, and evaluate metric. We fit the model just
-        # once per fold.
-        scoring_outputs = defaultdict(lambda : [])
-        for train_inds, test_inds in kf.split(X, Y):
-            X_train, X_test = X[train_inds], X[test_inds]
-            Y_train, Y_test = Y[train_inds], Y[test_inds]
+            fold_outputs = [
+                self._fit_and_score_fold(clone(self.model), X, Y, train_inds,
+                    test_inds, scorings, params)
+                for train_inds, test_inds in folds
+            ]
 
-            self.model.fit(X_train, Y_train)
+        # keep the model fit on the last fold, as if fit serially
+        models = [model for model, _ in fold_outputs]
+        self.model = models[-1]
 
+        scoring_outputs = defaultdict(lambda : [])
+        for _, fold_scores in fold_outputs:
             for scoring in scorings:
-                score = self._do_scoring(scoring, params, self.model, X_test,
-                        Y_test, failure_value=np.nan)
-                scoring_outputs[scoring].append(score)
+                scoring_outputs[scoring].append(fold_scores[scoring])
 
         for scoring in scoring_outputs:
             score_mean = np.nanmean(scoring_outputs[scoring])
@@ -180,7 +471,34 @@ class Model(object):
                 score_mean = None
             scoring_outputs[scoring] = score_mean
 
-        return scoring_outputs
+        return models, scoring_outputs
+
+    def _fit_and_score_fold(self, model, X, Y, train_inds, test_inds,
+            scorings, params):
+        """Fit model on one cross validation fold and score it.
+
+        Returns the fitted model and a dict mapping scoring to score.
+        """
+        if isinstance(model, (BinnedTreeClassifier, BinnedTreeRegressor)):
+            # binned trees are fit on the training rows in place
+            model.fit(X, Y, sample_indices=train_inds)
+        else:
+            model.fit(X[train_inds], Y[train_inds])
+
+        if self.batch_size is not None:
+            scores = self._do_scoring_batches(scorings, params, model, X, Y,
+                    test_inds, failure_value=np.nan)
+            return model, scores
+
+        X_test, Y_test = X[test_inds], Y[test_inds]
+
+        scores = {}
+        cache = {}
+        for scoring in scorings:
+            scores[scoring] = self._do_scoring(scoring, params, model, X_test,
+                    Y_test, failure_value=np.nan, cache=cache)
+
+        return model, scores
 
     def scores_to_metriclist(self, scorings, scores):
         metric_list = MetricList()
@@ -229,29 +547,46 @@ class Model(object):
         # scorers
         # nothing here
 
+        # accumulators, for scoring in batches (see _do_scoring_batches). With
+        # micro averaging, precision and recall are the accuracy.
+        if is_binary:
+            def rank_counts():
+                return RankCounts(pos_label=classes[-1])
+        else:
+            def rank_counts():
+                return RankCounts(pos_label=1)
+
         params = {
             "accuracy" : {
                 "predictor" : predict,
                 "pred_transformer" : noop,
                 "scorer" : sklearn.metrics.accuracy_score,
+                "accumulator" : CorrectCounts,
+                "accumulator_scorer" : CorrectCounts.accuracy,
             },
             "precision" : {
                 "predictor" : predict,
                 "pred_transformer" : noop,
                 "scorer" : lambda y_true, y_pred: sklearn.metrics.precision_score(
                         y_true, y_pred, average=metric_aggregation),
+                "accumulator" : CorrectCounts,
+                "accumulator_scorer" : CorrectCounts.accuracy,
             },
             "recall" : {
                 "predictor" : predict,
                 "pred_transformer" : noop,
                 "scorer" : lambda y_true, y_pred: sklearn.metrics.recall_score(
                         y_true, y_pred, average=metric_aggregation),
+                "accumulator" : CorrectCounts,
+                "accumulator_scorer" : CorrectCounts.accuracy,
             },
             "roc_auc" : {
                 "predictor" : predict if is_binary else predict_prob,
                 "pred_transformer" : noop if is_binary else transformer_binarize,
                 "scorer" : lambda y_true, y_pred: sklearn.metrics.roc_auc_score(
                     y_true, y_pred, average=metric_aggregation),
+                "accumulator" : rank_counts,
+                "accumulator_scorer" : RankCounts.roc_auc,
             },
             "root_mean_squared_error" : {
                 "predictor" : predict,
@@ -259,14 +594,31 @@ class Model(object):
                 "scorer" : lambda y_true, y_pred:
                     np.sqrt(sklearn.metrics.mean_squared_error(y_true,
                         y_pred)),
+                "accumulator" : SquaredErrors,
+                "accumulator_scorer" : SquaredErrors.root_mean_squared_error,
             },
             "r2" : {
                 "predictor" : predict,
                 "pred_transformer" : noop,
-                "scorer" : sklearn.metrics.r2_score
+                "scorer" : sklearn.metrics.r2_score,
+                "accumulator" : SquaredErrors,
+                "accumulator_scorer" : SquaredErrors.r2,
             },
         }
 
+        # registered scorings of this problem type
+        for (problem_type, scoring), scoring_params in Model._scorings.items():
+            if problem_type != self.problem_type:
+                continue
+            params[scoring] = {
+                "predictor" : predict_prob if scoring_params["needs_proba"]
+                    else predict,
+                "pred_transformer" : noop,
+                "scorer" : scoring_params["scorer"],
+                "accumulator" : scoring_params["accumulator"],
+                "accumulator_scorer" : scoring_params["accumulator_scorer"],
+            }
+
         return params
 
     def _get_scorings(self):
@@ -285,7 +637,10 @@ class Model(object):
         # scoring_types maps user-readable name to `scoring`, as argument to
         # cross_val_score
         # See also http://scikit-learn.org/stable/modules/model_evaluation.html#scoring-parameter
-        if self._is_classification():
+        if self.scorings is not None:
+            scorings = self.scorings
+            scorings_= [s["scoring"] for s in scorings]
+        elif self._is_classification():
             scorings = Model.CLASSIFICATION_SCORING
             scorings_= [s["scoring"] for s in scorings]
         elif self._is_regression():
@@ -296,6 +651,20 @@ class Model(object):
 
         return scorings, scorings_
 
+    def _prepare_X(self, X):
+        """Prepare formatted data X for all fits of the learner.
+
+        Decision trees convert data to float32 at every fit and prediction,
+        and binned trees bin it, so this is done once for all folds instead.
+        """
+        prepare_X = Model._learners[self.learner]["prepare_X"]
+        if prepare_X is not None:
+            return prepare_X(X)
+        if isinstance(self.model, (DecisionTreeClassifier,
+                DecisionTreeRegressor)):
+            return np.ascontiguousarray(X, dtype=np.float32)
+        return X
+
     @staticmethod
     def _format_matrices(X, Y):
         X = Model._formatX(X)
@@ -305,9 +674,9 @@ class Model(object):
     @staticmethod
     def _formatX(X):
         # ensure that we use np for everything
-        # use np.float64 for all elements
+        # use np.float64 for all elements, except float32 data, which is kept
         # *don't* use 1d array for X
-        X = np.asfarray(X)
+        X = Model._as_float_array(X)
         if X.ndim == 1:
             X = X.reshape(-1,1)
 
@@ -317,15 +686,23 @@ class Model(object):
     def _formatY(Y):
         # TODO: detect if we need to use a LabelEncoder for Y
         # ensure that we use np for everything
-        # use np.float64 for all elements
+        # use np.float64 for all elements, except float32 data, which is kept
         # *do* use 1d array for Y
-        Y = np.asfarray(Y)
+        Y = Model._as_float_array(Y)
         if Y.ndim > 1 and Y.shape[1] > 1:
             raise ValueError("Target matrix has too many columns: {}"
                     .format(Y.shape[1]))
         Y = Y.ravel()
         return Y
 
+    @staticmethod
+    def _as_float_array(X):
+        # unlike np.asfarray, does not copy float32 data to float64
+        X = np.asarray(X)
+        if X.dtype not in (np.float32, np.float64):
+            X = X.astype(np.float64)
+        return X
+
     @staticmethod
     def _get_default_classifier():
         return DecisionTreeClassifier(random_state=RANDOM_STATE+1)
@@ -333,3 +710,22 @@ class Model(object):
     @staticmethod
     def _get_default_regressor():
         return DecisionTreeRegressor(random_state=RANDOM_STATE+2)
+
+    @staticmethod
+    def _get_binned_classifier():
+        return BinnedTreeClassifier()
+
+    @staticmethod
+    def _get_binned_regressor():
+        return BinnedTreeRegressor()
+
+Model.register_learner(Model.TREE, Model._get_default_classifier,
+        Model._get_default_regressor)
+Model.register_learner(Model.BINNED_TREE, Model._get_binned_classifier,
+        Model._get_binned_regressor,
+        prepare_X=lambda X: Binner().fit_transform(X))
+
+Model.register_scoring(Model.CLASSIFICATION, "NDCG", "ndcg", ndcg_score,
+        needs_proba=True)
+Model.register_scoring(Model.REGRESSION, "Root Mean Squared Log Error",
+        "rmsle", rmsle_score, greater_is_better=False)
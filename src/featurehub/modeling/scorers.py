@@ -5,6 +5,11 @@ import sklearn.metrics
 #
 # Normalized Discounted Cumulative Gain metric
 #
+
+# number of rows of y_pred compared at once by ndcg_score, to bound the
+# memory used by temporaries
+NDCG_CHUNK_SIZE = 65536
+
 def ndcg_score(y_true, y_pred, k=5):
     """Normalized discounted cumulative gain (NDCG) at rank k
 
@@ -12,6 +17,11 @@ def ndcg_score(y_true, y_pred, k=5):
     relevance for the correct label is 1 and the relevance for all other labels
     is 0.
 
+    Since only the correct label is relevant, its gain only depends on its rank
+    in the predictions, which is the number of labels predicted before it. The
+    predictions are not sorted. Labels with equal predictions are ranked by
+    decreasing label.
+
     Parameters
     ----------
     y_true : array-like, shape = [n_samples,]
@@ -28,12 +38,29 @@ def ndcg_score(y_true, y_pred, k=5):
     -------
     NDCG @k : float
     """
-    y_pred_topk = np.fliplr(np.argsort(y_pred))[:,:k]
-    pos = np.where(np.sum(y_pred_topk==y_true[:,None],1) > 0,
-                 np.argmax(y_pred_topk==y_true[:,None],1),
-                 np.nan)
-    scores = [1.0/np.log2((i+1)+1) if not np.isnan(i) else 0 for i in pos]
-    return np.mean(scores)
+    y_true = np.asarray(y_true).ravel()
+    y_pred = np.asarray(y_pred)
+    n_samples, n_classes = y_pred.shape
+
+    # labels that are not a class of y_pred are never found in the top k
+    labels = y_true.astype(np.intp)
+    found = (labels == y_true) & (labels >= 0) & (labels < n_classes)
+    labels[~found] = 0
+
+    classes = np.arange(n_classes)
+    gains = np.zeros(n_samples)
+    for start in range(0, n_samples, NDCG_CHUNK_SIZE):
+        stop = min(start + NDCG_CHUNK_SIZE, n_samples)
+        pred = y_pred[start:stop]
+        label = labels[start:stop, None]
+        pred_true = pred[np.arange(stop - start)[:, None], label]
+
+        rank = ((pred > pred_true).sum(axis=1) +
+                ((pred == pred_true) & (classes > label)).sum(axis=1))
+        in_top_k = found[start:stop] & (rank < k)
+        gains[start:stop][in_top_k] = 1.0 / np.log2(rank[in_top_k] + 2)
+
+    return np.mean(gains)
 
 ndcg_scorer = sklearn.metrics.make_scorer(ndcg_score,
     greater_is_better=True, needs_proba=True)
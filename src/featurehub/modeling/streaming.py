@@ -0,0 +1,188 @@
+"""Scores accumulated over batches of predictions.
+
+Each accumulator keeps sufficient statistics of one or more scores, updated
+with one batch of true values and predictions at a time, so that a test set
+can be predicted and scored in batches without ever holding all of its
+predictions in memory. Accumulators of the same kind can be merged, for
+example to combine the scores of batches processed separately.
+"""
+
+import numpy as np
+
+__all__ = ["CorrectCounts", "SquaredErrors", "RankCounts", "Predictions"]
+
+class CorrectCounts(object):
+    """Number of correct label predictions.
+
+    Gives the accuracy, which is also the micro-averaged precision and recall
+    of single label predictions: every prediction counts once as a predicted
+    label and once as a true label, so the totals of both are the number of
+    predictions.
+    """
+
+    def __init__(self):
+        self.n         = 0
+        self.n_correct = 0
+
+    def update(self, y_true, y_pred):
+        y_true, y_pred = _check_batch(y_true, y_pred)
+        self.n         += len(y_true)
+        self.n_correct += int(np.count_nonzero(y_true == y_pred))
+
+    def merge(self, other):
+        self.n         += other.n
+        self.n_correct += other.n_correct
+
+    def accuracy(self):
+        if self.n == 0:
+            raise ValueError("No predictions to score")
+        return self.n_correct / self.n
+
+class SquaredErrors(object):
+    """Sum of squared errors, and mean and variance of the true values.
+
+    Gives the root mean squared error and the R^2 score. The variance of the
+    true values is accumulated with the pairwise update of Chan et al., to
+    avoid the cancellation of the sum of squares of large values.
+    """
+
+    def __init__(self):
+        self.n                 = 0
+        self.sum_squared_error = 0.0
+        self.mean_true         = 0.0
+        self.m2_true           = 0.0
+
+    def update(self, y_true, y_pred):
+        y_true, y_pred = _check_batch(y_true, y_pred)
+        if len(y_true) == 0:
+            return
+
+        batch = SquaredErrors()
+        batch.n                 = len(y_true)
+        batch.sum_squared_error = float(np.sum((y_true - y_pred) ** 2))
+        batch.mean_true         = float(np.mean(y_true))
+        batch.m2_true           = float(np.sum((y_true - batch.mean_true) ** 2))
+        self.merge(batch)
+
+    def merge(self, other):
+        n = self.n + other.n
+        if n == 0:
+            return
+        delta = other.mean_true - self.mean_true
+        self.m2_true += other.m2_true + delta ** 2 * self.n * other.n / n
+        self.mean_true += delta * other.n / n
+        self.sum_squared_error += other.sum_squared_error
+        self.n = n
+
+    def root_mean_squared_error(self):
+        if self.n == 0:
+            raise ValueError("No predictions to score")
+        return np.sqrt(self.sum_squared_error / self.n)
+
+    def r2(self):
+        """R^2 score, with the same conventions as sklearn.metrics.r2_score.
+
+        If the true values are constant, the score is 1 for perfect
+        predictions, and 0 otherwise.
+        """
+        if self.n == 0:
+            raise ValueError("No predictions to score")
+        if self.m2_true == 0:
+            return 1.0 if self.sum_squared_error == 0 else 0.0
+        return 1.0 - self.sum_squared_error / self.m2_true
+
+class RankCounts(object):
+    """Number of positive and negative examples for each distinct prediction.
+
+    Gives the exact area under the ROC curve, equal to
+    sklearn.metrics.roc_auc_score, where examples with equal predictions are
+    ranked together. Memory grows with the number of distinct predictions,
+    which is small for the labels or class probabilities predicted by
+    decision trees.
+
+    For multiclass problems, micro-averaged AUC is the AUC of the binarized
+    labels and the class probabilities of all examples; both are flattened.
+
+    Parameters
+    ----------
+    pos_label : int or float, optional (default=1)
+        Label of positive examples.
+    """
+
+    def __init__(self, pos_label=1):
+        self.pos_label = pos_label
+        self.values    = np.empty(0)
+        self.positives = np.empty(0)
+        self.negatives = np.empty(0)
+
+    def update(self, y_true, y_pred):
+        y_true, y_pred = _check_batch(y_true, y_pred)
+        values, inverse = np.unique(y_pred.ravel(), return_inverse=True)
+        is_positive = y_true.ravel() == self.pos_label
+        counts = np.bincount(inverse, minlength=len(values))
+        positives = np.bincount(inverse, weights=is_positive,
+                minlength=len(values))
+        self._add(values, positives, counts - positives)
+
+    def merge(self, other):
+        self._add(other.values, other.positives, other.negatives)
+
+    def roc_auc(self):
+        n_positives = self.positives.sum()
+        n_negatives = self.negatives.sum()
+        if n_positives == 0 or n_negatives == 0:
+            raise ValueError("Only one class present in y_true. ROC AUC score "
+                             "is not defined in that case.")
+
+        # each negative example is ranked above the positive examples with
+        # lower predictions, and ties with half of those with equal ones
+        positives_below = np.cumsum(self.positives) - self.positives
+        area = np.sum(self.negatives * (positives_below + self.positives / 2))
+        return 1.0 - area / (n_positives * n_negatives)
+
+    def _add(self, values, positives, negatives):
+        values, inverse = np.unique(np.concatenate([self.values, values]),
+                return_inverse=True)
+        self.positives = np.bincount(inverse,
+                weights=np.concatenate([self.positives, positives]),
+                minlength=len(values))
+        self.negatives = np.bincount(inverse,
+                weights=np.concatenate([self.negatives, negatives]),
+                minlength=len(values))
+        self.values = values
+
+class Predictions(object):
+    """All true values and predictions.
+
+    Fallback for scores without sufficient statistics, such as registered
+    scorings without an accumulator (see Model.register_scoring). Memory grows
+    with the number of predictions.
+    """
+
+    def __init__(self):
+        self.y_true = []
+        self.y_pred = []
+
+    def update(self, y_true, y_pred):
+        y_true, y_pred = _check_batch(y_true, y_pred)
+        self.y_true.append(y_true)
+        self.y_pred.append(y_pred)
+
+    def merge(self, other):
+        self.y_true.extend(other.y_true)
+        self.y_pred.extend(other.y_pred)
+
+    def score(self, scorer):
+        """Score all predictions with scorer(y_true, y_pred)."""
+        if not self.y_true:
+            raise ValueError("No predictions to score")
+        return scorer(np.concatenate(self.y_true), np.concatenate(self.y_pred))
+
+def _check_batch(y_true, y_pred):
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    if len(y_true) != len(y_pred) or (y_true.ndim == y_pred.ndim and
+            y_true.shape != y_pred.shape):
+        raise ValueError("Found y_true and y_pred with inconsistent shapes: "
+                         "{} and {}".format(y_true.shape, y_pred.shape))
+    return y_true, y_pred
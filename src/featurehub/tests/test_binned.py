@@ -0,0 +1,59 @@
+import numpy as np
+from sklearn.tree import DecisionTreeClassifier, DecisionTreeRegressor
+
+from featurehub.modeling.binned import (
+    Binner, BinnedTreeClassifier, BinnedTreeRegressor
+)
+from featurehub.tests.util import EPSILON
+
+def _make_data(n=1000, seed=0):
+    # few distinct values per feature, so that binning loses nothing
+    rng = np.random.RandomState(seed)
+    X = rng.randint(0, 6, size=(n, 3)).astype(float)
+    y = X[:, 0] + X[:, 1] * (X[:, 2] > 2) + rng.rand(n)
+    return X, y
+
+def test_binner():
+    X = np.array([[0.0, 1.0], [1.0, np.nan], [2.0, 1.0], [2.0, 3.0]])
+    binner = Binner(max_bins=4).fit(X)
+    codes = binner.transform(X)
+    assert codes.dtype == np.uint8
+    assert codes[:, 0].tolist() == [0, 1, 2, 2]
+    assert codes[:, 1].tolist() == [0, 4, 0, 1]
+
+    # quantile bins
+    x = np.arange(1000, dtype=float)
+    codes = Binner(max_bins=10).fit_transform(x)
+    assert np.bincount(codes[:, 0]).tolist() == [100] * 10
+
+def test_binned_tree_classifier():
+    X, y = _make_data()
+    y = (y > 4).astype(int)
+    tree = DecisionTreeClassifier(random_state=0).fit(X, y)
+    binned = BinnedTreeClassifier().fit(X, y)
+    assert (tree.predict(X) == binned.predict(X)).all()
+    assert np.abs(tree.predict_proba(X) - binned.predict_proba(X)).max() \
+            < EPSILON
+
+    # pre-binned data
+    binner = Binner().fit(X)
+    binned_codes = BinnedTreeClassifier().fit(binner.transform(X), y)
+    assert (binned_codes.predict(binner.transform(X)) ==
+            binned.predict(X)).all()
+
+def test_binned_tree_regressor():
+    X, y = _make_data()
+    tree = DecisionTreeRegressor(random_state=0).fit(X, y)
+    binned = BinnedTreeRegressor().fit(X, y)
+    assert np.abs(tree.predict(X) - binned.predict(X)).max() < EPSILON
+
+    binned = BinnedTreeRegressor(max_depth=2, min_samples_leaf=10).fit(X, y)
+    assert binned.node_count <= 7
+
+def test_binned_tree_sample_indices():
+    X, y = _make_data()
+    codes = Binner().fit_transform(X)
+    rows = np.arange(0, len(X), 3)
+    binned = BinnedTreeRegressor().fit(codes[rows], y[rows])
+    binned_indices = BinnedTreeRegressor().fit(codes, y, sample_indices=rows)
+    assert (binned.predict(codes) == binned_indices.predict(codes)).all()
@@ -0,0 +1,58 @@
+import pandas as pd
+
+from featurehub.evaluation.client import EvaluatorClient
+from featurehub.modeling import EvaluationConfig
+
+def test_extract_features_many():
+    def age(dataset):
+        return dataset["users"]["age"]
+
+    def slow(dataset):
+        import time
+        time.sleep(30)
+
+    def fail(dataset):
+        raise KeyError("missing")
+
+    dataset = {"users" : pd.DataFrame({"age" : [21, 35]})}
+    client = EvaluatorClient(1, "alice", None, time_limit=3)
+    client.dataset = dataset
+    client._config = ("classification", EvaluationConfig())
+
+    # each feature has the time limit of a single feature
+    results = client._extract_features_many([age, slow, fail, age])
+    assert [ok for ok, _ in results] == [True, False, False, True]
+    assert list(results[0][1]) == [21, 35]
+    assert "timed out" in results[1][1]
+    assert results[2][1] == "raises KeyError: 'missing'"
+    assert list(results[3][1]) == [21, 35]
+
+def test_wait_for_submission_errors(monkeypatch, capsys):
+    import requests
+    from featurehub.evaluation import EvaluationResponse
+    from featurehub.user.session import Session
+
+    class PendingResponse(object):
+        ok = True
+        text = EvaluationResponse(
+            status_code = EvaluationResponse.STATUS_CODE_PENDING,
+            job_id      = "abc",
+        ).get_data(as_text=True)
+
+    requests_made = []
+    def get(route, params=None, timeout=None):
+        requests_made.append(route)
+        raise requests.exceptions.ConnectionError("refused")
+    monkeypatch.setattr(Session, "_eval_server_get", staticmethod(get))
+    monkeypatch.setattr(EvaluatorClient, "SUBMIT_STATUS_MAX_ERRORS", 2)
+
+    # gives up after consecutive errors, printing the job id
+    client = EvaluatorClient(1, "alice", None)
+    assert client._wait_for_submission(PendingResponse()) is None
+    assert requests_made == ["submit-status/abc"] * 2
+    assert "job id 'abc'" in capsys.readouterr().err
+
+    # or once the submission has been pending for too long
+    monkeypatch.setattr(EvaluatorClient, "SUBMIT_MAX_WAIT", -1)
+    assert client._wait_for_submission(PendingResponse()) is None
+    assert len(requests_made) == 2
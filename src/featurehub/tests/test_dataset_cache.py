@@ -0,0 +1,89 @@
+import numpy as np
+import pandas as pd
+
+from featurehub.evaluation.cache import ProblemDatasetCache
+
+def _make_entry(n):
+    table = pd.DataFrame({"a" : np.zeros(n)})
+    return {"dataset" : {"table" : table}, "target" : table}
+
+def test_cache_hit_and_rebuild():
+    cache = ProblemDatasetCache()
+    builds = []
+    def build():
+        builds.append(1)
+        return _make_entry(10)
+
+    entry = cache.get("a", "v1", build)
+    assert cache.get("a", "v1", build) is entry
+    assert len(builds) == 1
+
+    # changed fingerprint
+    entry1 = cache.get("a", "v2", build)
+    assert entry1 is not entry
+    assert len(builds) == 2
+
+    # explicit invalidation
+    cache.invalidate("a")
+    assert "a" not in cache
+    cache.get("a", "v2", build)
+    assert len(builds) == 3
+
+def test_cache_lru_eviction():
+    cache = ProblemDatasetCache(max_bytes=2500)
+    for key in ["a", "b"]:
+        cache.get(key, "v1", lambda: _make_entry(100))
+    assert "a" in cache and "b" in cache
+
+    # use a, so that b is least recently used
+    cache.get("a", "v1", lambda: _make_entry(100))
+    cache.get("c", "v1", lambda: _make_entry(100))
+    assert "a" in cache and "c" in cache
+    assert "b" not in cache
+    assert cache.nbytes() <= 2500
+
+    # a single entry larger than the bound is kept
+    cache.get("d", "v1", lambda: _make_entry(1000))
+    assert len(cache) == 1 and "d" in cache
+
+def test_cache_shared_invalidation(tmpdir):
+    # caches of two processes sharing a path
+    path = str(tmpdir.join("cache"))
+    cache1 = ProblemDatasetCache(path=path)
+    cache2 = ProblemDatasetCache(path=path)
+    builds = []
+    def build():
+        builds.append(1)
+        return _make_entry(10)
+
+    for key in ["a", "b"]:
+        cache1.get(key, "v1", build)
+        cache2.get(key, "v1", build)
+    assert len(builds) == 4
+
+    # invalidating one key in one cache rebuilds it in the other only
+    cache1.invalidate("a")
+    cache2.get("a", "v1", build)
+    cache2.get("b", "v1", build)
+    assert len(builds) == 5
+    cache2.get("a", "v1", build)
+    assert len(builds) == 5
+
+    # invalidating all keys
+    cache2.invalidate()
+    cache1.get("a", "v1", build)
+    cache1.get("b", "v1", build)
+    assert len(builds) == 7
+
+def test_cache_counts_other_objects():
+    from featurehub.modeling.baseline import Baseline
+
+    table = pd.DataFrame({"a" : np.zeros(100)})
+    baseline = Baseline("regression", table, np.zeros(100))
+    cache = ProblemDatasetCache()
+    cache.get("a", "v1", lambda: {"table" : table, "baseline" : baseline,
+        "values" : np.zeros(100)})
+    assert cache.nbytes() == \
+            table.memory_usage(index=True, deep=True).sum() + \
+            baseline.nbytes + 800
+    assert baseline.nbytes >= 100 * (1 + Baseline.SPARE_COLUMNS) * 4
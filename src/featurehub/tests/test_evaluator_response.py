@@ -4,6 +4,7 @@ def test_response_status_code_only():
     all_status_codes = [
         EvaluationResponse.STATUS_CODE_BAD_REQUEST,
         EvaluationResponse.STATUS_CODE_OKAY,
+        EvaluationResponse.STATUS_CODE_PENDING,
         EvaluationResponse.STATUS_CODE_BAD_AUTH,
         EvaluationResponse.STATUS_CODE_BAD_FEATURE,
         EvaluationResponse.STATUS_CODE_SERVER_ERROR,
@@ -34,3 +35,13 @@ def _test_response_status_code_only(status_code):
     assert metrics_str     == metrics1_str
     assert explanation_str == explanation1_str
     assert response_str    == response1_str
+
+def test_response_job_id():
+    response = EvaluationResponse(
+        status_code = EvaluationResponse.STATUS_CODE_PENDING,
+        job_id      = "abc",
+    )
+    text = response.get_data(as_text=True)
+    response1 = EvaluationResponse.from_string(text)
+    assert response1.job_id == "abc"
+    assert response1.status_code1 == EvaluationResponse.STATUS_CODE_PENDING
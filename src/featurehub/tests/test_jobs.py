@@ -0,0 +1,79 @@
+import threading
+import time
+
+from featurehub.evaluation.jobs import Job, JobStore, SubmissionQueue
+
+def test_submission_queue():
+    q = SubmissionQueue(workers=2)
+    job_id = q.submit(lambda x, y: x + y, (1, 2), owner="alice")
+    job = q.wait(job_id, timeout=10)
+    assert job.status == Job.DONE
+    assert job.result == 3
+    assert job.owner == "alice"
+    assert q.get("unknown") is None
+
+def test_submission_queue_failure():
+    errors = []
+    def fail():
+        raise ValueError
+    q = SubmissionQueue(on_error=lambda job, tb: errors.append(job.id))
+    job_id = q.submit(fail, (), owner="alice")
+    job = q.wait(job_id, timeout=10)
+    assert job.status == Job.FAILED
+    assert errors == [job_id]
+
+def test_submission_queue_pending_key():
+    event = threading.Event()
+    q = SubmissionQueue(workers=1)
+    job_id = q.submit(event.wait, (10,), owner="alice", key="f")
+
+    # duplicate submission while the first is pending
+    assert q.submit(event.wait, (10,), owner="alice", key="f") == job_id
+    assert q.submit(event.wait, (10,), owner="bob", key="f") != job_id
+
+    # waiting times out while the job is running
+    assert not q.wait(job_id, timeout=0.1).is_finished()
+
+    event.set()
+    assert q.wait(job_id, timeout=10).status == Job.DONE
+    assert q.submit(event.wait, (10,), owner="alice", key="f") != job_id
+
+def test_submission_queue_expiry():
+    q = SubmissionQueue(result_ttl=0)
+    job_id = q.submit(int, (), owner="alice")
+    q.wait(job_id, timeout=10)
+    assert q.get(job_id) is None
+
+def test_submission_queue_store(tmpdir):
+    store = JobStore(str(tmpdir))
+    q = SubmissionQueue(store=store)
+    job_id = q.submit(str, (1,), owner="alice")
+    q.wait(job_id, timeout=10)
+
+    # another process sharing the store
+    q1 = SubmissionQueue(store=JobStore(str(tmpdir)))
+    job = q1.wait(job_id, timeout=10)
+    assert job.status == Job.DONE
+    assert job.result == "1"
+    assert job.owner == "alice"
+    assert q1.get("../" + job_id) is None
+
+def test_job_store_stale(tmpdir):
+    store = JobStore(str(tmpdir), stale_after=0.5)
+    job = Job(None, None, "alice")
+    store.save(job)
+    assert store.load(job.id).status == Job.PENDING
+    assert store.load(job.id).pid == job.pid
+
+    # without heartbeats, e.g. because the process running it was killed,
+    # the job has failed
+    time.sleep(1)
+    assert store.load(job.id).status == Job.FAILED
+    store.touch(job.id)
+    assert store.load(job.id).status == Job.PENDING
+
+    # finished jobs are never stale
+    job.status = Job.DONE
+    store.save(job)
+    time.sleep(1)
+    assert store.load(job.id).status == Job.DONE
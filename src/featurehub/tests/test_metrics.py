@@ -52,3 +52,8 @@ def test_metric_list():
     assert metric_list == MetricList.from_list_db(metric_list.convert(kind="db"))
     assert metric_list == MetricList.from_object(metric_list.convert(kind="user"))
     assert metric_list == MetricList.from_object(metric_list.convert(kind="db"))
+
+def test_metric_greater_is_better():
+    assert Metric.greater_is_better("ROC AUC")
+    assert not Metric.greater_is_better("Root Mean Squared Error")
+    assert Metric.greater_is_better("Unknown metric")
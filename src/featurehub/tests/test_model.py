@@ -96,3 +96,266 @@ def _test_problem_type_train_test(problem_type, data):
     metrics = model.compute_metrics(X, Y, kind="train_test", n=n)
                                     
     return metrics
+
+def test_cv_n_jobs():
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        X = data[problem_type]["X"]
+        Y = data[problem_type]["Y"]
+        metrics_serial = Model(problem_type, n_jobs=1).compute_metrics(X, Y)
+        metrics_parallel = Model(problem_type, n_jobs=3).compute_metrics(X, Y)
+        assert metrics_serial == metrics_parallel
+
+def test_predictions_computed_once():
+    from sklearn.tree import DecisionTreeClassifier
+
+    class CountingClassifier(DecisionTreeClassifier):
+        calls = []
+        def predict(self, X):
+            CountingClassifier.calls.append(len(X))
+            return super().predict(X)
+
+    model = Model(Model.CLASSIFICATION, n_jobs=1)
+    model.model = CountingClassifier(random_state=0)
+    X = data[Model.CLASSIFICATION]["X"]
+    Y = data[Model.CLASSIFICATION]["Y"]
+    n = round(0.7 * len(X))
+    model.compute_metrics(X, Y, kind="train_test", n=n)
+
+    # accuracy, precision and recall share one call to predict
+    assert CountingClassifier.calls == [len(X) - n]
+
+def test_cv_shared_folds():
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        X = data[problem_type]["X"]
+        Y = data[problem_type]["Y"]
+        folds = Model(problem_type).get_folds(X, Y)
+        metrics = Model(problem_type, n_jobs=1).compute_metrics(X, Y)
+        metrics_folds = Model(problem_type, n_jobs=1).compute_metrics_cv(
+            X, Y, folds=folds)
+        assert metrics == metrics_folds
+
+def test_baseline():
+    from featurehub.modeling.baseline import Baseline
+
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        X = data[problem_type]["X"]
+        Y = data[problem_type]["Y"]
+
+        # cross validation
+        baseline = Baseline(problem_type, X[:, :-1], Y)
+        metrics = baseline.compute_metrics(X[:, -1], n_jobs=1)
+        assert metrics == Model(problem_type).compute_metrics(X, Y)
+
+        # train and test split
+        n = round(0.7 * len(X))
+        folds = [(np.arange(n), np.arange(n, len(X)))]
+        baseline = Baseline(problem_type, X[:, :-1], Y, folds=folds)
+        metrics = baseline.compute_metrics(X[:, -1])
+        assert metrics == Model(problem_type).compute_metrics(X, Y,
+                kind="train_test", n=n)
+
+def test_baseline_buffer():
+    from featurehub.modeling.baseline import Baseline
+
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        X = data[problem_type]["X"]
+        Y = data[problem_type]["Y"]
+        baseline = Baseline(problem_type, X[:, :-2], Y)
+        metrics = baseline.compute_metrics(X[:, -2:], n_jobs=1)
+        assert metrics == Model(problem_type).compute_metrics(X, Y)
+
+        # the baseline features are copied while the buffer is in use
+        with baseline._buffer_lock:
+            assert baseline.compute_metrics(X[:, -2:], n_jobs=1) == metrics
+
+        # and for features with more columns than the buffer has spare
+        n = Baseline.SPARE_COLUMNS + 1
+        metrics = baseline.compute_metrics(np.tile(X[:, -2:-1], n), n_jobs=1)
+        assert metrics == Model(problem_type).compute_metrics(
+                np.hstack([X[:, :-2], np.tile(X[:, -2:-1], n)]), Y)
+
+        # the baseline features are left untouched
+        assert np.array_equal(baseline.X, X[:, :-2].astype(np.float32))
+
+def test_baseline_lift():
+    from featurehub.modeling.baseline import Baseline
+
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        X = data[problem_type]["X"]
+        Y = data[problem_type]["Y"]
+
+        # without baseline features, the baseline predicts the prior
+        baseline = Baseline(problem_type, None, Y)
+        metrics = baseline.compute_metrics(X)
+        lift = baseline.lift(metrics)
+        baseline_values = baseline.metrics.convert(kind="user")
+        for metric, metric_lift in zip(metrics, lift):
+            difference = metric.value - baseline_values[metric.name]
+            if metric.name == "Root Mean Squared Error":
+                difference = -difference
+            assert abs(metric_lift.value - difference) < EPSILON
+            assert metric_lift.value > 0
+        assert len(baseline.models) == len(baseline.folds)
+
+def test_binned_tree():
+    from featurehub.modeling.baseline import Baseline
+
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        X = data[problem_type]["X"]
+        Y = data[problem_type]["Y"]
+        metrics = Model(problem_type, learner=Model.BINNED_TREE)\
+                .compute_metrics(X, Y)
+        metrics_tree = Model(problem_type).compute_metrics(X, Y)
+        for metric, metric_tree in zip(metrics, metrics_tree):
+            assert abs(metric.value - metric_tree.value) < 0.2 * \
+                    abs(metric_tree.value)
+
+        # features are binned the same way with a baseline
+        baseline = Baseline(problem_type, X[:, :-1], Y,
+                learner=Model.BINNED_TREE)
+        assert baseline.compute_metrics(X[:, -1]) == metrics
+
+def test_format_no_copy():
+    X = np.ones((10, 2))
+    assert Model._formatX(X) is X
+    X32 = X.astype(np.float32)
+    assert Model._formatX(X32).dtype == np.float32
+    assert Model._formatX(pd.DataFrame(X32)).dtype == np.float32
+    assert Model._formatX(np.ones(10, dtype=int)).dtype == np.float64
+    assert Model._formatY(X[:, :1]).shape == (10,)
+
+def test_batch_size():
+    X_binary = X_classification[Y_classification < 2]
+    Y_binary = Y_classification[Y_classification < 2]
+    problems = [
+        (Model.CLASSIFICATION, data[Model.CLASSIFICATION]["X"],
+            data[Model.CLASSIFICATION]["Y"]),
+        (Model.CLASSIFICATION, X_binary, Y_binary),
+        (Model.REGRESSION, data[Model.REGRESSION]["X"],
+            data[Model.REGRESSION]["Y"]),
+    ]
+    rng = np.random.RandomState(0)
+    for problem_type, X, Y in problems:
+        # shuffle the rows so that the training split has all classes
+        inds = rng.permutation(len(Y))
+        X, Y = X[inds], Y[inds]
+        for kind, kwargs in [("cv", {}), ("train_test", {"n" : len(Y) // 2})]:
+            metrics = Model(problem_type).compute_metrics(X, Y, kind=kind,
+                    **kwargs)
+            metrics_batches = Model(problem_type, batch_size=7)\
+                    .compute_metrics(X, Y, kind=kind, **kwargs)
+            for metric, metric_batches in zip(metrics, metrics_batches):
+                assert metric.name == metric_batches.name
+                assert abs(metric.value - metric_batches.value) < EPSILON
+
+def test_scorings_cv_folds():
+    X = data[Model.CLASSIFICATION]["X"]
+    Y = data[Model.CLASSIFICATION]["Y"]
+    model = Model(Model.CLASSIFICATION, scorings=["roc_auc", "ndcg"],
+            cv_folds=4)
+    assert len(model.get_folds(X, Y)) == 4
+    metrics = model.compute_metrics(X, Y)
+    assert [metric.scoring for metric in metrics] == ["roc_auc", "ndcg"]
+
+    # scorings without an accumulator keep all predictions in batches
+    model = Model(Model.CLASSIFICATION, scorings=["ndcg"], batch_size=7)
+    assert model.compute_metrics(X, Y) == \
+            Model(Model.CLASSIFICATION, scorings=["ndcg"]).compute_metrics(X, Y)
+
+    for kwargs in [{"scorings" : ["r2"]}, {"cv_folds" : 1}]:
+        try:
+            Model(Model.CLASSIFICATION, **kwargs)
+            assert False
+        except ValueError:
+            pass
+
+def test_register():
+    from sklearn.linear_model import LinearRegression, LogisticRegression
+    from featurehub.modeling.metrics import Metric
+
+    Model.register_learner("linear", LogisticRegression, LinearRegression)
+    Model.register_scoring(Model.REGRESSION, "Max Error", "max_error",
+            lambda y_true, y_pred: np.max(np.abs(y_true - y_pred)),
+            greater_is_better=False)
+    try:
+        X = data[Model.REGRESSION]["X"]
+        Y = data[Model.REGRESSION]["Y"]
+        model = Model(Model.REGRESSION, learner="linear",
+                scorings=["max_error"])
+        assert isinstance(model.model, LinearRegression)
+        metrics = model.compute_metrics(X, Y)
+        assert metrics[0].name == "Max Error" and metrics[0].value > 0
+        assert not Metric.greater_is_better("Max Error")
+
+        try:
+            Model.register_learner("linear", LogisticRegression,
+                    LinearRegression)
+            assert False
+        except ValueError:
+            pass
+    finally:
+        del Model._learners["linear"]
+        Model.LEARNERS.remove("linear")
+        del Model._scorings[(Model.REGRESSION, "max_error")]
+        Model.AVAILABLE_SCORING[Model.REGRESSION].pop()
+
+def test_register_scoring_problem_types():
+    from featurehub.modeling.metrics import Metric
+
+    # the same scoring id, with different scorers for each problem type
+    Model.register_scoring(Model.CLASSIFICATION, "Custom", "custom",
+            lambda y_true, y_pred: 1.0)
+    Model.register_scoring(Model.REGRESSION, "Custom", "custom",
+            lambda y_true, y_pred: 2.0)
+    try:
+        for problem_type, value in [(Model.CLASSIFICATION, 1.0),
+                (Model.REGRESSION, 2.0)]:
+            X = data[problem_type]["X"]
+            Y = data[problem_type]["Y"]
+            model = Model(problem_type, scorings=["custom"])
+            metrics = model.compute_metrics(X, Y)
+            assert metrics[0].name == "Custom" and metrics[0].value == value
+        assert Metric.name_to_scoring("Custom") == "custom"
+
+        # registered twice for a problem type, shadowing a built-in scoring,
+        # or reusing the name of another scoring
+        for args in [(Model.REGRESSION, "Custom", "custom"),
+                (Model.REGRESSION, "Accuracy", "accuracy"),
+                (Model.CLASSIFICATION, "My ROC AUC", "roc_auc"),
+                (Model.REGRESSION, "Custom", "custom2")]:
+            try:
+                Model.register_scoring(*args, lambda y_true, y_pred: 0.0)
+                assert False, "expected ValueError"
+            except ValueError:
+                pass
+
+        # a scoring registered for regression is not used for classification
+        params = Model(Model.CLASSIFICATION)._get_params(np.array([0, 1]))
+        assert params["custom"]["scorer"](None, None) == 1.0
+    finally:
+        for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+            del Model._scorings[(problem_type, "custom")]
+            Model.AVAILABLE_SCORING[problem_type].pop()
+
+def test_evaluation_config():
+    from featurehub.modeling import EvaluationConfig
+
+    config = EvaluationConfig.from_problem_type_details(None)
+    assert config.learner == Model.TREE and config.get_time_limit(10) == 10
+
+    config = EvaluationConfig.from_problem_type_details(
+        '{"classification_type" : "multiclass", "learner" : "binned_tree", '
+        '"scorings" : ["accuracy"], "cv_folds" : 3, "time_budget" : 5}')
+    model = config.create_model(Model.CLASSIFICATION)
+    assert model.learner == Model.BINNED_TREE
+    assert model.cv_folds == 3
+    assert config.get_time_limit() == 5
+    assert config.get_time_limit(10) == 5
+
+    for details in [{"learner" : "forest"}, {"scorings" : "accuracy"},
+            {"cv_folds" : 1.5}, {"time_budget" : 0}]:
+        try:
+            EvaluationConfig.from_problem_type_details(details)
+            assert False
+        except ValueError:
+            pass
@@ -0,0 +1,229 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from featurehub.admin.sqlalchemy_declarative import (
+    Base, Feature, Problem, Metric)
+from featurehub.admin.postprocessing import (
+    build_feature_matrix, load_feature_matrix, FeatureStore, save_table,
+    load_table, TABLE_FORMATS, extract_table, extract_and_save_table)
+
+def test_build_feature_matrix():
+    def age(dataset):
+        return dataset["users"]["age"] * 2
+
+    def missing(dataset):
+        return dataset["users"]["missing"]
+
+    def slow(dataset):
+        import time
+        time.sleep(30)
+
+    def country(dataset):
+        return dataset["users"][["country"]]
+
+    dataset = {
+        "users" : pd.DataFrame({
+            "age"     : [1, 2, 3],
+            "country" : ["a", "b", "c"],
+        }, index=[10, 11, 12]),
+    }
+    features_df = pd.DataFrame({
+        "feature_function" : [age, missing, slow, country],
+    })
+
+    # runs outside of the main thread
+    result = {}
+    def build():
+        result["feature_matrix"] = build_feature_matrix(features_df, dataset,
+                "g", [3, 5, 7, 9], feature_extraction_time_limit=2,
+                processes=2)
+    thread = threading.Thread(target=build)
+    thread.start()
+    thread.join()
+
+    feature_matrix = result["feature_matrix"]
+    assert list(feature_matrix.columns) == \
+            ["g_0003", "g_0005", "g_0007", "g_0009"]
+    assert list(feature_matrix.index) == [10, 11, 12]
+    assert list(feature_matrix["g_0003"]) == [2, 4, 6]
+    assert list(feature_matrix["g_0005"]) == [0.0, 0.0, 0.0]
+    assert list(feature_matrix["g_0007"]) == [0.0, 0.0, 0.0]
+    assert list(feature_matrix["g_0009"]) == ["a", "b", "c"]
+
+def test_build_feature_matrix_first_fails():
+    def missing(dataset):
+        return dataset["users"]["missing"]
+
+    features_df = pd.DataFrame({"feature_function" : [missing]})
+    try:
+        build_feature_matrix(features_df, {"users" : pd.DataFrame()}, "g", [0])
+        assert False
+    except ValueError:
+        pass
+
+def test_build_feature_matrix_store(tmpdir):
+    def age(dataset):
+        return dataset["users"]["age"] * 2
+
+    def missing(dataset):
+        return dataset["users"]["missing"]
+
+    def fail(dataset):
+        raise RuntimeError
+
+    def new_dataset():
+        return {"users" : pd.DataFrame({"age" : [1, 2, 3]})}
+
+    store = FeatureStore(str(tmpdir))
+    features_df = pd.DataFrame({
+        "feature_function" : [age, missing],
+        "md5"              : ["a" * 32, "b" * 32],
+    })
+    feature_matrix = build_feature_matrix(features_df, new_dataset(), "g",
+            [0, 1], store=store)
+
+    # stored values are reused, failed features are extracted again
+    features_df["feature_function"] = [fail, age]
+    feature_matrix2 = build_feature_matrix(features_df, new_dataset(), "g",
+            [0, 1], store=store)
+    assert list(feature_matrix2["g_0000"]) == list(feature_matrix["g_0000"])
+    assert list(feature_matrix2["g_0001"]) == [2, 4, 6]
+
+    # values are not reused for different data
+    features_df["feature_function"] = [fail, fail]
+    dataset = new_dataset()
+    dataset["users"]["age"] = [4, 5, 6]
+    try:
+        build_feature_matrix(features_df, dataset, "g", [0, 1], store=store)
+        assert False
+    except ValueError:
+        pass
+
+def test_load_feature_matrix_store(tmpdir):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    problems = [Problem(name=name, problem_type="", data_dir_train="",
+        data_dir_test="", files="", table_names="", entities_table_name="",
+        target_table_name="") for name in ["p0", "p1"]]
+    for i in range(4):
+        session.add(Feature(code="", md5=str(i) * 32, description="",
+            problem=problems[i % 2]))
+    session.commit()
+
+    # values stored at submission, for problem p1 only
+    store = FeatureStore(str(tmpdir))
+    for i in [1, 3]:
+        for split, values in [("train", [i, i]), ("test", [-i])]:
+            key = FeatureStore.get_submission_key("db", problems[1].id, split)
+            store.put(str(i) * 32, key, pd.Series(values, name="x"))
+
+    feature_matrix = load_feature_matrix("p1", "train", "g", session=session,
+            database="db", store=store)
+    assert list(feature_matrix.columns) == ["g_0001", "g_0003"]
+    assert feature_matrix.values.tolist() == [[1, 3], [1, 3]]
+    feature_matrix = load_feature_matrix("p1", "test", "g", session=session,
+            database="db", store=store)
+    assert feature_matrix.values.tolist() == [[-1, -3]]
+
+    # features of p0 were never stored
+    try:
+        load_feature_matrix("p0", "train", "g", session=session,
+                database="db", store=store)
+        assert False
+    except ValueError:
+        pass
+
+def test_save_table(tmpdir, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmpdir))
+    tmpdir.mkdir("notebooks")
+    df = pd.DataFrame({
+        "a" : np.arange(5, dtype=float),
+        "b" : list("vwxyz"),
+    }, index=np.arange(5) * 2)
+
+    try:
+        import pyarrow
+        formats = TABLE_FORMATS
+    except ImportError:
+        formats = ["pkl.bz2", "pkl", "columnar"]
+
+    for format in formats:
+        save_table(df, "t", format=format)
+        assert load_table("t." + format).equals(df)
+
+        # without extension, the most recently saved table is loaded
+        df2 = df.iloc[::-1]
+        time.sleep(0.01)
+        save_table(df2, "t", format=format)
+        assert load_table("t").equals(df2)
+
+    # format given by the name
+    save_table(df, "u.pkl.bz2")
+    assert os.path.exists(str(tmpdir.join("notebooks", "u.pkl.bz2")))
+    try:
+        save_table(df, "u.pkl.bz2", format="pkl")
+        assert False
+    except ValueError:
+        pass
+
+def test_extract_table(tmpdir, monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for i in range(7):
+        feature = Feature(code="c{}".format(i), md5=str(i) * 32,
+                description="", problem_id=i % 2)
+        session.add(feature)
+        session.add(Metric(feature=feature, name="Accuracy",
+            scoring="accuracy", value=i / 10 if i > 3 else None))
+    session.commit()
+
+    df = extract_table(session, Feature)
+    assert len(df) == 7
+    assert list(df.columns) == [c.name for c in Feature.__table__.columns]
+    assert list(df["code"]) == ["c{}".format(i) for i in range(7)]
+
+    df = extract_table(session, Feature, columns=["md5", "problem_id"],
+            filters=[Feature.problem_id == 1])
+    assert list(df.columns) == ["md5", "problem_id"]
+    assert list(df["md5"]) == [str(i) * 32 for i in [1, 3, 5]]
+
+    # chunks are consecutive rows of the table
+    chunks = list(extract_table(session, Feature, chunksize=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 1]
+    assert pd.concat(chunks).equals(extract_table(session, Feature))
+    chunks = list(extract_table(session, Feature, chunksize=3,
+        filters=[Feature.problem_id == 2]))
+    assert len(chunks) == 1 and chunks[0].empty
+    chunks = list(extract_table(session, Feature, columns=["md5"],
+        chunksize=7))
+    assert len(chunks) == 1 and list(chunks[0].columns) == ["md5"]
+    assert list(chunks[0]["md5"]) == [str(i) * 32 for i in range(7)]
+
+    try:
+        extract_table(session, Feature, columns=["missing"])
+        assert False
+    except ValueError:
+        pass
+
+    # the first chunk of metrics has no values
+    try:
+        import pyarrow
+    except ImportError:
+        return
+    monkeypatch.setenv("HOME", str(tmpdir))
+    tmpdir.mkdir("notebooks")
+    extract_and_save_table(session, Metric, "metrics", format="parquet",
+            chunksize=2)
+    df = load_table("metrics")
+    expected = extract_table(session, Metric)
+    assert list(df["id"]) == list(expected["id"])
+    assert df["value"].isnull().sum() == 4
+    assert list(df["value"][4:]) == [0.4, 0.5, 0.6]
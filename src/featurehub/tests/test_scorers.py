@@ -21,5 +21,39 @@ def test_ndcg():
     score3  = ndcg_score(y_true, y_pred3, k=3)
     assert np.abs(score3 - 0.543643) < EPSILON
 
+def _ndcg_score_sorted(y_true, y_pred, k=5):
+    # ndcg_score computed by sorting the predictions of each row, with ties
+    # broken by decreasing label
+    y_pred_topk = np.fliplr(np.argsort(y_pred, kind="mergesort"))[:,:k]
+    pos = np.where(np.sum(y_pred_topk==y_true[:,None],1) > 0,
+                 np.argmax(y_pred_topk==y_true[:,None],1),
+                 np.nan)
+    scores = [1.0/np.log2((i+1)+1) if not np.isnan(i) else 0 for i in pos]
+    return np.mean(scores)
+
+def test_ndcg_sorted():
+    rng = np.random.RandomState(0)
+    for n_classes in [2, 12, 100]:
+        y_true = rng.randint(0, n_classes, size=1000)
+        y_pred = rng.rand(1000, n_classes)
+        y_pred_ties = rng.randint(0, 4, size=(1000, n_classes)) / 4.0
+        for k in [1, 2, 5, n_classes + 1]:
+            assert ndcg_score(y_true, y_pred, k=k) == \
+                    _ndcg_score_sorted(y_true, y_pred, k=k)
+            assert ndcg_score(y_true, y_pred_ties, k=k) == \
+                    _ndcg_score_sorted(y_true, y_pred_ties, k=k)
+
+def test_ndcg_chunks(monkeypatch):
+    rng = np.random.RandomState(0)
+    y_true = rng.randint(0, 10, size=1000).astype(float)
+    y_pred = rng.rand(1000, 10)
+    score = ndcg_score(y_true, y_pred)
+    monkeypatch.setattr("featurehub.modeling.scorers.NDCG_CHUNK_SIZE", 7)
+    assert ndcg_score(y_true, y_pred) == score
+
+    # labels that are not classes of y_pred
+    y_true[:10] = [-1, 10, 0.5, 11, -1, 10, 0.5, 11, -1, 10]
+    assert ndcg_score(y_true, y_pred) == _ndcg_score_sorted(y_true, y_pred)
+
 def test_rmsle():
     pass
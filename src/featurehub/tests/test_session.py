@@ -1,5 +1,10 @@
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
 from featurehub.user.session import Session
 from featurehub.modeling import Metric, MetricList
+from featurehub.admin.sqlalchemy_declarative import Base, Feature
+from featurehub.admin.sqlalchemy_declarative import Metric as MetricDb
 
 def test_print_one_feature():
     feature_description = "Age"
@@ -13,3 +18,69 @@ def test_print_one_feature():
 
     Session._print_one_feature(feature_description, feature_id, feature_code,
             metric_list_user)
+
+def test_page_features(monkeypatch):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    values = [0.5, None, 0.9, 0.1, 0.5, 0.7, None]
+    for i, value in enumerate(values):
+        feature = Feature(code="", md5="", description="", problem_id=i % 2)
+        session.add(feature)
+        session.add(MetricDb(feature=feature, name="ROC AUC",
+            scoring="roc_auc", value=value))
+    session.commit()
+    monkeypatch.setattr(Session, "FEATURE_BATCH_SIZE", 2)
+
+    def ids(**kwargs):
+        pages = list(Session._page_features(session.query(Feature), **kwargs))
+        assert all(0 < len(page) <= 2 for page in pages)
+        return [feature.id for page in pages for feature in page]
+
+    assert ids() == [1, 2, 3, 4, 5, 6, 7]
+    assert ids(offset=2, limit=3) == [3, 4, 5]
+    assert ids(offset=6) == [7]
+    assert ids(offset=7) == []
+    assert ids(sort_by="ROC AUC") == [3, 6, 1, 5, 4, 2, 7]
+    assert ids(sort_by="ROC AUC", offset=1, limit=3) == [6, 1, 5]
+
+    query = session.query(Feature).filter(Feature.problem_id == 1)
+    pages = list(Session._page_features(query))
+    assert [feature.id for page in pages for feature in page] == [2, 4, 6]
+
+def test_evaluate_many_registered():
+    import pandas as pd
+
+    class FakeClient(object):
+        def __init__(self, registered):
+            self.registered = registered
+            self.evaluated = []
+        def check_if_registered(self, feature, verbose=False):
+            return feature in self.registered
+        def evaluate_many(self, features, lift=False):
+            self.evaluated.append(features)
+            return pd.DataFrame({"feature" : [f.__name__ for f in features],
+                "ROC AUC" : 0.5, "error" : None},
+                columns=["feature", "ROC AUC", "error"])
+
+    # features built by one factory have the same name
+    def make_feature():
+        def feature(dataset):
+            pass
+        return feature
+    features = [make_feature() for _ in range(3)]
+
+    session = Session.__new__(Session)
+    session._Session__evaluation_client = FakeClient([features[1]])
+    metrics = session.evaluate_many(features)
+    assert list(metrics.index) == [0, 1, 2]
+    assert list(metrics["feature"]) == ["feature"] * 3
+    assert list(metrics["error"].isnull()) == [True, False, True]
+    assert metrics["error"][1] == "already registered"
+
+    # nothing is evaluated if all features are registered
+    client = FakeClient(features)
+    session._Session__evaluation_client = client
+    metrics = session.evaluate_many(features)
+    assert client.evaluated == []
+    assert list(metrics["error"]) == ["already registered"] * 3
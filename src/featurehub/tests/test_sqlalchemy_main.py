@@ -0,0 +1,75 @@
+from sqlalchemy import create_engine
+from sqlalchemy.dialects import mysql
+from sqlalchemy.orm import sessionmaker
+
+from featurehub.admin.sqlalchemy_declarative import Base, Feature, Metric
+from featurehub.admin.sqlalchemy_main import (
+    get_feature_metrics, code_search_filters)
+
+def test_get_feature_metrics():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+
+    features = []
+    for i in range(5):
+        feature = Feature(code="", md5="", description="")
+        session.add(feature)
+        if i < 4:
+            session.add(Metric(feature=feature, name="Recall", scoring="recall",
+                value=i))
+            session.add(Metric(feature=feature, name="Accuracy",
+                scoring="accuracy", value=None))
+        features.append(feature)
+    session.commit()
+
+    ids = [feature.id for feature in features]
+    metrics = get_feature_metrics(session, ids, batch_size=2)
+    assert sorted(metrics) == sorted(ids)
+    for i, feature_id in enumerate(ids[:4]):
+        assert metrics[feature_id] == [("Recall", i), ("Accuracy", None)]
+    assert metrics[ids[4]] == []
+
+def test_code_search_filters():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    for code in ["x.groupby('a')", "x.group_by('a')", "x.groupby ('a')"]:
+        session.add(Feature(code=code, md5="", description=""))
+    session.commit()
+
+    def search(code_fragment):
+        filters = code_search_filters(engine.dialect, code_fragment)
+        assert len(filters) == 1
+        features = session.query(Feature).filter(*filters).all()
+        return [feature.code for feature in features]
+
+    assert search("groupby('a") == ["x.groupby('a')"]
+
+    # full-text search on MySQL, for words that are indexed
+    def render_mysql(code_fragment):
+        dialect = mysql.dialect()
+        filters = code_search_filters(dialect, code_fragment)
+        return [str(filter_.compile(dialect=dialect,
+                    compile_kwargs={"literal_binds" : True}))
+                for filter_ in filters]
+
+    filters = render_mysql("x.groupby('a')")
+    assert len(filters) == 2
+    assert filters[0] == \
+            "MATCH (features.code) AGAINST ('+groupby*' IN BOOLEAN MODE)"
+    assert "LIKE" in filters[1]
+
+    # words that may start within a word of the code are left to the scan
+    for code in ["x.value_counts()", "users.user_id"]:
+        session.add(Feature(code=code, md5="", description=""))
+    session.commit()
+    for code_fragment, code in [("counts()", "x.value_counts()"),
+                                ("_id", "users.user_id"),
+                                ("r_id", "users.user_id")]:
+        assert len(render_mysql(code_fragment)) == 1
+        assert search(code_fragment) == [code]
+    assert "AGAINST ('+idxmax*' IN BOOLEAN MODE)" in \
+            render_mysql("value_counts().idxmax")[0]
+    assert "AGAINST ('+users*' IN BOOLEAN MODE)" in \
+            render_mysql("x['users']")[0]
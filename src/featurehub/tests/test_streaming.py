@@ -0,0 +1,70 @@
+import numpy as np
+import sklearn.metrics
+from sklearn.preprocessing import label_binarize
+
+from featurehub.modeling.streaming import CorrectCounts, SquaredErrors, RankCounts
+from featurehub.tests.util import EPSILON
+
+def _accumulate(accumulator, y_true, y_pred, batch_size=13):
+    # update accumulators with batches, and merge them pairwise
+    first, second = accumulator(), accumulator()
+    for start in range(0, len(y_true), batch_size):
+        stop = start + batch_size
+        if start // batch_size % 2:
+            first.update(y_true[start:stop], y_pred[start:stop])
+        else:
+            second.update(y_true[start:stop], y_pred[start:stop])
+    first.merge(second)
+    return first
+
+def test_correct_counts():
+    rng = np.random.RandomState(0)
+    y_true = rng.randint(0, 3, size=200)
+    y_pred = rng.randint(0, 3, size=200)
+    counts = _accumulate(CorrectCounts, y_true, y_pred)
+    assert counts.n == 200
+    assert counts.accuracy() == sklearn.metrics.accuracy_score(y_true, y_pred)
+    assert abs(counts.accuracy() - sklearn.metrics.precision_score(y_true,
+        y_pred, average="micro")) < EPSILON
+
+def test_squared_errors():
+    rng = np.random.RandomState(0)
+    y_true = 1000 + rng.randn(200)
+    y_pred = y_true + rng.randn(200)
+    errors = _accumulate(SquaredErrors, y_true, y_pred)
+    assert abs(errors.root_mean_squared_error() - np.sqrt(
+        sklearn.metrics.mean_squared_error(y_true, y_pred))) < EPSILON
+    assert abs(errors.r2() - sklearn.metrics.r2_score(y_true, y_pred)) \
+            < EPSILON
+
+    constant = _accumulate(SquaredErrors, np.ones(20), np.ones(20))
+    assert constant.r2() == 1.0
+    constant.update([1.0], [2.0])
+    assert constant.r2() == 0.0
+
+def test_rank_counts():
+    rng = np.random.RandomState(0)
+
+    # binary labels, predictions with ties
+    y_true = rng.randint(0, 2, size=200)
+    y_pred = np.round(y_true * 0.3 + rng.rand(200), 1)
+    counts = _accumulate(RankCounts, y_true, y_pred)
+    assert abs(counts.roc_auc() - sklearn.metrics.roc_auc_score(y_true,
+        y_pred)) < EPSILON
+    assert len(counts.values) == len(np.unique(y_pred))
+
+    # micro-averaged multiclass
+    classes = [0, 1, 2]
+    y_true = label_binarize(rng.randint(0, 3, size=200), classes=classes)
+    y_pred = rng.dirichlet(np.ones(3), size=200)
+    counts = _accumulate(RankCounts, y_true, y_pred)
+    assert abs(counts.roc_auc() - sklearn.metrics.roc_auc_score(y_true,
+        y_pred, average="micro")) < EPSILON
+
+    counts = RankCounts(pos_label=2)
+    counts.update([2, 2], [0.1, 0.5])
+    try:
+        counts.roc_auc()
+        assert False
+    except ValueError:
+        pass
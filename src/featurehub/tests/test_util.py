@@ -1,4 +1,5 @@
 from os.path import abspath, realpath, dirname, join
+import os
 import sys
 import unittest
 sys.path.insert(0, join(dirname(abspath(realpath(__file__))),'..','..'))
@@ -125,6 +126,155 @@ def test_run_isolated():
         assert f(arg) == featurehub.util.run_isolated(f, arg)
         assert g(arg) == featurehub.util.run_isolated(g, arg)
 
+def getpid():
+    import os
+    return os.getpid()
+
+def sleep(seconds):
+    import time
+    time.sleep(seconds)
+
+def crash():
+    import os
+    os._exit(1)
+
+def fail():
+    raise ValueError("fail")
+
+def test_isolated_pool_reuses_worker():
+    pool = featurehub.util.IsolatedPool(maxtasksperchild=3)
+    try:
+        pids = [pool.apply(getpid) for _ in range(4)]
+        assert pids[0] == pids[1] == pids[2]
+        assert pids[3] != pids[2]
+    finally:
+        pool.close()
+
+def test_isolated_pool_timeout():
+    pool = featurehub.util.IsolatedPool()
+    try:
+        pid = pool.apply(getpid)
+        try:
+            pool.apply(sleep, 10, timeout=0.5)
+            assert False, "expected TimeoutError"
+        except TimeoutError:
+            pass
+        assert pool.apply(f, 1) == 2
+        assert pool.apply(getpid) != pid
+    finally:
+        pool.close()
+
+def test_isolated_pool_crash():
+    pool = featurehub.util.IsolatedPool()
+    try:
+        try:
+            pool.apply(crash)
+            assert False, "expected RuntimeError"
+        except RuntimeError:
+            pass
+        assert pool.apply(f, 1) == 2
+    finally:
+        pool.close()
+
+def test_isolated_pool_exception():
+    pool = featurehub.util.IsolatedPool()
+    try:
+        pid = pool.apply(getpid)
+        try:
+            pool.apply(fail)
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+        assert pool.apply(getpid) == pid
+    finally:
+        pool.close()
+
+def count_rows(dataset):
+    return {name: len(dataset[name]) for name in dataset}
+
+def test_run_isolated_shared_dataset():
+    import pandas as pd
+    dataset = {
+        "users" : pd.DataFrame({"age" : [21, 35, 50], "name" : ["a", "b", "c"]}),
+        "groups" : pd.DataFrame({"size" : [1.5, 2.5]}),
+    }
+    shared = featurehub.util.SharedDataset(dataset)
+    try:
+        result = featurehub.util.run_isolated(count_rows, shared)
+        assert result == {"users" : 3, "groups" : 2}
+    finally:
+        shared.close()
+
+def test_save_load_columnar():
+    import numpy as np
+    import pandas as pd
+    from tempfile import TemporaryDirectory
+    df = pd.DataFrame({
+        "a" : np.arange(5),
+        "b" : np.linspace(0, 1, 5),
+        "c" : list("abcde"),
+        "d" : pd.date_range("2017-01-01", periods=5),
+    }, index=list("vwxyz"))
+    with TemporaryDirectory() as d:
+        path = os.path.join(d, "table")
+        featurehub.util.save_columnar(df, path)
+        df1 = featurehub.util.load_columnar(path)
+        assert df.equals(featurehub.util.load_columnar(path))
+        assert list(df.dtypes) == list(df1.dtypes)
+
+        # numeric columns are backed by the memory-mapped files
+        for column in ["a", "b", "d"]:
+            root = featurehub.util._root_array(df1[column].values)
+            assert isinstance(root, np.memmap)
+
+def test_save_load_columnar_tz():
+    import numpy as np
+    import pandas as pd
+    from tempfile import TemporaryDirectory
+    df = pd.DataFrame({
+        "a" : pd.date_range("2017-01-01", periods=5, tz="US/Eastern"),
+        "b" : np.arange(5),
+    })
+    with TemporaryDirectory() as d:
+        path = os.path.join(d, "table")
+        featurehub.util.save_columnar(df, path)
+        df1 = featurehub.util.load_columnar(path)
+        assert str(df1["a"].dt.tz) == "US/Eastern"
+        assert list(df1["a"]) == list(df["a"])
+
+def test_read_csv_cached():
+    import json
+    import numpy as np
+    import time
+    from tempfile import TemporaryDirectory
+    with TemporaryDirectory() as d:
+        filename = os.path.join(d, "users.csv")
+        cache_dir = os.path.join(d, "cache")
+        with open(filename, "w") as f:
+            f.write("id,age,name\n1,21,a\n2,35,b\n")
+
+        df = featurehub.util.read_csv_cached(filename, cache_dir=cache_dir)
+        assert len(os.listdir(cache_dir)) == 1
+        df1 = featurehub.util.read_csv_cached(filename, cache_dir=cache_dir)
+        root = featurehub.util._root_array(df1["age"].values)
+        assert isinstance(root, np.memmap)
+        assert df.equals(df1)
+
+        # dtypes file is honoured and invalidates the cache
+        with open(os.path.join(d, "users.dtypes.json"), "w") as f:
+            json.dump({"age" : "int8"}, f)
+        df2 = featurehub.util.read_csv_cached(filename, cache_dir=cache_dir)
+        assert df2["age"].dtype == "int8"
+        assert len(os.listdir(cache_dir)) == 1
+
+        # changed file invalidates the cache
+        time.sleep(0.01)
+        with open(filename, "w") as f:
+            f.write("id,age,name\n1,21,a\n2,35,b\n3,40,c\n")
+        df3 = featurehub.util.read_csv_cached(filename, cache_dir=cache_dir)
+        assert len(df3) == 3
+        assert len(os.listdir(cache_dir)) == 1
+
 @unittest.skip(reason="doesn't work :(")
 def test_run_isolated_from_function_from_source():
     args = [1,3,7]
@@ -178,6 +328,76 @@ def test_compute_dataset_hash():
     [d.describe() for d in dataset.values()]
     assert dataset_hash == featurehub.util.compute_dataset_hash(dataset)
 
+def test_dataset_hasher():
+    import numpy as np
+    import pandas as pd
+
+    def create_dummy_dataset(n=10, m=30):
+        dataset = {i:pd.DataFrame(np.random.randn(m,m)) for i in range(n)}
+        dataset[n] = pd.DataFrame({"a" : list("abc"), "b" : [1, 2, 3]},
+                index=[4, 5, 6])
+        return dataset
+
+    # should get the same hash if we recompute with no changes
+    hasher = featurehub.util.DatasetHasher()
+    dataset = create_dummy_dataset()
+    dataset_hash = hasher.hash(dataset)
+    assert dataset_hash == hasher.hash(dataset)
+    assert dataset_hash == featurehub.util.DatasetHasher().hash(dataset)
+
+    # hashed buffers are read-only
+    df = pd.DataFrame({"a" : np.zeros(3), "b" : np.ones(3)})
+    featurehub.util.DatasetHasher().hash({"df" : df})
+    for values in [df.values, df["a"].values]:
+        try:
+            values[0] += 1
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+    # unless pandas holds writeable views of them, in which case in-place
+    # modifications are detected
+    try:
+        dataset[0].values[0,0] += 1
+    except ValueError:
+        pass
+    else:
+        assert dataset_hash != hasher.hash(dataset)
+        dataset_hash = hasher.hash(dataset)
+
+    # replace data, recompute, should get different hash. Older pandas
+    # replace columns in place, so work on a copy.
+    dataset[0] = dataset[0].copy()
+    dataset[0][0] = dataset[0][0] + 1
+    new_hash = hasher.hash(dataset)
+    assert dataset_hash != new_hash
+    assert new_hash == featurehub.util.DatasetHasher().hash(dataset)
+
+    dataset[10] = dataset[10].copy()
+    dataset[10]["a"] = ["a", "b", "d"]
+    assert new_hash != hasher.hash(dataset)
+
+    # new table
+    dataset_hash = hasher.hash(dataset)
+    dataset[11] = pd.DataFrame()
+    assert dataset_hash != hasher.hash(dataset)
+
+def test_dataset_fingerprint():
+    import numpy as np
+    import pandas as pd
+
+    dataset = {"a" : pd.DataFrame(np.random.randn(10, 3)),
+               "b" : pd.DataFrame({"c" : list("abc")}, index=[4, 5, 6])}
+    fingerprint = featurehub.util.FeatureStore.compute_dataset_fingerprint(
+            dataset)
+    assert fingerprint == featurehub.util.DatasetHasher().hash(
+            {k : v.copy() for k, v in dataset.items()})
+
+    # the dataset can still be modified in place
+    dataset["a"].iloc[0, 0] += 1
+    assert fingerprint != \
+            featurehub.util.FeatureStore.compute_dataset_fingerprint(dataset)
+
 def test_myhash():
     a = "hello world"
     b = "hello world".encode("utf-8")
@@ -190,3 +410,8 @@ def test_is_positive_env():
 
     for n in ["", "no", "No", "blargh", "zam", "zot", False, 0, "0"]:
         assert featurehub.util.is_positive_env(n) == False
+
+def test_get_cpu_count():
+    n_cpus = featurehub.util.get_cpu_count()
+    assert n_cpus >= 1
+    assert n_cpus <= (os.cpu_count() or 1)
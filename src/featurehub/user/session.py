@@ -4,13 +4,17 @@ import gc
 import pandas as pd
 import requests
 
+from sqlalchemy import and_
 from sqlalchemy.orm.exc import NoResultFound, MultipleResultsFound
 
-from featurehub.admin.sqlalchemy_main import ORMManager
+from featurehub.admin.sqlalchemy_main import (
+    ORMManager, get_feature_metrics, code_search_filters
+)
 from featurehub.admin.sqlalchemy_declarative import (
     Problem, Feature, User, Metric
 )
 from featurehub.modeling import Model
+from featurehub.modeling import Metric as ModelMetric
 from featurehub.util import run_isolated, get_source, TRY_AGAIN_LATER
 from featurehub.evaluation import EvaluatorClient
 
@@ -20,6 +24,10 @@ class Session(object):
     Includes commands for discovering, testing, and registering new features.
     """
 
+    # number of features fetched from the database at a time when printing
+    # features
+    FEATURE_BATCH_SIZE = 100
+
     def __init__(self, problem, database = "featurehub"):
         self.__database            = database
         self.__orm                 = ORMManager(database)
@@ -42,7 +50,7 @@ class Session(object):
 
         # initialize evaluation client
         self.__evaluation_client = EvaluatorClient(self.__problem_id,
-                self.__username, self.__orm)
+                self.__username, self.__orm, share_dataset=True)
 
     @property
     def __dataset(self):
@@ -57,18 +65,33 @@ class Session(object):
         return self.__evaluation_client.target
 
     @staticmethod
-    def _eval_server_post(route, data):
-        url = "http://{}:{}/services/eval-server/{}".format(
+    def _eval_server_url(route):
+        return "http://{}:{}/services/eval-server/{}".format(
             os.environ.get("EVAL_CONTAINER_NAME"),
             os.environ.get("EVAL_CONTAINER_PORT"),
             route
         )
-        headers = {
+
+    @staticmethod
+    def _eval_server_headers():
+        return {
             "Authorization" : "token {}".format(
                 os.environ.get("JUPYTERHUB_API_TOKEN")),
         }
+
+    @staticmethod
+    def _eval_server_post(route, data):
+        url = Session._eval_server_url(route)
+        headers = Session._eval_server_headers()
         return requests.post(url=url, data=data, headers=headers)
 
+    @staticmethod
+    def _eval_server_get(route, params=None, timeout=None):
+        url = Session._eval_server_url(route)
+        headers = Session._eval_server_headers()
+        return requests.get(url=url, params=params, headers=headers,
+                timeout=timeout)
+
     def _login(self):
         name = os.environ.get("USER")
         if not name:
@@ -141,7 +164,8 @@ class Session(object):
             entity_features = None
         return entity_features
 
-    def discover_features(self, code_fragment=None):
+    def discover_features(self, code_fragment=None, limit=None, offset=0,
+            sort_by=None):
         """Print features written by other users.
 
         A code fragment can be used to filter search results. For each feature,
@@ -151,10 +175,26 @@ class Session(object):
         ----------
         code_fragment : string, default=None
             Source code fragment to filter for.
+        limit : int, default=None
+            Maximum number of features to print. By default, prints all
+            features.
+        offset : int, default=0
+            Number of features to skip, for example to page through results.
+        sort_by : string, default=None
+            Name of a metric, such as "ROC AUC", by which to sort features from
+            best to worst. By default, features are printed in the order in
+            which they were registered.
+
+        Examples
+        --------
+        >>> commands.discover_features(limit=10, sort_by="ROC AUC") # top 10
+        >>> commands.discover_features(limit=10, offset=10) # second page
         """
-        self._print_some_features(code_fragment, User.name != self.__username)
+        self._print_some_features(code_fragment, User.name != self.__username,
+                limit=limit, offset=offset, sort_by=sort_by)
 
-    def print_my_features(self, code_fragment=None):
+    def print_my_features(self, code_fragment=None, limit=None, offset=0,
+            sort_by=None):
         """Print features written by me.
 
         A code fragment can be used to filter search results. For each feature,
@@ -164,33 +204,128 @@ class Session(object):
         ----------
         code_fragment : string, default=None
             Source code fragment to filter for.
+        limit : int, default=None
+            Maximum number of features to print. By default, prints all
+            features.
+        offset : int, default=0
+            Number of features to skip, for example to page through results.
+        sort_by : string, default=None
+            Name of a metric, such as "ROC AUC", by which to sort features from
+            best to worst. By default, features are printed in the order in
+            which they were registered.
         """
-        self._print_some_features(code_fragment, User.name == self.__username)
+        self._print_some_features(code_fragment, User.name == self.__username,
+                limit=limit, offset=offset, sort_by=sort_by)
+
+    def _print_some_features(self, code_fragment, predicate, limit=None,
+            offset=0, sort_by=None):
+        """Driver function for discover_features and print_my_features.
 
-    def _print_some_features(self, code_fragment, predicate):
-        """Driver function for discover_features and print_my_features."""
+        Features are read from the database one page at a time, together with
+        the metrics of all features of the page, so that only one page of
+        features is held in memory at a time; see _page_features.
+        """
         with self.__orm.session_scope() as session:
             query = self._filter_features(session, code_fragment)
 
             # Filter only users that are not me
             query = query.join(Feature.user).filter(predicate)
-            features = query.all()
 
-            if features:
+            n_features = 0
+            for features in Session._page_features(query, limit=limit,
+                    offset=offset, sort_by=sort_by):
+                # fetch metrics of all features in page at once
+                metrics = get_feature_metrics(session,
+                        [feature.id for feature in features])
                 for feature in features:
-                    # Join with metrics table
-                    query = session.query(Metric.name, Metric.value)\
-                                .filter(Metric.feature_id == feature.id)
-                    metrics = query.all()
-                    metric_list = [(metric.name, metric.value) for metric in
-                            metrics]
                     self._print_one_feature(feature.description, feature.id,
-                            feature.code, metric_list)
-            else:
+                            feature.code, metrics[feature.id])
+                n_features += len(features)
+
+            if not n_features:
                 print("No features found.")
 
+    @staticmethod
+    def _page_features(query, limit=None, offset=0, sort_by=None):
+        """Iterate over pages of features of query, in order.
+
+        Each page is read with its own query, as the database driver may read
+        all rows of a query into memory at once. Without sort_by, features are
+        ordered by id and each page starts after the last id of the previous
+        one. With sort_by, only the ids of the features are ranked in one
+        query, and then each page of features is read by id.
+
+        Parameters
+        ----------
+        query : sqlalchemy.orm.query.Query
+            Query of Feature
+        limit, offset, sort_by
+            See discover_features
+
+        Yields
+        ------
+        features : list of Feature
+            At most FEATURE_BATCH_SIZE features
+        """
+        batch_size = Session.FEATURE_BATCH_SIZE
+
+        if sort_by:
+            ids_query = Session._order_features(
+                    query.with_entities(Feature.id), sort_by)
+            if offset:
+                ids_query = ids_query.offset(offset)
+            if limit is not None:
+                ids_query = ids_query.limit(limit)
+            ids = [feature_id for feature_id, in ids_query]
+            for i in range(0, len(ids), batch_size):
+                page = ids[i:i+batch_size]
+                features = {feature.id : feature for feature in
+                        query.filter(Feature.id.in_(page))}
+                yield [features[feature_id] for feature_id in page]
+            return
+
+        if offset:
+            first_id = query.with_entities(Feature.id).order_by(Feature.id)\
+                    .offset(offset).limit(1).scalar()
+            if first_id is None:
+                return
+            query = query.filter(Feature.id >= first_id)
+
+        last_id = None
+        remaining = limit
+        while remaining is None or remaining > 0:
+            page_query = query
+            if last_id is not None:
+                page_query = page_query.filter(Feature.id > last_id)
+            n = batch_size if remaining is None else min(batch_size, remaining)
+            features = page_query.order_by(Feature.id).limit(n).all()
+            if not features:
+                return
+            yield features
+            last_id = features[-1].id
+            if remaining is not None:
+                remaining -= len(features)
+
+    @staticmethod
+    def _order_features(query, sort_by):
+        """Order features query from best to worst value of metric sort_by.
+
+        Features without a value for the metric come last. Ties, and all
+        features if sort_by is None, are ordered by feature id.
+        """
+        if sort_by:
+            query = query.outerjoin(Metric, and_(Metric.feature_id == Feature.id,
+                                                 Metric.name == sort_by))
+            if ModelMetric.greater_is_better(sort_by):
+                value = Metric.value.desc()
+            else:
+                value = Metric.value.asc()
+            query = query.order_by(Metric.value.is_(None), value)
+
+        return query.order_by(Feature.id)
+
 
-    def evaluate(self, feature):
+    def evaluate(self, feature, lift=False):
         """Evaluate feature on training dataset and return key performance metrics.
 
         Runs the feature in an isolated environment to extract the feature
@@ -203,12 +338,76 @@ class Session(object):
         ----------
         feature : function
             Feature to evaluate
+        lift : bool, optional (default=False)
+            Whether to report the improvement of each metric over the model
+            built on the problem's preprocessed features alone, instead of
+            the metric itself. Positive values are improvements.
         """
 
         if self.__evaluation_client.check_if_registered(feature, verbose=True):
             return
 
-        return self.__evaluation_client.evaluate(feature)
+        return self.__evaluation_client.evaluate(feature, lift=lift)
+
+    def evaluate_many(self, features, lift=False):
+        """Evaluate several features on training dataset.
+
+        Runs each feature in the isolated environment to extract its values,
+        with the time limit of a single feature, validates the values, and then
+        builds a model on each feature and computes key cross-validated
+        metrics. All features are evaluated on the same cross validation
+        folds, so their metrics can be compared directly. Features that are
+        already registered are not evaluated.
+
+        Parameters
+        ----------
+        features : list of function
+            Features to evaluate
+        lift : bool, optional (default=False)
+            Whether to report the improvement of each metric over the
+            baseline instead of the metric itself; see evaluate.
+
+        Returns
+        -------
+        metrics : pd.DataFrame
+            One row per feature, indexed by the position of the feature in
+            features, with a "feature" column holding its name, one column per
+            metric, and an "error" column. For invalid features, the metrics
+            are missing and the error column holds the reason.
+
+        Examples
+        --------
+        >>> metrics = commands.evaluate_many([age, age_squared, age_bucket])
+        >>> metrics.sort_values("ROC AUC", ascending=False)
+        """
+
+        features = list(features)
+        registered = [
+            self.__evaluation_client.check_if_registered(feature, verbose=True)
+            for feature in features
+        ]
+        unregistered = [feature for feature, is_registered in
+                zip(features, registered) if not is_registered]
+
+        if unregistered:
+            metrics = self.__evaluation_client.evaluate_many(unregistered,
+                    lift=lift)
+        else:
+            # nothing to evaluate, so don't load the dataset
+            metrics = pd.DataFrame(columns=["feature", "error"])
+
+        # add rows for registered features, in their original positions
+        if len(unregistered) < len(features):
+            metrics.index = [i for i, is_registered in enumerate(registered)
+                             if not is_registered]
+            metrics = metrics.reindex(range(len(features)))
+            indices = [i for i, is_registered in enumerate(registered)
+                       if is_registered]
+            metrics.loc[indices, "feature"] = [features[i].__name__
+                                               for i in indices]
+            metrics.loc[indices, "error"] = "already registered"
+
+        return metrics
 
     def submit(self, feature, description=""):
         """Submit feature to server for evaluation on test data.
@@ -246,9 +445,8 @@ class Session(object):
         )
 
         if code_fragment:
-            filter_ = filter_ + (
-                Feature.code.contains(code_fragment),
-            )
+            filter_ = filter_ + code_search_filters(
+                    session.get_bind().dialect, code_fragment)
 
         return session.query(Feature).filter(*filter_)
 
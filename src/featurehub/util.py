@@ -1,9 +1,20 @@
 import sys
 import os
+import json
+import time
+import queue
+import pickle
+import shutil
+import tempfile
+import threading
+import weakref
 import dill
+import numpy as np
+import pandas as pd
 import inspect
 import importlib.util
-from multiprocessing import Pool
+from multiprocessing import Process, Pipe
+from multiprocessing.pool import ExceptionWithTraceback
 from textwrap import dedent
 from xxhash import xxh64
 from tempfile import TemporaryDirectory
@@ -17,20 +28,477 @@ RANDOM_STATE = 1754
 TRY_AGAIN_LATER = "Please try again later or contact administrator."
 TRY_AGAIN = "Please contact administrator."
 
+ISOLATED_MAX_TASKS_PER_CHILD = 10
+ISOLATED_POLL_INTERVAL = 0.05
+
 def _get_function_and_execute(f_dill, *args):
     f = dill.loads(f_dill)
+    args = [arg.load() if isinstance(arg, SharedDataset) else arg
+            for arg in args]
     return f(*args)
 
-def run_isolated(f, *args):
+def _isolated_worker_loop(conn, parent_conn):
+    """Main loop of an isolated worker process.
+
+    Receives (f_dill, args) tasks over `conn` until it receives None or the
+    connection is closed, and sends back (True, result) or (False, exception).
+    """
+    # close our copy of the parent's end so that we see EOF if it goes away
+    parent_conn.close()
+    while True:
+        try:
+            task = conn.recv()
+        except (EOFError, OSError):
+            break
+        if task is None:
+            break
+
+        f_dill, args = task
+        try:
+            result = (True, _get_function_and_execute(f_dill, *args))
+        except Exception as e:
+            result = (False, ExceptionWithTraceback(e, e.__traceback__))
+
+        try:
+            conn.send(result)
+        except Exception as e:
+            # result could not be pickled
+            conn.send((False, ExceptionWithTraceback(e, e.__traceback__)))
+
+class IsolatedWorker(object):
+    """A long-lived process that executes functions in isolation.
+
+    The process is started lazily and is recycled after it has executed
+    `maxtasksperchild` tasks, after it crashes, or after a task exceeds its
+    time limit. When a worker is recycled after completing a task, its
+    replacement is started immediately, so that the next task does not pay
+    for process startup.
+
+    Parameters
+    ----------
+    maxtasksperchild : int or None, optional
+        Number of tasks after which the process is replaced. If None, the
+        process is only replaced after a crash or a timeout.
+    """
+
+    def __init__(self, maxtasksperchild=ISOLATED_MAX_TASKS_PER_CHILD):
+        self.maxtasksperchild = maxtasksperchild
+        self._process = None
+        self._conn    = None
+        self._ntasks  = 0
+
+    def is_alive(self):
+        return self._process is not None and self._process.is_alive()
+
+    def start(self):
+        parent_conn, child_conn = Pipe()
+        process = Process(target=_isolated_worker_loop,
+                args=(child_conn, parent_conn))
+        process.daemon = True
+        process.start()
+        child_conn.close()
+
+        self._process = process
+        self._conn    = parent_conn
+        self._ntasks  = 0
+
+    def stop(self):
+        """Ask the process to exit, terminating it if it does not."""
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except Exception:
+            pass
+        self._process.join(1)
+        self.kill()
+
+    def kill(self):
+        """Terminate the process immediately."""
+        if self._process is None:
+            return
+        if self._process.is_alive():
+            self._process.terminate()
+        self._process.join()
+        self._conn.close()
+        self._process = None
+        self._conn    = None
+
+    def apply(self, f_dill, args, timeout=None):
+        """Execute dill-serialized function with args and return the result.
+
+        Raises TimeoutError if the task does not finish within `timeout`
+        seconds and RuntimeError if the process dies while executing it.
+        Exceptions raised by the function itself are re-raised.
+        """
+        if not self.is_alive():
+            self.start()
+
+        if timeout is not None:
+            deadline = time.time() + timeout
+        else:
+            deadline = None
+
+        try:
+            self._conn.send((f_dill, args))
+            self._ntasks += 1
+            while not self._conn.poll(ISOLATED_POLL_INTERVAL):
+                if not self._process.is_alive():
+                    self.kill()
+                    raise RuntimeError("Isolated worker process exited "
+                                       "unexpectedly.")
+                if deadline is not None and time.time() > deadline:
+                    self.kill()
+                    raise TimeoutError("Isolated execution timed out after {}"
+                                       " seconds.".format(timeout))
+            ok, value = self._conn.recv()
+        except TimeoutError:
+            raise
+        except (EOFError, OSError):
+            self.kill()
+            raise RuntimeError("Isolated worker process exited unexpectedly.")
+        except BaseException:
+            # e.g. KeyboardInterrupt: the state of the worker is unknown
+            self.kill()
+            raise
+
+        if self.maxtasksperchild and self._ntasks >= self.maxtasksperchild:
+            self.stop()
+            self.start()
+
+        if ok:
+            return value
+        else:
+            raise value
+
+class IsolatedPool(object):
+    """Pool of long-lived worker processes for running functions in isolation.
+
+    Each call to `apply` serializes the function with dill and executes it on
+    an idle worker, blocking until one is available. The pool is thread-safe.
+
+    Parameters
+    ----------
+    processes : int, optional (default=1)
+        Number of worker processes.
+    maxtasksperchild : int or None, optional
+        Number of tasks after which a worker process is replaced.
+    timeout : float or None, optional (default=None)
+        Default time limit in seconds for each task.
+    """
+
+    def __init__(self, processes=1,
+            maxtasksperchild=ISOLATED_MAX_TASKS_PER_CHILD, timeout=None):
+        self.processes = processes
+        self.timeout   = timeout
+        self._workers  = queue.Queue()
+        for _ in range(processes):
+            self._workers.put(IsolatedWorker(maxtasksperchild))
+
+    def apply(self, f, *args, timeout=None):
+        """Execute `f(args)` on a worker process and return the result."""
+        if timeout is None:
+            timeout = self.timeout
+        f_dill = dill.dumps(f)
+        worker = self._workers.get()
+        try:
+            return worker.apply(f_dill, args, timeout=timeout)
+        finally:
+            self._workers.put(worker)
+
+    def close(self):
+        """Stop all worker processes."""
+        for _ in range(self.processes):
+            self._workers.get().stop()
+
+_isolated_pools = {}
+_isolated_pools_lock = threading.Lock()
+
+def get_isolated_pool(maxtasksperchild=ISOLATED_MAX_TASKS_PER_CHILD,
+        processes=1):
+    """Return the process-wide IsolatedPool for the given configuration."""
+    key = (maxtasksperchild, processes)
+    with _isolated_pools_lock:
+        if key not in _isolated_pools:
+            _isolated_pools[key] = IsolatedPool(processes=processes,
+                    maxtasksperchild=maxtasksperchild)
+        return _isolated_pools[key]
+
+def run_isolated(f, *args, timeout=None):
     """Execute `f(args)` in an isolated environment.
 
     First, uses dill to serialize the function. Unfortunately, pickle is unable
     to serialize some functions, so we must serialize and deserialize the
-    function ourselves.
+    function ourselves. The function is executed by the process-wide
+    IsolatedPool, whose worker process is reused across calls and recycled
+    periodically.
+    """
+    return get_isolated_pool().apply(f, *args, timeout=timeout)
+
+def _is_plain_array(series):
+    return isinstance(series.dtype, np.dtype) and series.dtype.kind in "biufcmM"
+
+def _get_tz(series):
+    return getattr(series.dtype, "tz", None)
+
+def save_columnar(df, path):
+    """Write DataFrame to a directory with one file per column.
+
+    Columns with plain numeric or datetime dtypes are written as .npy files,
+    which can be memory-mapped by `load_columnar`. Timezone-aware datetime
+    columns are written as UTC datetimes, and their timezone is kept. All
+    other columns, the index and the column labels are pickled together in a
+    metadata file.
+
+    Parameters
+    ----------
+    df : pd.DataFrame
+    path : str
+        Directory to create.
+    """
+    os.makedirs(path)
+    meta = {
+        "columns" : df.columns,
+        "index"   : df.index,
+        "objects" : {},
+        "tz"      : {},
+    }
+    for i in range(df.shape[1]):
+        series = df.iloc[:, i]
+        if _get_tz(series) is not None:
+            meta["tz"][i] = _get_tz(series)
+            values = series.dt.tz_convert("UTC").dt.tz_localize(None).values
+            np.save(os.path.join(path, "{}.npy".format(i)), values)
+        elif _is_plain_array(series):
+            np.save(os.path.join(path, "{}.npy".format(i)),
+                    np.ascontiguousarray(series.values))
+        else:
+            meta["objects"][i] = series.values
+
+    with open(os.path.join(path, "meta.pkl"), "wb") as f:
+        pickle.dump(meta, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+def load_columnar(path, mmap_mode="c"):
+    """Read DataFrame written by `save_columnar`.
+
+    Numeric and timezone-naive datetime columns of the DataFrame are backed
+    by the memory-mapped files themselves, not by copies. pandas may however
+    merge columns of the same dtype into a private copy when it operates on
+    the whole DataFrame; see `_frame_from_columns`.
+
+    Parameters
+    ----------
+    path : str
+    mmap_mode : str or None, optional (default="c")
+        Memory-map mode for numeric columns, passed to np.load. The default
+        maps columns copy-on-write, so that pages are only copied into private
+        memory if they are written to.
+    """
+    with open(os.path.join(path, "meta.pkl"), "rb") as f:
+        meta = pickle.load(f)
+
+    n = len(meta["columns"])
+    tzs = meta.get("tz", {})
+    data = []
+    for i in range(n):
+        if i in meta["objects"]:
+            values = meta["objects"][i]
+        else:
+            values = np.load(os.path.join(path, "{}.npy".format(i)),
+                    mmap_mode=mmap_mode)
+            if i in tzs:
+                values = pd.DatetimeIndex(values).tz_localize("UTC")\
+                        .tz_convert(tzs[i])
+        data.append(values)
+
+    return _frame_from_columns(data, meta["columns"], meta["index"])
+
+def _frame_from_columns(data, columns, index):
+    """Return DataFrame with the given column values, without copying them.
+
+    Before pandas 2, the DataFrame constructor merges columns of the same
+    dtype into one block, copying them, so on these versions each column is
+    given a block of its own. pandas still merges the blocks, copying the
+    columns, the first time an operation on the whole DataFrame needs it
+    (such as sum, groupby or arithmetic on pandas 0.19). Selecting columns
+    or rows does not.
     """
-    f_dill = dill.dumps(f)
-    with Pool(1) as pool:
-        return pool.apply(_get_function_and_execute, (f_dill, *args))
+    if int(pd.__version__.split(".")[0]) >= 2:
+        df = pd.DataFrame(dict(enumerate(data)), index=index,
+                columns=list(range(len(data))), copy=False)
+        df.columns = columns
+        return df
+
+    from pandas.core.internals import BlockManager, make_block
+    blocks = []
+    for i, values in enumerate(data):
+        if isinstance(values, np.ndarray):
+            values = values.reshape(1, -1)
+        blocks.append(make_block(values, placement=[i], ndim=2))
+    manager = BlockManager(blocks, [pd.Index(columns), pd.Index(index)])
+    return pd.DataFrame(manager)
+
+def _file_state(filename):
+    st = os.stat(filename)
+    return "{}:{}:{}".format(os.path.abspath(filename), st.st_mtime_ns,
+            st.st_size)
+
+def compute_files_fingerprint(filenames):
+    """Return fingerprint of the state of a list of files.
+
+    The fingerprint changes whenever any of the files is modified, replaced,
+    created or deleted. It is based on the path, modification time and size
+    of each file, not on file contents.
+
+    Parameters
+    ----------
+    filenames : list of str
+    """
+    states = []
+    for filename in filenames:
+        if os.path.exists(filename):
+            states.append(_file_state(filename))
+        else:
+            states.append("{}:missing".format(os.path.abspath(filename)))
+    return myhash("|".join(states))
+
+def _read_csv(filename):
+    """Read CSV file, using the column types in its dtypes file, if present.
+
+    The dtypes file for `name.csv` is `name.dtypes.json`, holding a JSON
+    object that maps column names to dtypes, such as
+    {"age" : "int32", "signup_date" : "datetime64[ns]"}. Declaring narrow
+    types reduces memory usage.
+    """
+    dtypes_filename = os.path.splitext(filename)[0] + ".dtypes.json"
+    if os.path.exists(dtypes_filename):
+        with open(dtypes_filename, "r") as f:
+            dtypes = json.load(f)
+        parse_dates = [c for c in dtypes if dtypes[c].startswith("datetime")]
+        dtype = {c : dtypes[c] for c in dtypes if c not in parse_dates}
+        return pd.read_csv(filename, low_memory=False, header=0,
+                dtype=dtype, parse_dates=parse_dates)
+    else:
+        return pd.read_csv(filename, low_memory=False, header=0)
+
+def read_csv_cached(filename, cache_dir=None):
+    """Read CSV file through a columnar on-disk cache.
+
+    The first time a file is read, it is parsed and then written to the cache
+    in the format of `save_columnar`, keyed by the path, modification time
+    and size of the file (and of its dtypes file, see `_read_csv`). Later
+    reads of the unchanged file memory-map the cached columns instead of
+    parsing the CSV again, with the caveats of `load_columnar`: the numeric
+    columns share the page cache until pandas copies them, for example by
+    operating on the whole table. Outdated cache entries for the same file are
+    removed. If the cache can't be written, the parsed table is returned
+    anyway.
+
+    Parameters
+    ----------
+    filename : str
+    cache_dir : str, optional
+        Cache directory. Defaults to the FF_TABLE_CACHE_DIR environment
+        variable, or to featurehub-cache in the system temporary directory.
+    """
+    if cache_dir is None:
+        cache_dir = os.environ.get("FF_TABLE_CACHE_DIR",
+                os.path.join(tempfile.gettempdir(), "featurehub-cache"))
+
+    state = _file_state(filename)
+    dtypes_filename = os.path.splitext(filename)[0] + ".dtypes.json"
+    if os.path.exists(dtypes_filename):
+        state += "|" + _file_state(dtypes_filename)
+    prefix = myhash(os.path.abspath(filename))[:12]
+    entry_name = prefix + "-" + myhash(state)
+    entry = os.path.join(cache_dir, entry_name)
+
+    if os.path.exists(entry):
+        try:
+            return load_columnar(entry)
+        except Exception:
+            shutil.rmtree(entry, ignore_errors=True)
+
+    df = _read_csv(filename)
+
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=cache_dir)
+        try:
+            save_columnar(df, os.path.join(tmp, "table"))
+            os.rename(os.path.join(tmp, "table"), entry)
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+        for name in os.listdir(cache_dir):
+            if name.startswith(prefix + "-") and name != entry_name:
+                shutil.rmtree(os.path.join(cache_dir, name),
+                        ignore_errors=True)
+    except OSError:
+        # e.g. read-only file system, or another process won the race
+        pass
+
+    return df
+
+def _remove_owned_dir(path, pid):
+    # forked children inherit the finalizer, but must not remove the files
+    if os.getpid() == pid:
+        shutil.rmtree(path, ignore_errors=True)
+
+class SharedDataset(object):
+    """Dataset published once for use by many isolated worker processes.
+
+    Each table is written to a columnar directory (see `save_columnar`).
+    Pickling a SharedDataset sends only the location of these files, so
+    passing one to `IsolatedPool.apply` costs almost nothing; the worker
+    process attaches to the tables with `load`, memory-mapping the numeric
+    columns. Mapped pages are shared through the page cache by all processes
+    that load the dataset, as long as the columns are not copied: selecting
+    columns keeps them shared, while operations on a whole table may copy
+    its columns into private memory (see `load_columnar`).
+
+    Parameters
+    ----------
+    dataset : dict mapping str to pd.DataFrame
+    dir : str, optional
+        Parent directory for the files. Defaults to the FF_SHARED_DATASET_DIR
+        environment variable, or to the system temporary directory. A tmpfs
+        mount such as /dev/shm keeps the tables entirely in memory.
+    """
+
+    def __init__(self, dataset, dir=None):
+        if dir is None:
+            dir = os.environ.get("FF_SHARED_DATASET_DIR")
+        self.path = tempfile.mkdtemp(prefix="featurehub-dataset-", dir=dir)
+        self.table_names = list(dataset.keys())
+        # removes the files when this object is collected or at exit
+        self._finalizer = weakref.finalize(self, _remove_owned_dir,
+                self.path, os.getpid())
+        try:
+            for i, table_name in enumerate(self.table_names):
+                save_columnar(dataset[table_name],
+                        os.path.join(self.path, str(i)))
+        except Exception:
+            self.close()
+            raise
+
+    def __getstate__(self):
+        # copies in other processes don't own the files
+        state = self.__dict__.copy()
+        state["_finalizer"] = None
+        return state
+
+    def load(self):
+        """Return the dataset as a dict mapping str to pd.DataFrame."""
+        return {
+            table_name : load_columnar(os.path.join(self.path, str(i)))
+            for i, table_name in enumerate(self.table_names)
+        }
+
+    def close(self):
+        """Remove the published files. Only the publishing process does so."""
+        if self._finalizer is not None:
+            self._finalizer()
 
 def get_source(function):
     """Extract the source code from a given function.
@@ -213,6 +681,187 @@ def compute_dataset_hash(dataset):
 
     return h.hexdigest()
 
+def _root_array(a):
+    while isinstance(a.base, np.ndarray):
+        a = a.base
+    return a
+
+class DatasetHasher(object):
+    """Compute hash values of dataset contents incrementally.
+
+    Each column (and each index) is hashed separately from its underlying
+    buffer, and that buffer is then made read-only. On later calls, a column
+    backed by the same, still read-only buffer cannot have been modified, so
+    its cached digest is reused; only new or replaced columns are rehashed.
+    Like `compute_dataset_hash`, the resulting hash changes if and only if the
+    contents of the dataset change, but hash values of the two functions are
+    not comparable.
+
+    As a consequence, in-place modification of a hashed dataset raises
+    ValueError ("assignment destination is read-only"). Work on a copy
+    instead, or use `freeze=False`, which leaves the dataset untouched but
+    rehashes every column on every call.
+
+    pandas can hold views of a buffer that were created before the buffer
+    was made read-only, and which stay writeable, such as the views of the
+    array from which a DataFrame was constructed without copying it. Values
+    of a column obtained from such a view are writeable too, so a column is
+    only considered unmodified if its values, as returned by pandas, are
+    read-only. Otherwise, it is rehashed on every call.
+
+    Parameters
+    ----------
+    freeze : bool, optional (default=True)
+        Whether to make hashed buffers read-only and cache their digests.
+
+    Examples
+    --------
+    >>> hasher = DatasetHasher()
+    >>> dataset_hash = hasher.hash(dataset)
+    >>> dataset_hash == hasher.hash(dataset)    # fast, nothing is rehashed
+    True
+    """
+
+    def __init__(self, freeze=True):
+        self.freeze = freeze
+
+        # maps key => (fingerprint, digest)
+        self._digests = {}
+
+    def hash(self, dataset):
+        """Return hash value of dataset contents.
+
+        Parameters
+        ----------
+        dataset : dict mapping str to pd.DataFrame
+        """
+        h = xxh64()
+        for d in sorted(dataset.keys()):
+            df = dataset[d]
+            h.update(pickle.dumps((d, list(df.columns)), protocol=2))
+            h.update(self._hash_index(d, df.index))
+            for i in range(df.shape[1]):
+                h.update(self._hash_values((d, i), df.iloc[:, i].values))
+
+        return h.hexdigest()
+
+    def _hash_index(self, key, index):
+        if isinstance(index, pd.RangeIndex):
+            return repr(index).encode("utf-8")
+        return self._hash_values((key, "index"), index.values)
+
+    def _hash_values(self, key, values):
+        if not isinstance(values, np.ndarray):
+            # e.g. Categorical; no buffer to track, hash it every time.
+            return xxh64(pickle.dumps(values, protocol=2)).hexdigest()\
+                    .encode("utf-8")
+
+        root = _root_array(values)
+        fingerprint = (id(root), values.__array_interface__["data"][0],
+                values.shape, values.strides, values.dtype.str)
+
+        # values can be written to if they are a view of a writeable view of
+        # root, even if root itself is read-only
+        cached = self._digests.get(key)
+        if cached is not None and cached[0] == fingerprint \
+                and not root.flags.writeable and not values.flags.writeable:
+            return cached[1]
+
+        h = xxh64(values.dtype.str.encode("utf-8"))
+        if values.dtype.kind == "O":
+            h.update(pickle.dumps(values, protocol=2))
+        else:
+            h.update(np.ascontiguousarray(values).view(np.uint8))
+        digest = h.hexdigest().encode("utf-8")
+
+        if not self.freeze:
+            return digest
+
+        try:
+            root.flags.writeable = False
+            self._digests[key] = (fingerprint, digest)
+        except ValueError:
+            # can't freeze this buffer, so can't trust a cached digest later
+            self._digests.pop(key, None)
+
+        return digest
+
+class FeatureStore(object):
+    """Values of features, stored per feature and dataset.
+
+    The values of a feature extracted from a dataset are stored in a columnar
+    directory (see save_columnar) at `{path}/{dataset_fingerprint}/{md5}`,
+    where md5 is the Feature.md5 of the feature code and dataset_fingerprint
+    identifies the contents of the dataset (see compute_dataset_fingerprint).
+    Feature functions only depend on the dataset, so stored values are reused
+    by every later build of feature matrices from the same data.
+
+    The evaluation server can also store the values of each registered
+    feature, as extracted when it was submitted, under the key returned by
+    get_submission_key instead of a dataset fingerprint (see
+    featurehub.admin.postprocessing.assemble_feature_matrix).
+
+    Parameters
+    ----------
+    path : str, optional
+        Directory of the store. Defaults to output/features/store in the
+        notebooks directory.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), "notebooks", "output",
+                    "features", "store")
+        self.path = path
+
+    @staticmethod
+    def compute_dataset_fingerprint(dataset):
+        """Return fingerprint of the contents of dataset.
+
+        The dataset is left untouched, so every column is hashed; see
+        DatasetHasher.
+        """
+        return DatasetHasher(freeze=False).hash(dataset)
+
+    @staticmethod
+    def get_submission_key(database, problem_id, split):
+        """Return key of the values of features stored at submission.
+
+        Values are stored separately for the train and test splits of each
+        problem, as problem ids are only unique within a database.
+        """
+        return os.path.join(database, str(problem_id), split)
+
+    def get(self, md5, dataset_fingerprint):
+        """Return the stored values of a feature, or None if not stored."""
+        path = self._get_path(md5, dataset_fingerprint)
+        if not os.path.exists(path):
+            return None
+        return load_columnar(path)
+
+    def put(self, md5, dataset_fingerprint, values):
+        """Store the values of a feature.
+
+        Values are written to a temporary directory that is then renamed, so
+        concurrent builds never read partially written values.
+        """
+        path = self._get_path(md5, dataset_fingerprint)
+        parent = os.path.dirname(path)
+        os.makedirs(parent, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=".tmp-", dir=parent)
+        try:
+            save_columnar(pd.DataFrame(values), os.path.join(tmp, "values"))
+            try:
+                os.rename(os.path.join(tmp, "values"), path)
+            except OSError:
+                # stored concurrently by another build
+                pass
+        finally:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+    def _get_path(self, md5, dataset_fingerprint):
+        return os.path.join(self.path, dataset_fingerprint, md5)
+
 def myhash(obj):
     """Compute md5 checksum of string-like object."""
     if not isinstance(obj, bytes):
@@ -261,3 +910,46 @@ def is_positive_env(value):
             "totally"]
 
     return False
+
+def _read_cgroup_cpu_quota():
+    """Return CPU quota of this process's cgroup, or None if not limited."""
+    # cgroup v2
+    try:
+        with open("/sys/fs/cgroup/cpu.max", "r") as f:
+            quota, period = f.read().split()[:2]
+        if quota == "max":
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+
+    # cgroup v1
+    try:
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us", "r") as f:
+            quota = int(f.read())
+        with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us", "r") as f:
+            period = int(f.read())
+        if quota <= 0 or period <= 0:
+            return None
+        return quota / period
+    except (OSError, ValueError):
+        pass
+
+    return None
+
+def get_cpu_count():
+    """Return number of CPUs available to this process.
+
+    Takes into account the CPU affinity of the process and the CPU quota of
+    its container, if any. Always at least 1.
+    """
+    try:
+        n_cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        n_cpus = os.cpu_count() or 1
+
+    quota = _read_cgroup_cpu_quota()
+    if quota is not None:
+        n_cpus = min(n_cpus, int(quota))
+
+    return max(n_cpus, 1)
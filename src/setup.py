@@ -13,11 +13,13 @@ with open('./requirements.txt', 'r') as f:
 
 requirements_autosklearn = ['auto-sklearn==0.2.0']
 requirements_xgboost = ['xgboost==0.81']
+requirements_server = ['gunicorn==19.9.0']
 
 extras_require = {
     'autosklearn': requirements_autosklearn,
     'xgboost': requirements_xgboost,
-    'all': requirements_autosklearn + requirements_xgboost,
+    'server': requirements_server,
+    'all': requirements_autosklearn + requirements_xgboost + requirements_server,
 }
 
 setup_requirements = ['pytest-runner', ]
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""Benchmark of the learners used to evaluate features.
+
+Compares fit time and cross-validated metrics of Model with the default
+decision trees and with binned decision trees, on synthetic problems with a
+few preprocessed features and one new feature.
+
+Usage:
+    ./benchmark_learners.py --rows 1000000 2000000 --features 5
+"""
+
+import argparse
+import time
+
+from sklearn.datasets import make_classification, make_regression
+
+from featurehub.modeling import Model
+
+def make_data(problem_type, n_rows, n_features):
+    if problem_type == Model.CLASSIFICATION:
+        return make_classification(n_rows, n_features, n_informative=3,
+                random_state=0)
+    else:
+        return make_regression(n_rows, n_features, n_informative=3, noise=10,
+                random_state=0)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+",
+            default=[100000, 1000000])
+    parser.add_argument("--features", type=int, default=5)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    for problem_type in [Model.CLASSIFICATION, Model.REGRESSION]:
+        for n_rows in args.rows:
+            X, Y = make_data(problem_type, n_rows, args.features)
+            for learner in Model.LEARNERS:
+                model = Model(problem_type, n_jobs=args.n_jobs,
+                        learner=learner)
+                start = time.time()
+                metrics = model.compute_metrics(X, Y)
+                elapsed = time.time() - start
+                metrics_str = "  ".join("{} {:.4f}".format(m.name, m.value)
+                                        for m in metrics)
+                print("{:<15} {:>9} rows  {:<12} {:>7.2f}s  {}".format(
+                    problem_type, n_rows, learner, elapsed, metrics_str))
+
+if __name__ == "__main__":
+    main()
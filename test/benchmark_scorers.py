@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""Benchmark of ndcg_score.
+
+Compares ndcg_score with the same score computed by sorting the predictions of
+each row, on random predictions, and checks that both are equal.
+
+Usage:
+    ./benchmark_scorers.py --rows 100000 500000 --classes 10 100
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from featurehub.modeling.scorers import ndcg_score
+
+def ndcg_score_sorted(y_true, y_pred, k=5):
+    y_pred_topk = np.fliplr(np.argsort(y_pred, kind="mergesort"))[:,:k]
+    pos = np.where(np.sum(y_pred_topk==y_true[:,None],1) > 0,
+                 np.argmax(y_pred_topk==y_true[:,None],1),
+                 np.nan)
+    scores = [1.0/np.log2((i+1)+1) if not np.isnan(i) else 0 for i in pos]
+    return np.mean(scores)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+",
+            default=[100000, 500000])
+    parser.add_argument("--classes", type=int, nargs="+", default=[10, 100])
+    parser.add_argument("-k", type=int, default=5)
+    args = parser.parse_args()
+
+    rng = np.random.RandomState(0)
+    print("{:>8} {:>8} {:>10} {:>10} {:>6}".format("rows", "classes",
+        "sorted(s)", "ndcg(s)", "equal"))
+    for n_rows in args.rows:
+        for n_classes in args.classes:
+            y_true = rng.randint(0, n_classes, size=n_rows)
+            y_pred = rng.rand(n_rows, n_classes)
+
+            start = time.time()
+            expected = ndcg_score_sorted(y_true, y_pred, k=args.k)
+            time_sorted = time.time() - start
+
+            start = time.time()
+            score = ndcg_score(y_true, y_pred, k=args.k)
+            time_ndcg = time.time() - start
+
+            print("{:>8} {:>8} {:>10.3f} {:>10.3f} {:>6}".format(n_rows,
+                n_classes, time_sorted, time_ndcg, str(score == expected)))
+
+if __name__ == "__main__":
+    main()
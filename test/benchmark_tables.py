@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""Benchmark of the formats of saved tables.
+
+Saves and loads a random feature matrix with save_table and load_table in
+each format, and reports the round-trip times and the size on disk. Tables
+are written to a temporary notebooks directory. Feather and Parquet are only
+benchmarked if pyarrow is installed.
+
+Usage:
+    ./benchmark_tables.py --rows 100000 --columns 200
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import featurehub.admin.postprocessing as postprocessing
+
+def get_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(dirpath, filename))
+               for dirpath, _, filenames in os.walk(path)
+               for filename in filenames)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=200)
+    parser.add_argument("--formats", nargs="+",
+            default=postprocessing.TABLE_FORMATS)
+    args = parser.parse_args()
+
+    # features are often integers or have few distinct values
+    rng = np.random.RandomState(0)
+    data = {}
+    for i in range(args.columns):
+        if i % 3 == 0:
+            values = rng.rand(args.rows)
+        elif i % 3 == 1:
+            values = rng.randint(0, 100, size=args.rows)
+        else:
+            values = rng.randint(0, 5, size=args.rows) / 4
+        data["g_{:04d}".format(i)] = values
+    df = pd.DataFrame(data)
+
+    home = tempfile.mkdtemp()
+    os.makedirs(os.path.join(home, "notebooks"))
+    os.environ["HOME"] = home
+    try:
+        print("{:>10} {:>10} {:>10} {:>10} {:>6}".format("format", "save(s)",
+            "load(s)", "size(MB)", "equal"))
+        for format in args.formats:
+            name = "benchmark." + format
+            try:
+                start = time.time()
+                postprocessing.save_table(df, name)
+                time_save = time.time() - start
+            except ValueError as e:
+                print("{:>10} {}".format(format, e))
+                continue
+
+            # columnar tables are memory-mapped, so read every value
+            start = time.time()
+            df1 = postprocessing.load_table(name)
+            equal = df1.equals(df)
+            time_load = time.time() - start
+
+            size = get_size(os.path.join(home, "notebooks", name))
+            print("{:>10} {:>10.3f} {:>10.3f} {:>10.1f} {:>6}".format(format,
+                time_save, time_load, size / 1024 ** 2, str(equal)))
+    finally:
+        shutil.rmtree(home)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""Load test of the eval server.
+
+Some clients repeatedly submit features and wait for their evaluation, while
+others repeatedly make cheap requests (logging evaluation attempts). Reports
+throughput and latency of each kind of request.
+
+Usage:
+    ./load_test_eval_server.py --url http://localhost:5000 --token TOKEN \\
+        --database featurehub --problem-id 1 --submitters 8 --loggers 8
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from urllib.parse import quote_from_bytes
+
+import dill
+import numpy as np
+import requests
+
+PREFIX = "/services/eval-server"
+
+def make_feature():
+    """Return a new feature function and its (unique) source code."""
+    salt = uuid.uuid4().hex
+    code = ("def feature(dataset):\n"
+            "    # {}\n"
+            "    return dataset['users']['age']\n".format(salt))
+    namespace = {}
+    exec(code, namespace)
+    return namespace["feature"], code
+
+def submit(args, session):
+    feature, code = make_feature()
+    data = {
+        "database"     : args.database,
+        "problem_id"   : args.problem_id,
+        "feature_dill" : quote_from_bytes(dill.dumps(feature)),
+        "code"         : code,
+        "description"  : "load test",
+    }
+    response = session.post(args.url + PREFIX + "/submit", data=data)
+    d = json.loads(response.text)
+    while d["status_code"] == "pending" and d.get("job_id"):
+        response = session.get(args.url + PREFIX + "/submit-status/" +
+                d["job_id"], params={"wait" : 30})
+        d = json.loads(response.text)
+    return d["status_code"]
+
+def log_attempt(args, session):
+    data = {
+        "database"   : args.database,
+        "problem_id" : args.problem_id,
+        "code"       : "def feature(dataset):\n    pass\n",
+    }
+    response = session.post(args.url + PREFIX + "/log-evaluation-attempt",
+            data=data)
+    return response.status_code
+
+def run_clients(args, action, n, latencies, errors, stop):
+    def client():
+        session = requests.Session()
+        session.headers["Authorization"] = "token {}".format(args.token)
+        while not stop.is_set():
+            start = time.time()
+            try:
+                action(args, session)
+                latencies.append(time.time() - start)
+            except Exception:
+                errors.append(1)
+
+    threads = [threading.Thread(target=client, daemon=True) for _ in range(n)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+def report(name, latencies, errors, duration):
+    if latencies:
+        p50, p95 = np.percentile(latencies, [50, 95])
+    else:
+        p50 = p95 = float("nan")
+    print("{:<10} {:>6} requests {:>8.2f} req/s  p50 {:>7.3f}s  p95 {:>7.3f}s"
+          "  {} errors".format(name, len(latencies), len(latencies) / duration,
+              p50, p95, len(errors)))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__,
+            formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:5000")
+    parser.add_argument("--token", required=True)
+    parser.add_argument("--database", default="featurehub")
+    parser.add_argument("--problem-id", default="1")
+    parser.add_argument("--submitters", type=int, default=8)
+    parser.add_argument("--loggers", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=60)
+    args = parser.parse_args()
+
+    stop = threading.Event()
+    submit_latencies, submit_errors = [], []
+    log_latencies, log_errors = [], []
+    threads = run_clients(args, submit, args.submitters, submit_latencies,
+            submit_errors, stop)
+    threads += run_clients(args, log_attempt, args.loggers, log_latencies,
+            log_errors, stop)
+
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    report("submit", submit_latencies, submit_errors, args.duration)
+    report("log", log_latencies, log_errors, args.duration)
+
+if __name__ == "__main__":
+    main()